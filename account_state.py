@@ -0,0 +1,169 @@
+import time
+import threading
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+POSITION_OPENED = 'position_opened'
+POSITION_MODIFIED = 'position_modified'
+POSITION_CLOSED = 'position_closed'
+ORDER_PLACED = 'order_placed'
+ORDER_MODIFIED = 'order_modified'
+ORDER_FILLED = 'order_filled'
+ORDER_REMOVED = 'order_removed'
+
+
+@dataclass
+class AccountEvent:
+    kind: str
+    symbol: str
+    ticket: int
+    item: Any
+    previous: Any = None
+
+
+def _position_key(item) -> tuple:
+    return item.volume, item.price_open, item.sl, item.tp
+
+
+def _order_key(item) -> tuple:
+    return item.volume_current, item.price_open, item.sl, item.tp
+
+
+def _diff(previous: Dict[int, Any],
+          current: Dict[int, Any],
+          key: Callable[[Any], tuple],
+          opened: str,
+          modified: str,
+          closed: str) -> List[AccountEvent]:
+    events = []
+
+    for ticket, item in current.items():
+        before = previous.get(ticket)
+        if before is None:
+            events.append(AccountEvent(opened, item.symbol, ticket, item))
+        elif key(before) != key(item):
+            events.append(AccountEvent(modified, item.symbol, ticket, item, before))
+
+    for ticket, item in previous.items():
+        if ticket not in current:
+            events.append(AccountEvent(closed, item.symbol, ticket, None, item))
+
+    return events
+
+
+class AccountState:
+    # In-memory mirror of the account's positions and pending orders. One positions_get()
+    # and one orders_get() for all symbols refresh it at most once per interval seconds;
+    # every read in between is served from the snapshot, indexed by symbol and ticket.
+    # Consecutive snapshots are diffed into AccountEvent values for the listeners.
+    def __init__(self, broker, interval: float = 0.25, history: int = 1000):
+        self.broker = broker
+        self.interval = interval
+        self.lock = threading.RLock()
+        self.listeners: List[Callable[[AccountEvent], None]] = []
+        self.events = deque(maxlen=history)
+
+        self.updated_at = None
+        self.initialized = False
+        self.positions_by_ticket: Dict[int, Any] = {}
+        self.orders_by_ticket: Dict[int, Any] = {}
+        self.positions_by_symbol: Dict[str, Tuple] = {}
+        self.orders_by_symbol: Dict[str, Tuple] = {}
+
+    def subscribe(self, callback: Callable[[AccountEvent], None]):
+        self.listeners.append(callback)
+
+    def invalidate(self):
+        # Called after our own order_send so the next read sees its effect
+        with self.lock:
+            self.updated_at = None
+
+    def _group(self, items) -> Dict[str, Tuple]:
+        groups = {}
+        for item in items:
+            groups.setdefault(item.symbol, []).append(item)
+        return {key: tuple(value) for key, value in groups.items()}
+
+    def refresh(self, force: bool = False) -> List[AccountEvent]:
+        with self.lock:
+            if not force and self.updated_at is not None and time.monotonic() - self.updated_at < self.interval:
+                return []
+
+            positions = self.broker.positions_get()
+            orders = self.broker.orders_get()
+
+            # None means the request failed; keep serving the last snapshot
+            if positions is None or orders is None:
+                return []
+
+            positions_by_ticket = {item.ticket: item for item in positions}
+            orders_by_ticket = {item.ticket: item for item in orders}
+
+            events = _diff(self.positions_by_ticket, positions_by_ticket, _position_key,
+                           POSITION_OPENED, POSITION_MODIFIED, POSITION_CLOSED) \
+                + _diff(self.orders_by_ticket, orders_by_ticket, _order_key,
+                        ORDER_PLACED, ORDER_MODIFIED, ORDER_REMOVED)
+
+            # A filled pending order turns into a position with the same ticket
+            for event in events:
+                if event.kind == ORDER_REMOVED and event.ticket in positions_by_ticket:
+                    event.kind = ORDER_FILLED
+                    event.item = positions_by_ticket[event.ticket]
+
+            self.positions_by_ticket = positions_by_ticket
+            self.orders_by_ticket = orders_by_ticket
+            self.positions_by_symbol = self._group(positions)
+            self.orders_by_symbol = self._group(orders)
+            self.updated_at = time.monotonic()
+
+            # The first snapshot only describes the starting state
+            if not self.initialized:
+                self.initialized = True
+                return []
+
+            self.events.extend(events)
+
+        for event in events:
+            for callback in self.listeners:
+                callback(event)
+
+        return events
+
+    def positions(self, symbol: Optional[str] = None, refresh: bool = True) -> Tuple:
+        # refresh=False serves the last snapshot without waiting on a refresh in progress; the
+        # snapshot dicts are replaced whole, never modified, so they can be read unlocked
+        if not refresh:
+            if symbol is None:
+                return tuple(self.positions_by_ticket.values())
+            return self.positions_by_symbol.get(symbol, ())
+
+        self.refresh()
+        with self.lock:
+            if symbol is None:
+                return tuple(self.positions_by_ticket.values())
+            return self.positions_by_symbol.get(symbol, ())
+
+    def orders(self, symbol: Optional[str] = None) -> Tuple:
+        self.refresh()
+        with self.lock:
+            if symbol is None:
+                return tuple(self.orders_by_ticket.values())
+            return self.orders_by_symbol.get(symbol, ())
+
+    def positions_total(self) -> int:
+        self.refresh()
+        with self.lock:
+            return len(self.positions_by_ticket)
+
+    def get_position(self, ticket: int):
+        self.refresh()
+        with self.lock:
+            return self.positions_by_ticket.get(ticket)
+
+    def get_order(self, ticket: int):
+        self.refresh()
+        with self.lock:
+            return self.orders_by_ticket.get(ticket)
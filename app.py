@@ -1,20 +1,39 @@
-import MetaTrader5 as mt5
+import time
 
+started = time.perf_counter()
+
+from brokers import MT5Broker
+from metrics import registry
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QApplication
 from windows import MainWindow
 
 
 VERSION = 4
 
+
+def on_shown():
+    # Seconds from process start to the first event loop pass with the window on screen
+    elapsed = time.perf_counter() - started
+    registry.observe('startup', '', elapsed)
+    print(f'startup: {elapsed:.3f}s')
+
+
+prompted = time.perf_counter()
 path = input('Path: ')
 # path = r"C:\Program Files\MetaTrader 5 EXNESS\terminal64.exe"
+# The time spent at the prompt is not startup time
+started += time.perf_counter() - prompted
+
+broker = MT5Broker()
 
-if mt5.initialize(path=path):
+if broker.initialize(path=path):
     app = QApplication([])
 
-    win = MainWindow(VERSION)
+    win = MainWindow(VERSION, broker)
     win.show()
+    QTimer.singleShot(0, on_shown)
 
     app.exec_()
     
-mt5.shutdown()
+broker.shutdown()
@@ -0,0 +1,387 @@
+import numpy as np
+import pandas as pd
+import detector
+import indicators
+import strategy
+
+from dataclasses import dataclass
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from windows.models import TradingStrategyConfig
+
+
+@dataclass
+class SimulatedPosition:
+    ticket: int
+    type: int
+    volume: float
+    price_open: float
+    open_bar: int
+    tp: float = 0.
+    sl: float = 0.
+
+
+@dataclass
+class PendingOrder:
+    type: int
+    price: float
+    volume: float
+    tp: float
+    placed: bool = True
+
+
+@dataclass
+class Trigger:
+    target: object
+    reason: str
+    side: str
+    up: bool
+    level: float
+
+
+@dataclass
+class BacktestResult:
+    trades: pd.DataFrame
+    cycles: pd.DataFrame
+    equity: pd.Series
+    drawdown: pd.Series
+    rejected_orders: int
+
+
+TRADE_COLUMNS = ['cycle', 'ticket', 'type', 'volume', 'open_bar', 'open_time', 'price_open',
+                 'close_bar', 'close_time', 'price_close', 'reason', 'profit']
+CYCLE_COLUMNS = ['cycle', 'divergence_type', 'open_bar', 'close_bar', 'depth', 'max_volume', 'profit']
+
+
+class Backtester:
+    # Replays bars through the OrderExecutorThread entry rules and the RecoveryZoneThread ladder.
+    # Prices are bid prices, the ask is bid + spread * point. Bars without any order or position
+    # level in range are skipped with vectorized searches; only bars that trigger something are
+    # walked along their intrabar path (open, high/low in the given order, close).
+    # A signal's bar is the forming bar of the frame that confirmed it: live, the executor
+    # enters at market on the first tick after the previous bar closed, so the entry fills at
+    # that bar's open (plus the spread for buys) and the rest of the bar is walked from there.
+    def __init__(self,
+                 df: pd.DataFrame,
+                 strategy_config: 'TradingStrategyConfig',
+                 point: float = 0.,
+                 contract_size: float = 1.,
+                 initial_balance: float = 10000.,
+                 high_first: Optional[np.ndarray] = None):
+        self.strategy_config = strategy_config
+        self.contract_size = contract_size
+        self.initial_balance = initial_balance
+
+        self.time = df['time'].to_numpy()
+        self.open = df['open'].to_numpy(dtype=float)
+        self.high = df['high'].to_numpy(dtype=float)
+        self.low = df['low'].to_numpy(dtype=float)
+        self.close = df['close'].to_numpy(dtype=float)
+        self.atr = df['atr'].to_numpy(dtype=float)
+        self.spread = df['spread'].to_numpy(dtype=float) * point if 'spread' in df else np.zeros(len(df))
+        self.high_first = np.asarray(high_first, dtype=bool) if high_first is not None else self.close < self.open
+
+        self.size = len(df)
+        self.balance = initial_balance
+        self.equity = np.full(self.size, initial_balance)
+        self.positions: List[SimulatedPosition] = []
+        self.pending: Optional[PendingOrder] = None
+        self.price_gap = 0.
+        self.stop_loss = 0.
+        self.ladder: List[dict] = []
+        self.next_ticket = 1
+        self.rejected_orders = 0
+
+        self.cycle = 0
+        self.cycle_record = None
+        self.trades = []
+        self.cycles = []
+
+    def _profit(self, position: SimulatedPosition, price_close: float) -> float:
+        direction = 1 if position.type == 0 else -1
+        return direction * (price_close - position.price_open) * position.volume * self.contract_size
+
+    def _floating(self, start: int, stop: int) -> np.ndarray:
+        floating = np.zeros(stop - start)
+        for position in self.positions:
+            price = self.close[start:stop] if position.type == 0 else self.close[start:stop] + self.spread[start:stop]
+            floating += self._profit(position, price)
+        return floating
+
+    def _mark_equity(self, start: int, stop: int):
+        if stop > start:
+            self.equity[start:stop] = self.balance + self._floating(start, stop)
+
+    def _open_position(self, position_type: int, volume: float, price: float, bar: int, tp: float) -> SimulatedPosition:
+        position = SimulatedPosition(self.next_ticket, position_type, volume, price, bar, tp=tp)
+        self.next_ticket += 1
+        self.positions.append(position)
+
+        self.cycle_record['depth'] += 1
+        self.cycle_record['max_volume'] = max(self.cycle_record['max_volume'], volume)
+
+        return position
+
+    def _close_position(self, position: SimulatedPosition, price: float, bar: int, reason: str):
+        profit = self._profit(position, price)
+        self.balance += profit
+        self.positions.remove(position)
+        self.cycle_record['profit'] += profit
+
+        self.trades.append((self.cycle, position.ticket, position.type, position.volume,
+                            position.open_bar, self.time[position.open_bar], position.price_open,
+                            bar, self.time[bar], price, reason, profit))
+
+    def _place_pending(self, bid: float, ask: float):
+        if self.pending.type == 0:
+            self.pending.placed = self.pending.price >= ask
+        else:
+            self.pending.placed = self.pending.price <= bid
+
+        if not self.pending.placed:
+            self.rejected_orders += 1
+
+    def _sync(self, bar: int, bid: float):
+        # One pass of RecoveryZoneThread.run over the current positions and pending order
+        ask = bid + self.spread[bar]
+
+        if not self.positions:
+            self.pending = None
+            self.cycle_record['close_bar'] = bar
+            self.cycles.append(tuple(self.cycle_record[name] for name in CYCLE_COLUMNS))
+            self.cycle_record = None
+            return
+
+        lastest_position = self.positions[-1]
+
+        if self.pending is None:
+            # Past the end of the plan or the depth/loss limits no further stop order is placed
+            depth = len(self.positions)
+            if depth >= len(self.ladder) or not strategy.is_recovery_step_allowed(
+                    self.ladder[depth],
+                    self.strategy_config.max_recovery_depth,
+                    self.strategy_config.max_recovery_loss):
+                return
+
+            step = self.ladder[depth]
+            self.pending = PendingOrder(step['type'], step['entry'], step['volume'], step['take_profit'])
+            self._place_pending(bid, ask)
+        elif not self.pending.placed:
+            self._place_pending(bid, ask)
+
+        # The live loop modifies the earlier positions on its next pass; here it happens at once
+        if not self.pending.placed:
+            return
+
+        for item in self.positions[:-1]:
+            if item.type == lastest_position.type:
+                item.tp = lastest_position.tp
+            else:
+                item.sl = lastest_position.tp
+
+    def _triggers(self) -> List[Trigger]:
+        triggers = []
+
+        for position in self.positions:
+            if position.type == 0:
+                triggers.append(Trigger(position, 'tp', 'bid', True, position.tp))
+                if position.sl:
+                    triggers.append(Trigger(position, 'sl', 'bid', False, position.sl))
+            else:
+                triggers.append(Trigger(position, 'tp', 'ask', False, position.tp))
+                if position.sl:
+                    triggers.append(Trigger(position, 'sl', 'ask', True, position.sl))
+
+        if self.pending is not None:
+            # Buy stops fill on the ask, sell stops on the bid. A rejected order is retried
+            # once the price is back on the valid side.
+            up = self.pending.type == 0
+            side = 'ask' if up else 'bid'
+            if self.pending.placed:
+                triggers.append(Trigger(self.pending, 'fill', side, up, self.pending.price))
+            else:
+                triggers.append(Trigger(self.pending, 'retry', side, not up, self.pending.price))
+
+        return triggers
+
+    def _find_next_bar(self, start: int) -> int:
+        triggers = self._triggers()
+        chunk = 64
+
+        while start < self.size:
+            stop = min(start + chunk, self.size)
+            hit = np.zeros(stop - start, dtype=bool)
+
+            for trigger in triggers:
+                offset = self.spread[start:stop] if trigger.side == 'ask' else 0.
+                if trigger.up:
+                    hit |= self.high[start:stop] + offset >= trigger.level
+                else:
+                    hit |= self.low[start:stop] + offset <= trigger.level
+
+            if hit.any():
+                stop = start + int(np.argmax(hit))
+                self._mark_equity(start, stop)
+                return stop
+
+            self._mark_equity(start, stop)
+            start = stop
+            chunk *= 4
+
+        return self.size
+
+    def _execute(self, trigger: Trigger, bid: float, bar: int):
+        price = bid + self.spread[bar] if trigger.side == 'ask' else bid
+
+        if trigger.reason in ('tp', 'sl'):
+            self._close_position(trigger.target, price, bar, trigger.reason)
+        elif trigger.reason == 'fill':
+            self._open_position(self.pending.type, self.pending.volume, price, bar, self.pending.tp)
+            self.pending = None
+
+    def _run_segment(self, bar: int, price: float, target: float, gap: bool = False) -> float:
+        up = target >= price
+
+        while self.cycle_record is not None:
+            spread = self.spread[bar]
+            hits = []
+
+            for trigger in self._triggers():
+                level = trigger.level - (spread if trigger.side == 'ask' else 0.)
+
+                if trigger.up and level <= price or not trigger.up and level >= price:
+                    hits.append((price, trigger))
+                elif not gap and trigger.up == up and (level <= target if up else level >= target):
+                    hits.append((level, trigger))
+                elif gap and trigger.up == up and (level <= target if up else level >= target):
+                    hits.append((target, trigger))
+
+            if not hits:
+                break
+
+            first = min(hit[0] for hit in hits) if up else max(hit[0] for hit in hits)
+            for level, trigger in hits:
+                if level == first:
+                    self._execute(trigger, level, bar)
+
+            price = first
+            self._sync(bar, price)
+
+        return target
+
+    def _walk_bar(self, bar: int, price: Optional[float] = None):
+        # price None starts at the previous close and gaps to the open
+        extremes = (self.high[bar], self.low[bar]) if self.high_first[bar] else (self.low[bar], self.high[bar])
+
+        if price is None:
+            price = self._run_segment(bar, self.close[bar - 1], self.open[bar], gap=True)
+        for target in (*extremes, self.close[bar]):
+            if self.cycle_record is None:
+                break
+            price = self._run_segment(bar, price, target)
+
+    def _open_cycle(self, signal) -> bool:
+        strategy_config = self.strategy_config
+        bar = int(signal.bar)
+        divergence_type = int(signal.divergence_type)
+
+        if not ((divergence_type == 0 and strategy_config.buy_only) or (divergence_type == 1 and strategy_config.sell_only)):
+            return False
+
+        bid = self.open[bar]
+        ask = bid + self.spread[bar]
+        market_price = ask if divergence_type == 0 else bid
+        pivot = int(signal.price_end_bar)
+
+        params = strategy.determine_entry_and_stop_loss(strategy_config, divergence_type, market_price,
+                                                        self.atr[bar - 1], self.atr[pivot], self.close[pivot])
+        if params is None:
+            return False
+
+        entry, stop_loss = params
+        if entry == stop_loss:
+            return False
+
+        if strategy_config.use_default_volume:
+            trade_volume = strategy_config.default_volume
+        else:
+            risk_amount = strategy_config.risk_amount
+            if strategy_config.risk_type == '%':
+                risk_amount = (strategy_config.risk_amount / 100) * self.balance
+            trade_volume = strategy.get_trade_volume(strategy_config.unit_factor, entry, stop_loss, risk_amount)
+
+        self.price_gap = abs(market_price - stop_loss)
+        if self.price_gap == 0:
+            return False
+
+        self.stop_loss = market_price - self.price_gap if divergence_type == 0 else market_price + self.price_gap
+        take_profit = strategy.get_take_profit_price(divergence_type, self.price_gap, strategy_config.risk_reward, market_price)
+        self.ladder = strategy.build_recovery_plan(divergence_type, market_price, trade_volume, self.price_gap,
+                                                   strategy_config.risk_reward, contract_size=self.contract_size)
+
+        self.cycle += 1
+        self.cycle_record = {'cycle': self.cycle, 'divergence_type': divergence_type, 'open_bar': bar,
+                             'close_bar': -1, 'depth': 0, 'max_volume': 0., 'profit': 0.}
+        self._open_position(divergence_type, trade_volume, market_price, bar, take_profit)
+        self._sync(bar, bid)
+
+        return True
+
+    def run(self, signals: pd.DataFrame) -> BacktestResult:
+        signal_bars = signals['bar'].to_numpy()
+        bar = 1
+
+        while bar < self.size:
+            if self.cycle_record is None:
+                k = np.searchsorted(signal_bars, bar)
+                if k == len(signal_bars):
+                    self._mark_equity(bar, self.size)
+                    break
+
+                signal = signals.iloc[k]
+                self._mark_equity(bar, int(signal.bar))
+                bar = int(signal.bar)
+
+                if self._open_cycle(signal) and self.cycle_record is not None:
+                    self._walk_bar(bar, self.open[bar])
+                self._mark_equity(bar, bar + 1)
+                bar += 1
+                continue
+
+            bar = self._find_next_bar(bar)
+            if bar == self.size:
+                break
+
+            self._walk_bar(bar)
+            self._mark_equity(bar, bar + 1)
+            bar += 1
+
+        equity = pd.Series(self.equity, index=self.time, name='equity')
+
+        return BacktestResult(
+            trades=pd.DataFrame.from_records(self.trades, columns=TRADE_COLUMNS),
+            cycles=pd.DataFrame.from_records(self.cycles, columns=CYCLE_COLUMNS),
+            equity=equity,
+            drawdown=(equity - equity.cummax()).rename('drawdown'),
+            rejected_orders=self.rejected_orders
+        )
+
+
+def run_backtest(rates: np.ndarray,
+                 strategy_config: 'TradingStrategyConfig',
+                 point: float = 0.,
+                 contract_size: float = 1.,
+                 initial_balance: float = 10000.,
+                 high_first: Optional[np.ndarray] = None) -> BacktestResult:
+    # rates is a copy_rates_* array; high_first optionally tells, per bar, whether the high
+    # was printed before the low (e.g. from lower timeframe data)
+    df = indicators.compute_features(rates, strategy_config.atr_length, strategy_config.pivot_lookback)
+    signals = detector.scan_divergences(df, strategy_config.pivot_lookback, strategy_config.pivot_distance)
+
+    if high_first is not None:
+        high_first = np.asarray(high_first)[df.index]
+
+    backtester = Backtester(df, strategy_config, point, contract_size, initial_balance, high_first)
+
+    return backtester.run(signals)
@@ -0,0 +1,239 @@
+import os
+import json
+import threading
+import numpy as np
+
+from typing import Callable, Dict, Optional, Union
+
+
+def resample_rates(rates: Union[np.ndarray, Dict[str, np.ndarray]], period: int) -> np.ndarray:
+    # Aggregates copy_rates bars into period-second bars aligned on the server clock, the way
+    # the terminal builds its own higher timeframes (D1 starts at server midnight and so on).
+    # rates is a structured array or its columns, e.g. BarStore.columns views.
+    names = rates.dtype.names if isinstance(rates, np.ndarray) else list(rates)
+    dtype = rates.dtype if isinstance(rates, np.ndarray) else [(name, rates[name].dtype) for name in names]
+    if len(rates['time']) == 0:
+        return np.zeros(0, dtype=dtype)
+
+    buckets = rates['time'] // period * period
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    result = np.zeros(len(starts), dtype=dtype)
+    result['time'] = buckets[starts]
+    result['open'] = rates['open'][starts]
+    result['high'] = np.maximum.reduceat(rates['high'], starts)
+    result['low'] = np.minimum.reduceat(rates['low'], starts)
+    result['close'] = rates['close'][ends]
+
+    for name in ('tick_volume', 'real_volume'):
+        if name in names:
+            result[name] = np.add.reduceat(rates[name], starts)
+    if 'spread' in names:
+        result['spread'] = rates['spread'][ends]
+
+    return result
+
+
+class BarStore:
+    # One directory per symbol/timeframe holding a raw little-endian file per column plus
+    # meta.json with the dtype and the committed row count. Only closed bars are stored, and
+    # a stored series has no holes: a sync that cannot reach back to the last stored bar
+    # starts the series over. columns() serves np.memmap slices, so nothing is copied until
+    # a caller asks for it; rates() is the structured copy of the same selection.
+    def __init__(self, root: Optional[str] = None, max_backfill: int = 100000):
+        self.root = root or os.path.join(os.getcwd(), 'bars')
+        self.max_backfill = max_backfill
+        self.lock = threading.Lock()
+        self.metas: Dict[tuple, tuple] = {}
+        self.views: Dict[tuple, tuple] = {}
+
+    def get_path(self, symbol: str, timeframe) -> str:
+        return os.path.join(self.root, symbol, str(timeframe))
+
+    def _read_meta(self, path: str) -> Optional[dict]:
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def _write_meta(self, path: str, meta: dict) -> tuple:
+        temp_path = os.path.join(path, 'meta.json.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(temp_path, os.path.join(path, 'meta.json'))
+
+        return self._get_stamp(path)
+
+    def _get_stamp(self, path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(os.path.join(path, 'meta.json'))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def get_meta(self, symbol: str, timeframe) -> Optional[dict]:
+        # Kept in memory; meta.json is parsed again only when another process replaced it
+        key = (symbol, timeframe)
+        path = self.get_path(symbol, timeframe)
+        stamp = self._get_stamp(path)
+        if stamp is None:
+            self.metas.pop(key, None)
+            return None
+
+        cached = self.metas.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        meta = self._read_meta(path)
+        self.metas[key] = (stamp, meta)
+
+        return meta
+
+    def _get_views(self, symbol: str, timeframe) -> Dict[str, np.ndarray]:
+        meta = self.get_meta(symbol, timeframe)
+        if meta is None or meta['count'] == 0:
+            return {}
+
+        # Every append or reset replaces the meta dict, so the views follow it
+        key = (symbol, timeframe)
+        cached = self.views.get(key)
+        if cached is not None and cached[0] is meta:
+            return cached[1]
+
+        path = self.get_path(symbol, timeframe)
+        views = {
+            name: np.memmap(os.path.join(path, name + '.bin'), dtype=np.dtype(fmt), mode='r', shape=(meta['count'],))
+            for name, fmt in meta['dtype']
+        }
+        self.views[key] = (meta, views)
+
+        return views
+
+    def columns(self,
+                symbol: str,
+                timeframe,
+                count: Optional[int] = None,
+                after: Optional[int] = None,
+                before: Optional[int] = None) -> Dict[str, np.ndarray]:
+        # Read-only views of the last count stored bars newer than after and older than before,
+        # one per column; empty when nothing is stored
+        views = self._get_views(symbol, timeframe)
+        if not views or (count is None and after is None and before is None):
+            return views
+
+        start = 0
+        if after is not None:
+            start = int(np.searchsorted(views['time'], after, side='right'))
+
+        stop = len(views['time'])
+        if before is not None:
+            stop = int(np.searchsorted(views['time'], before, side='left'))
+        start = min(start, stop)
+        if count is not None:
+            start = max(start, stop - count)
+
+        return {name: view[start:stop] for name, view in views.items()}
+
+    def get_last_time(self, symbol: str, timeframe) -> Optional[int]:
+        columns = self._get_views(symbol, timeframe)
+        return int(columns['time'][-1]) if columns else None
+
+    def get_first_time(self, symbol: str, timeframe) -> Optional[int]:
+        columns = self._get_views(symbol, timeframe)
+        return int(columns['time'][0]) if columns else None
+
+    def rates(self,
+              symbol: str,
+              timeframe,
+              count: Optional[int] = None,
+              after: Optional[int] = None,
+              before: Optional[int] = None) -> np.ndarray:
+        # Structured copy_rates-style copy of the columns() selection
+        columns = self.columns(symbol, timeframe, count, after, before)
+        if not columns:
+            return np.zeros(0, dtype=[('time', '<i8')])
+
+        rates = np.empty(len(columns['time']), dtype=[(name, view.dtype) for name, view in columns.items()])
+        for name, view in columns.items():
+            rates[name] = view
+
+        return rates
+
+    def append(self, symbol: str, timeframe, rates: np.ndarray):
+        if rates is None or len(rates) == 0:
+            return
+
+        with self.lock:
+            path = self.get_path(symbol, timeframe)
+            os.makedirs(path, exist_ok=True)
+
+            meta = self.get_meta(symbol, timeframe) or {
+                'dtype': [(name, rates.dtype[name].str) for name in rates.dtype.names],
+                'count': 0
+            }
+
+            last_time = self.get_last_time(symbol, timeframe)
+            if last_time is not None:
+                rates = rates[rates['time'] > last_time]
+                if len(rates) == 0:
+                    return
+
+            for name, fmt in meta['dtype']:
+                dtype = np.dtype(fmt)
+                file_path = os.path.join(path, name + '.bin')
+                size = meta['count'] * dtype.itemsize
+
+                with open(file_path, 'ab') as file:
+                    # Drop rows left behind by a write that never reached meta.json
+                    if os.path.getsize(file_path) > size:
+                        file.truncate(size)
+                    file.write(np.ascontiguousarray(rates[name], dtype=dtype).tobytes())
+
+            # A new dict, so a reader holding the cached one keeps a consistent count
+            meta = dict(meta, count=meta['count'] + len(rates))
+            self.metas[(symbol, timeframe)] = (self._write_meta(path, meta), meta)
+
+    def reset(self, symbol: str, timeframe):
+        # Forgets the stored bars of symbol/timeframe; meta.json goes first so readers in
+        # other processes never see a count larger than the columns
+        with self.lock:
+            path = self.get_path(symbol, timeframe)
+            if os.path.exists(os.path.join(path, 'meta.json')):
+                os.remove(os.path.join(path, 'meta.json'))
+            for name in os.listdir(path) if os.path.isdir(path) else []:
+                if name.endswith('.bin'):
+                    os.remove(os.path.join(path, name))
+
+            self.metas.pop((symbol, timeframe), None)
+            self.views.pop((symbol, timeframe), None)
+
+    def sync(self, symbol: str, timeframe, copy_rates_from_pos: Callable, count: int = 500) -> np.ndarray:
+        # Pulls only the bars newer than the last stored one, widening the request until it
+        # overlaps, stores the closed ones and returns the forming bar. Missing bars are
+        # backfilled up to max_backfill; past that, or when the terminal's history does not
+        # reach back that far, the stored series is dropped and seeded again from what came.
+        last_time = self.get_last_time(symbol, timeframe)
+        size = count if last_time is None else 3
+        limit = count if last_time is None else max(count, self.max_backfill)
+
+        while 1:
+            rates = copy_rates_from_pos(symbol, timeframe, 0, size)
+
+            if rates is None or len(rates) == 0:
+                return rates
+
+            if last_time is None or rates['time'][0] <= last_time or size >= limit or len(rates) < size:
+                break
+
+            size = min(size * 4, limit)
+
+        if last_time is not None and rates['time'][0] > last_time:
+            print(__class__.__name__ + ':', symbol, timeframe, 'gap after', last_time, 'not backfilled, store reset')
+            self.reset(symbol, timeframe)
+
+        self.append(symbol, timeframe, rates[:-1])
+
+        return rates[-1:]
@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import detector
+import indicators
+import synthetic
+
+from typing import Callable, Dict, List, Optional
+from indicators import FeatureStream
+from windows.models import Config, TradingStrategyConfig
+
+
+BASELINE_PATH = os.path.join(os.getcwd(), 'benchmark_baseline.json')
+CONFIG_SIZES = [10, 100, 1000]
+
+
+def measure(function: Callable[[], object], min_time: float = 0.2, repeat: int = 5) -> dict:
+    # Seconds per call: the loop count is grown until one round takes min_time, then the
+    # best and median of repeat rounds are kept (the best is the least noisy estimate)
+    number = 1
+    while 1:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or number >= 1 << 20:
+            break
+        number *= 2
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        rounds.append((time.perf_counter() - start) / number)
+
+    rounds.sort()
+    return {'best': rounds[0], 'median': rounds[len(rounds) // 2], 'number': number}
+
+
+def get_strategy_entry(symbol: str) -> dict:
+    return {
+        'symbol': symbol,
+        'timeframe': '5m',
+        'is_running': False,
+        'use_filter': True,
+        'timeframe_filters': ['15m', '1h']
+    }
+
+
+def get_cases(size: int = 500, seed: int = 0) -> Dict[str, Callable[[], object]]:
+    cases = {}
+
+    rates = synthetic.generate_rates(size + 1, seed, 'mixed', divergences=4)
+    stream = FeatureStream(count=size)
+    stream.update(rates)
+    df = stream.to_frame()
+
+    cases['detect_divergence'] = lambda: detector.detect_divergence(df)
+
+    pivot_high = df[df['pivot_high']].iloc[-1]
+    pivot_low = df[df['pivot_low']].iloc[-1]
+    cases['get_highest_pivot_bar'] = lambda: detector.get_highest_pivot_bar(df, pivot_high)
+    cases['get_lowest_pivot_bar'] = lambda: detector.get_lowest_pivot_bar(df, pivot_low)
+
+    # The indicator block of OrderExecutorThread.create_data_frame: a cold build of the whole
+    # window, and the per-bar path where one bar closed since the previous call
+    def build_cold():
+        cold = FeatureStream(count=size)
+        cold.update(rates)
+        return cold.to_frame()
+
+    history = synthetic.generate_rates(size + 1000, seed, 'mixed')
+    warm = FeatureStream(count=size)
+    warm.update(history[:size + 1])
+    position = [size]
+
+    def build_next_bar():
+        position[0] = position[0] + 1 if position[0] < len(history) - 1 else size
+        if position[0] == size:
+            warm.reset()
+            warm.update(history[:size + 1])
+        warm.update(history[position[0] - 1:position[0] + 1])
+        return warm.to_frame()
+
+    cases['create_data_frame_cold'] = build_cold
+    cases['create_data_frame_next_bar'] = build_next_bar
+    cases['compute_features'] = lambda: indicators.compute_features(rates)
+
+    entry = get_strategy_entry('SYN000')
+    cases['strategy_config_validate'] = lambda: TradingStrategyConfig.model_validate(entry)
+    cases['strategy_config_init'] = lambda: TradingStrategyConfig(**entry)
+
+    return cases
+
+
+def get_config_cases(directory: str, configs: List[Config]) -> Dict[str, Callable[[], object]]:
+    cases = {}
+
+    for symbols in CONFIG_SIZES:
+        file_path = os.path.join(directory, f'config_{symbols}.json')
+        # config.json is keyed by symbol and its entries leave the symbol out
+        data = {f'SYN{i:04d}': TradingStrategyConfig(**get_strategy_entry(f'SYN{i:04d}')).model_dump(mode='json', exclude={'symbol'})
+                for i in range(symbols)}
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+
+        # A long write-behind delay keeps the disk out of the update timings
+        config = Config(file_path, delay=3600.)
+        configs.append(config)
+        counter = [0]
+
+        def update(config=config, data=data, counter=counter):
+            counter[0] += 1
+            symbol = next(iter(data))
+            changed = dict(data)
+            changed[symbol] = dict(data[symbol], risk_amount=float(counter[0] % 100 + 1))
+            config.update(changed)
+
+        cases[f'config_get_{symbols}'] = config.get
+        cases[f'config_update_{symbols}'] = update
+
+    return cases
+
+
+def run(selected: Optional[List[str]] = None, min_time: float = 0.2, repeat: int = 5) -> Dict[str, dict]:
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        configs = []
+        cases = {**get_cases(), **get_config_cases(directory, configs)}
+
+        for name, function in cases.items():
+            if selected and not any(item in name for item in selected):
+                continue
+
+            results[name] = measure(function, min_time, repeat)
+            print(f'{name:32} {results[name]["best"] * 1e6:12.1f} us  (median {results[name]["median"] * 1e6:.1f} us)')
+
+        for config in configs:
+            config.close()
+
+    return results
+
+
+def get_environment() -> dict:
+    # Timings are only comparable on the same box and interpreter
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'node': platform.node()
+    }
+
+
+def get_environment_changes(baseline: dict) -> List[str]:
+    # Fields of get_environment() that differ from the ones stored with the baseline;
+    # baselines saved before they were all recorded only compare what they have
+    environment = get_environment()
+    return [f'{name} {baseline[name]!r} -> {value!r}' for name, value in environment.items()
+            if name in baseline and baseline[name] != value]
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    # Names of the cases whose best time is more than tolerance times the baseline's
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        ratio = result['best'] / baseline[name]['best']
+        status = 'REGRESSION' if ratio > tolerance else 'ok'
+        print(f'{name:32} {ratio:8.2f}x baseline  {status}')
+
+        if ratio > tolerance:
+            regressions.append(name)
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Times the detector, indicator and config paths on synthetic data.')
+    parser.add_argument('cases', nargs='*', help='only run cases whose name contains one of these')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file (default: %(default)s)')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='slowdown factor that fails the run')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds spent per case')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--any-machine', action='store_true',
+                        help='compare with a baseline saved on another machine or python version')
+    args = parser.parse_args(argv)
+
+    results = run(args.cases, args.min_time, args.repeat)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    if args.save or baseline is None:
+        # Cases left out of a partial run keep their previous baseline, if it was saved here
+        cases = dict(baseline['cases']) if baseline and not get_environment_changes(baseline) else {}
+        cases.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump({**get_environment(), 'cases': cases}, file, indent=4)
+        print('baseline saved to', args.baseline)
+        return 0
+
+    changes = get_environment_changes(baseline)
+    if changes:
+        print()
+        print('baseline recorded on another environment:', ', '.join(changes))
+        if not args.any_machine:
+            print('not compared; save a baseline here with --save or pass --any-machine')
+            return 2
+
+    print()
+    regressions = compare(results, baseline['cases'], args.tolerance)
+    if regressions:
+        print('regressed:', ', '.join(regressions))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
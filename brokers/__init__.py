@@ -0,0 +1,11 @@
+from .base import Broker
+from .mt5 import MT5Broker
+from .locked import LockedBroker
+
+
+def __getattr__(name: str):
+    # SimulatedBroker pulls in numpy, which the window does not need to start
+    if name == 'SimulatedBroker':
+        from .simulated import SimulatedBroker
+        return SimulatedBroker
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,113 @@
+from abc import ABC, abstractmethod
+
+
+class Broker(ABC):
+    # Module-shaped interface over the MetaTrader5 package: the same function names and
+    # constants, so callers only swap `mt5.` for `broker.`. A backend missing any of the
+    # functions cannot be constructed.
+    TIMEFRAME_M1 = 1
+    TIMEFRAME_M5 = 5
+    TIMEFRAME_M15 = 15
+    TIMEFRAME_M30 = 30
+    TIMEFRAME_H1 = 16385
+    TIMEFRAME_H4 = 16388
+    TIMEFRAME_D1 = 16408
+
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    ORDER_TYPE_BUY_LIMIT = 2
+    ORDER_TYPE_SELL_LIMIT = 3
+    ORDER_TYPE_BUY_STOP = 4
+    ORDER_TYPE_SELL_STOP = 5
+
+    POSITION_TYPE_BUY = 0
+    POSITION_TYPE_SELL = 1
+
+    TRADE_ACTION_DEAL = 1
+    TRADE_ACTION_PENDING = 5
+    TRADE_ACTION_SLTP = 6
+    TRADE_ACTION_MODIFY = 7
+    TRADE_ACTION_REMOVE = 8
+
+    ORDER_TIME_GTC = 0
+    ORDER_FILLING_FOK = 0
+    ORDER_FILLING_IOC = 1
+    ORDER_FILLING_RETURN = 2
+
+    TRADE_RETCODE_REQUOTE = 10004
+    TRADE_RETCODE_REJECT = 10006
+    TRADE_RETCODE_DONE = 10009
+    TRADE_RETCODE_ERROR = 10011
+    TRADE_RETCODE_TIMEOUT = 10012
+    TRADE_RETCODE_INVALID = 10013
+    TRADE_RETCODE_INVALID_VOLUME = 10014
+    TRADE_RETCODE_INVALID_PRICE = 10015
+    TRADE_RETCODE_INVALID_STOPS = 10016
+    TRADE_RETCODE_MARKET_CLOSED = 10018
+    TRADE_RETCODE_PRICE_CHANGED = 10020
+    TRADE_RETCODE_PRICE_OFF = 10021
+    TRADE_RETCODE_INVALID_ORDER = 10035
+    TRADE_RETCODE_TOO_MANY_REQUESTS = 10024
+    TRADE_RETCODE_CONNECTION = 10031
+
+    SYMBOL_TRADE_MODE_DISABLED = 0
+    SYMBOL_TRADE_MODE_LONGONLY = 1
+    SYMBOL_TRADE_MODE_SHORTONLY = 2
+    SYMBOL_TRADE_MODE_CLOSEONLY = 3
+    SYMBOL_TRADE_MODE_FULL = 4
+
+    COPY_TICKS_ALL = -1
+    COPY_TICKS_INFO = 1
+    COPY_TICKS_TRADE = 2
+
+    @abstractmethod
+    def initialize(self, **kwargs) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def shutdown(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def last_error(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def account_info(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def symbols_get(self, **kwargs):
+        raise NotImplementedError
+
+    @abstractmethod
+    def symbol_info(self, symbol: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def symbol_info_tick(self, symbol: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def copy_ticks_from(self, symbol: str, date_from, count: int, flags: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def positions_total(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def positions_get(self, **kwargs):
+        raise NotImplementedError
+
+    @abstractmethod
+    def orders_get(self, **kwargs):
+        raise NotImplementedError
+
+    @abstractmethod
+    def order_send(self, request: dict):
+        raise NotImplementedError
@@ -0,0 +1,62 @@
+import threading
+
+from .base import Broker
+
+
+class LockedBroker(Broker):
+    # Serializes every call to the wrapped broker; the MetaTrader5 module is not thread-safe
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.lock = threading.RLock()
+
+    def initialize(self, **kwargs) -> bool:
+        with self.lock:
+            return self.broker.initialize(**kwargs)
+
+    def shutdown(self):
+        with self.lock:
+            return self.broker.shutdown()
+
+    def last_error(self):
+        with self.lock:
+            return self.broker.last_error()
+
+    def account_info(self):
+        with self.lock:
+            return self.broker.account_info()
+
+    def symbols_get(self, **kwargs):
+        with self.lock:
+            return self.broker.symbols_get(**kwargs)
+
+    def symbol_info(self, symbol: str):
+        with self.lock:
+            return self.broker.symbol_info(symbol)
+
+    def symbol_info_tick(self, symbol: str):
+        with self.lock:
+            return self.broker.symbol_info_tick(symbol)
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        with self.lock:
+            return self.broker.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+
+    def copy_ticks_from(self, symbol: str, date_from, count: int, flags: int):
+        with self.lock:
+            return self.broker.copy_ticks_from(symbol, date_from, count, flags)
+
+    def positions_total(self) -> int:
+        with self.lock:
+            return self.broker.positions_total()
+
+    def positions_get(self, **kwargs):
+        with self.lock:
+            return self.broker.positions_get(**kwargs)
+
+    def orders_get(self, **kwargs):
+        with self.lock:
+            return self.broker.orders_get(**kwargs)
+
+    def order_send(self, request: dict):
+        with self.lock:
+            return self.broker.order_send(request)
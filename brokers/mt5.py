@@ -0,0 +1,47 @@
+from .base import Broker
+
+
+class MT5Broker(Broker):
+    # The MetaTrader5 package only exists on Windows, so it is imported on first use
+    def __init__(self):
+        import MetaTrader5
+        self.module = MetaTrader5
+
+    def initialize(self, **kwargs) -> bool:
+        return self.module.initialize(**kwargs)
+
+    def shutdown(self):
+        return self.module.shutdown()
+
+    def last_error(self):
+        return self.module.last_error()
+
+    def account_info(self):
+        return self.module.account_info()
+
+    def symbols_get(self, **kwargs):
+        return self.module.symbols_get(**kwargs)
+
+    def symbol_info(self, symbol: str):
+        return self.module.symbol_info(symbol)
+
+    def symbol_info_tick(self, symbol: str):
+        return self.module.symbol_info_tick(symbol)
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        return self.module.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+
+    def copy_ticks_from(self, symbol: str, date_from, count: int, flags: int):
+        return self.module.copy_ticks_from(symbol, date_from, count, flags)
+
+    def positions_total(self) -> int:
+        return self.module.positions_total()
+
+    def positions_get(self, **kwargs):
+        return self.module.positions_get(**kwargs)
+
+    def orders_get(self, **kwargs):
+        return self.module.orders_get(**kwargs)
+
+    def order_send(self, request: dict):
+        return self.module.order_send(request)
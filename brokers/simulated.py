@@ -0,0 +1,362 @@
+import time
+import fnmatch
+import threading
+import numpy as np
+
+from collections import namedtuple, Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from bar_store import resample_rates
+from .base import Broker
+
+
+TradePosition = namedtuple('TradePosition', ['ticket', 'time', 'type', 'magic', 'volume', 'price_open',
+                                             'sl', 'tp', 'price_current', 'profit', 'symbol', 'comment'])
+TradeOrder = namedtuple('TradeOrder', ['ticket', 'time_setup', 'type', 'magic', 'volume_initial', 'volume_current',
+                                       'price_open', 'sl', 'tp', 'symbol', 'comment'])
+OrderSendResult = namedtuple('OrderSendResult', ['retcode', 'deal', 'order', 'volume', 'price',
+                                                 'bid', 'ask', 'comment', 'request_id', 'request'])
+Tick = namedtuple('Tick', ['time', 'bid', 'ask', 'last', 'volume', 'time_msc', 'flags', 'volume_real'])
+AccountInfo = namedtuple('AccountInfo', ['login', 'balance', 'equity', 'profit', 'margin', 'margin_free',
+                                         'leverage', 'currency'])
+SymbolInfo = namedtuple('SymbolInfo', ['name', 'path', 'description', 'digits', 'point', 'spread',
+                                       'trade_contract_size', 'trade_mode', 'volume_min', 'volume_max',
+                                       'volume_step', 'visible'])
+
+TICK_DTYPE = [('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+              ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')]
+
+TIMEFRAME_SECONDS = {
+    Broker.TIMEFRAME_M1: 60,
+    Broker.TIMEFRAME_M5: 300,
+    Broker.TIMEFRAME_M15: 900,
+    Broker.TIMEFRAME_M30: 1800,
+    Broker.TIMEFRAME_H1: 3600,
+    Broker.TIMEFRAME_H4: 14400,
+    Broker.TIMEFRAME_D1: 86400
+}
+
+
+class SimulatedBroker(Broker):
+    # Deterministic in-process exchange driven by M1 copy_rates arrays, one per symbol.
+    # The clock only moves through advance(); every bar it crosses fills stop orders and
+    # applies TP/SL in open, high/low, close order. Higher timeframes are aggregated from
+    # M1 and the current M1 bar is the forming bar. Each call can be slowed down by a
+    # fixed latency plus seeded jitter, and is counted in stats().
+    def __init__(self,
+                 rates: Dict[str, np.ndarray],
+                 symbols: Optional[Dict[str, dict]] = None,
+                 balance: float = 10000.,
+                 latency: float = 0.,
+                 jitter: float = 0.,
+                 seed: int = 0,
+                 start: int = 0):
+        self.rates = rates
+        self.symbols = {}
+        for name, data in rates.items():
+            info = {
+                'name': name,
+                'path': 'Simulated\\' + name,
+                'description': name,
+                'digits': 5,
+                'point': 0.00001,
+                'spread': int(data['spread'][0]) if len(data) else 0,
+                'trade_contract_size': 1.,
+                'trade_mode': self.SYMBOL_TRADE_MODE_FULL,
+                'volume_min': 0.01,
+                'volume_max': 100.,
+                'volume_step': 0.01,
+                'visible': True
+            }
+            info.update((symbols or {}).get(name, {}))
+            self.symbols[name] = SymbolInfo(**info)
+
+        self.balance = balance
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = np.random.default_rng(seed)
+
+        self.lock = threading.RLock()
+        self.cursor = {name: start for name in rates}
+        self.now = max((int(data['time'][start]) for data in rates.values() if len(data) > start), default=0)
+        self.positions: List[dict] = []
+        self.orders: List[dict] = []
+        self.next_ticket = 1
+        self.calls = Counter()
+        self.wait_time = 0.
+
+    def _call(self, name: str):
+        self.calls[name] += 1
+
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.)
+        if delay:
+            self.wait_time += delay
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        return {'calls': dict(self.calls), 'total_calls': sum(self.calls.values()), 'wait_time': self.wait_time}
+
+    def _bar(self, symbol: str):
+        return self.rates[symbol][self.cursor[symbol]]
+
+    def _prices(self, symbol: str, bid: float) -> tuple:
+        spread = float(self._bar(symbol)['spread']) * self.symbols[symbol].point
+        return bid, bid + spread
+
+    def _profit(self, item: dict, bid: float, ask: float) -> float:
+        contract_size = self.symbols[item['symbol']].trade_contract_size
+        if item['type'] == self.ORDER_TYPE_BUY:
+            return (bid - item['price_open']) * item['volume'] * contract_size
+        return (item['price_open'] - ask) * item['volume'] * contract_size
+
+    def _close(self, item: dict, price: float):
+        contract_size = self.symbols[item['symbol']].trade_contract_size
+        direction = 1 if item['type'] == self.ORDER_TYPE_BUY else -1
+        self.balance += direction * (price - item['price_open']) * item['volume'] * contract_size
+        self.positions.remove(item)
+
+    def _open(self, symbol: str, position_type: int, volume: float, price: float, sl: float = 0., tp: float = 0.,
+              ticket: Optional[int] = None) -> int:
+        # Like the terminal, a position keeps the ticket of the order that opened it
+        if ticket is None:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+        self.positions.append({'ticket': ticket, 'time': self.now, 'type': position_type, 'volume': volume,
+                               'price_open': price, 'sl': sl, 'tp': tp, 'symbol': symbol})
+        return ticket
+
+    def _touch(self, symbol: str, bid: float):
+        # Everything that trades at this bid: stop orders first, then TP/SL of open positions
+        bid, ask = self._prices(symbol, bid)
+
+        for order in [item for item in self.orders if item['symbol'] == symbol]:
+            if order['type'] == self.ORDER_TYPE_BUY_STOP and ask >= order['price_open']:
+                self.orders.remove(order)
+                self._open(symbol, self.ORDER_TYPE_BUY, order['volume'], max(order['price_open'], ask), order['sl'], order['tp'], order['ticket'])
+            elif order['type'] == self.ORDER_TYPE_SELL_STOP and bid <= order['price_open']:
+                self.orders.remove(order)
+                self._open(symbol, self.ORDER_TYPE_SELL, order['volume'], min(order['price_open'], bid), order['sl'], order['tp'], order['ticket'])
+
+        for item in [item for item in self.positions if item['symbol'] == symbol]:
+            if item['type'] == self.ORDER_TYPE_BUY:
+                if item['tp'] and bid >= item['tp'] or item['sl'] and bid <= item['sl']:
+                    self._close(item, bid)
+            elif item['tp'] and ask <= item['tp'] or item['sl'] and ask >= item['sl']:
+                self._close(item, ask)
+
+    def advance(self, bars: int = 1):
+        # Moves the clock to the next M1 bar time of any symbol, bars times
+        with self.lock:
+            for _ in range(bars):
+                upcoming = [int(data['time'][self.cursor[name] + 1])
+                            for name, data in self.rates.items() if self.cursor[name] + 1 < len(data)]
+                if not upcoming:
+                    return False
+
+                self.now = min(upcoming)
+                for name, data in self.rates.items():
+                    while self.cursor[name] + 1 < len(data) and data['time'][self.cursor[name] + 1] <= self.now:
+                        self.cursor[name] += 1
+                        bar = data[self.cursor[name]]
+                        extremes = (bar['high'], bar['low']) if bar['close'] < bar['open'] else (bar['low'], bar['high'])
+                        for price in (bar['open'], *extremes, bar['close']):
+                            self._touch(name, float(price))
+
+            return True
+
+    def initialize(self, **kwargs) -> bool:
+        self._call('initialize')
+        return True
+
+    def shutdown(self):
+        self._call('shutdown')
+
+    def last_error(self):
+        return (1, 'Success')
+
+    def account_info(self):
+        self._call('account_info')
+        with self.lock:
+            profit = 0.
+            for item in self.positions:
+                profit += self._profit(item, *self._prices(item['symbol'], float(self._bar(item['symbol'])['close'])))
+
+            return AccountInfo(login=0, balance=self.balance, equity=self.balance + profit, profit=profit,
+                               margin=0., margin_free=self.balance + profit, leverage=100, currency='USD')
+
+    def symbols_get(self, group: Optional[str] = None, **kwargs):
+        # group as the terminal reads it: comma separated masks, those starting with ! exclude
+        self._call('symbols_get')
+        if not group:
+            return tuple(self.symbols.values())
+
+        masks = [item.strip() for item in group.split(',') if item.strip()]
+        include = [item for item in masks if not item.startswith('!')]
+        exclude = [item[1:] for item in masks if item.startswith('!')]
+        return tuple(item for name, item in self.symbols.items()
+                     if any(fnmatch.fnmatchcase(name, mask) for mask in include)
+                     and not any(fnmatch.fnmatchcase(name, mask) for mask in exclude))
+
+    def symbol_info(self, symbol: str):
+        self._call('symbol_info')
+        return self.symbols.get(symbol)
+
+    def symbol_info_tick(self, symbol: str):
+        self._call('symbol_info_tick')
+        if symbol not in self.rates:
+            return None
+
+        with self.lock:
+            bid, ask = self._prices(symbol, float(self._bar(symbol)['close']))
+            return Tick(time=self.now, bid=bid, ask=ask, last=bid, volume=0, time_msc=self.now * 1000, flags=6, volume_real=0.)
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        self._call('copy_rates_from_pos')
+        if symbol not in self.rates or timeframe not in TIMEFRAME_SECONDS:
+            return None
+
+        with self.lock:
+            data = self.rates[symbol][:self.cursor[symbol] + 1]
+
+        period = TIMEFRAME_SECONDS[timeframe]
+        if period == 60:
+            stop = len(data) - start_pos
+            return data[max(stop - count, 0):max(stop, 0)].copy()
+
+        # Enough M1 bars for count + start_pos buckets, aggregated into the requested timeframe
+        rates = resample_rates(data[-(count + start_pos + 1) * (period // 60):], period)
+
+        stop = len(rates) - start_pos
+        return rates[max(stop - count, 0):max(stop, 0)]
+
+    def copy_ticks_from(self, symbol: str, date_from, count: int, flags: int):
+        # Four ticks per M1 bar (open, first extreme, second extreme, close) 15 seconds apart
+        self._call('copy_ticks_from')
+        if symbol not in self.rates:
+            return None
+
+        if isinstance(date_from, datetime):
+            date_from = date_from.replace(tzinfo=date_from.tzinfo or timezone.utc).timestamp()
+        date_from_msc = int(date_from * 1000)
+
+        with self.lock:
+            data = self.rates[symbol][:self.cursor[symbol] + 1]
+            point = self.symbols[symbol].point
+
+        data = data[data['time'] * 1000 + 45000 >= date_from_msc]
+        high_first = data['close'] < data['open']
+        prices = np.stack([data['open'],
+                           np.where(high_first, data['high'], data['low']),
+                           np.where(high_first, data['low'], data['high']),
+                           data['close']], axis=1).ravel()
+
+        ticks = np.zeros(len(prices), dtype=TICK_DTYPE)
+        ticks['time_msc'] = (data['time'][:, None] * 1000 + np.arange(4) * 15000).ravel()
+        ticks['time'] = ticks['time_msc'] // 1000
+        ticks['bid'] = prices
+        ticks['ask'] = prices + np.repeat(data['spread'], 4) * point
+        ticks['last'] = prices
+        ticks['flags'] = 6
+
+        return ticks[ticks['time_msc'] >= date_from_msc][:count]
+
+    def positions_total(self) -> int:
+        self._call('positions_total')
+        return len(self.positions)
+
+    def _position(self, item: dict) -> TradePosition:
+        bid, ask = self._prices(item['symbol'], float(self._bar(item['symbol'])['close']))
+        return TradePosition(ticket=item['ticket'], time=item['time'], type=item['type'], magic=0,
+                             volume=item['volume'], price_open=item['price_open'], sl=item['sl'], tp=item['tp'],
+                             price_current=bid if item['type'] == self.ORDER_TYPE_BUY else ask,
+                             profit=self._profit(item, bid, ask), symbol=item['symbol'], comment='')
+
+    def _order(self, item: dict) -> TradeOrder:
+        return TradeOrder(ticket=item['ticket'], time_setup=item['time'], type=item['type'], magic=0,
+                          volume_initial=item['volume'], volume_current=item['volume'], price_open=item['price_open'],
+                          sl=item['sl'], tp=item['tp'], symbol=item['symbol'], comment='')
+
+    def _select(self, items: List[dict], symbol: Optional[str], ticket: Optional[int]) -> List[dict]:
+        return [item for item in items
+                if (symbol is None or item['symbol'] == symbol) and (ticket is None or item['ticket'] == ticket)]
+
+    def positions_get(self, symbol: Optional[str] = None, ticket: Optional[int] = None, **kwargs):
+        self._call('positions_get')
+        with self.lock:
+            return tuple(self._position(item) for item in self._select(self.positions, symbol, ticket))
+
+    def orders_get(self, symbol: Optional[str] = None, ticket: Optional[int] = None, **kwargs):
+        self._call('orders_get')
+        with self.lock:
+            return tuple(self._order(item) for item in self._select(self.orders, symbol, ticket))
+
+    def _result(self, request: dict, retcode: int, order: int = 0, price: float = 0., bid: float = 0., ask: float = 0.) -> OrderSendResult:
+        return OrderSendResult(retcode=retcode, deal=order if retcode == self.TRADE_RETCODE_DONE else 0, order=order,
+                               volume=request.get('volume', 0.), price=price, bid=bid, ask=ask,
+                               comment='Request executed' if retcode == self.TRADE_RETCODE_DONE else 'Rejected',
+                               request_id=0, request=request)
+
+    def order_send(self, request: dict):
+        self._call('order_send')
+
+        with self.lock:
+            action = request.get('action')
+
+            if action == self.TRADE_ACTION_SLTP:
+                positions = self._select(self.positions, None, request.get('position'))
+                if not positions:
+                    return self._result(request, self.TRADE_RETCODE_INVALID)
+                # Like the terminal, a missing field means 0, i.e. no level
+                positions[0]['sl'] = request.get('sl', 0.)
+                positions[0]['tp'] = request.get('tp', 0.)
+                return self._result(request, self.TRADE_RETCODE_DONE, positions[0]['ticket'])
+
+            if action == self.TRADE_ACTION_REMOVE:
+                orders = self._select(self.orders, None, request.get('order'))
+                if not orders:
+                    return self._result(request, self.TRADE_RETCODE_INVALID)
+                self.orders.remove(orders[0])
+                return self._result(request, self.TRADE_RETCODE_DONE, orders[0]['ticket'])
+
+            symbol = request.get('symbol')
+            if symbol not in self.rates:
+                return self._result(request, self.TRADE_RETCODE_INVALID)
+
+            bid, ask = self._prices(symbol, float(self._bar(symbol)['close']))
+            info = self.symbols[symbol]
+            volume = request.get('volume', 0.)
+
+            if info.trade_mode == self.SYMBOL_TRADE_MODE_DISABLED:
+                return self._result(request, self.TRADE_RETCODE_MARKET_CLOSED, bid=bid, ask=ask)
+            if not info.volume_min <= volume <= info.volume_max:
+                return self._result(request, self.TRADE_RETCODE_INVALID_VOLUME, bid=bid, ask=ask)
+
+            if action == self.TRADE_ACTION_DEAL:
+                price = ask if request['type'] == self.ORDER_TYPE_BUY else bid
+
+                if 'position' in request:
+                    positions = self._select(self.positions, symbol, request['position'])
+                    if not positions:
+                        return self._result(request, self.TRADE_RETCODE_INVALID, bid=bid, ask=ask)
+                    self._close(positions[0], price)
+                    return self._result(request, self.TRADE_RETCODE_DONE, positions[0]['ticket'], price, bid, ask)
+
+                ticket = self._open(symbol, request['type'], volume, price, request.get('sl', 0.), request.get('tp', 0.))
+                return self._result(request, self.TRADE_RETCODE_DONE, ticket, price, bid, ask)
+
+            if action == self.TRADE_ACTION_PENDING:
+                valid = {
+                    self.ORDER_TYPE_BUY_STOP: request['price'] > ask,
+                    self.ORDER_TYPE_SELL_STOP: request['price'] < bid
+                }
+                if not valid.get(request['type'], False):
+                    return self._result(request, self.TRADE_RETCODE_INVALID_PRICE, bid=bid, ask=ask)
+
+                ticket = self.next_ticket
+                self.next_ticket += 1
+                self.orders.append({'ticket': ticket, 'time': self.now, 'type': request['type'], 'volume': volume,
+                                    'price_open': request['price'], 'sl': request.get('sl', 0.),
+                                    'tp': request.get('tp', 0.), 'symbol': symbol})
+                return self._result(request, self.TRADE_RETCODE_DONE, ticket, request['price'], bid, ask)
+
+            return self._result(request, self.TRADE_RETCODE_INVALID, bid=bid, ask=ask)
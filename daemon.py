@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+
+from typing import List, Optional
+from account_state import AccountState
+from brokers import Broker, MT5Broker, LockedBroker
+from journal import journal
+from metrics import MetricsServer, SummaryWriter
+from windows.models import Config
+from windows.threads import OrderExecutorThread, RecoveryZoneThread
+
+
+class TradingDaemon:
+    # The order executor and recovery engines without the window: symbols whose is_running
+    # is set in config.json are traded, and edits to the file are picked up every
+    # reload_interval seconds (the window's file watcher does this in the GUI).
+    def __init__(self,
+                 config: Config,
+                 broker: Broker,
+                 workers: int = 1,
+                 metrics_port: Optional[int] = None,
+                 reload_interval: float = 1.,
+                 summary_interval: float = 60.):
+        self.config = config
+        self.broker = LockedBroker(broker)
+        self.account = AccountState(self.broker)
+        self.reload_interval = reload_interval
+        self.stop_event = threading.Event()
+
+        self.order_executor = OrderExecutorThread(self.config, self.broker, self.account, workers=workers)
+        self.recovery_thread = RecoveryZoneThread(self.config, self.broker, self.account)
+
+        self.metrics_writer = SummaryWriter(file_path=os.path.join(os.path.dirname(self.config.file_path), 'metrics.json'),
+                                            interval=summary_interval)
+        self.metrics_server = None
+        if metrics_port is not None:
+            try:
+                self.metrics_server = MetricsServer(port=metrics_port)
+            except OSError as ex:
+                print(__class__.__name__ + ':', 'metrics endpoint not started:', ex)
+
+    def get_threads(self) -> list:
+        return [self.order_executor, self.recovery_thread]
+
+    def start(self):
+        for thread in self.get_threads():
+            thread.start()
+
+        self.metrics_writer.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self) -> int:
+        # Blocks until stop() or an engine thread dies; 1 in the latter case so a supervisor
+        # restarts the process
+        self.start()
+        status = 0
+
+        try:
+            while not self.stop_event.wait(self.reload_interval):
+                if not all(thread.is_alive() for thread in self.get_threads()):
+                    print(__class__.__name__ + ':', 'an engine thread stopped')
+                    status = 1
+                    break
+
+                self.config.reload()
+        finally:
+            self.close()
+
+        return status
+
+    def close(self, timeout: float = 10.):
+        for thread in self.get_threads():
+            thread.stop()
+        for thread in self.get_threads():
+            if thread.is_alive():
+                thread.join(timeout)
+
+        self.config.close()
+        journal.flush(timeout)
+        self.metrics_writer.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+
+
+def create_simulated_broker(symbols: List[str], history: int = 2000, bars: int = 1440, seed: int = 0) -> Broker:
+    # Synthetic M1 series for the config's symbols whose forming bar is the current minute,
+    # so the engines see the simulated market on the wall clock (see drive_simulated)
+    import synthetic
+    from brokers import SimulatedBroker
+
+    start = int(time.time()) // 60 * 60 - history * 60
+    rates = {
+        symbol: synthetic.generate_rates(history + bars, seed + i, synthetic.REGIMES[i % len(synthetic.REGIMES)],
+                                         divergences=(history + bars) // 200, start=start)
+        for i, symbol in enumerate(symbols)
+    }
+    return SimulatedBroker(rates, start=history)
+
+
+def drive_simulated(broker: Broker, stop_event: threading.Event):
+    # Moves the simulated clock one M1 bar at every wall-clock minute
+    while not stop_event.wait(60 - time.time() % 60):
+        broker.advance()
+
+
+def get_initialize_arguments(args: argparse.Namespace) -> dict:
+    arguments = {'path': args.path, 'login': args.login, 'password': args.password, 'server': args.server}
+    arguments = {key: value for key, value in arguments.items() if value}
+    if 'login' in arguments:
+        arguments['login'] = int(arguments['login'])
+    return arguments
+
+
+def create_parser() -> argparse.ArgumentParser:
+    environ = os.environ
+    parser = argparse.ArgumentParser(description='Runs the trading engines without the window.')
+    parser.add_argument('--path', default=environ.get('TRADER_TERMINAL_PATH'),
+                        help='terminal64.exe of the MetaTrader 5 terminal (env TRADER_TERMINAL_PATH)')
+    parser.add_argument('--config', default=environ.get('TRADER_CONFIG', os.path.join(os.getcwd(), 'config.json')),
+                        help='config.json to trade (env TRADER_CONFIG, default: %(default)s)')
+    parser.add_argument('--login', default=environ.get('TRADER_LOGIN'), help='account number (env TRADER_LOGIN)')
+    parser.add_argument('--password', default=environ.get('TRADER_PASSWORD'), help='account password (env TRADER_PASSWORD)')
+    parser.add_argument('--server', default=environ.get('TRADER_SERVER'), help='trade server (env TRADER_SERVER)')
+    parser.add_argument('--workers', type=int, default=int(environ.get('TRADER_WORKERS', min(8, os.cpu_count() or 1))),
+                        help='symbols evaluated concurrently (env TRADER_WORKERS, default: %(default)s)')
+    parser.add_argument('--metrics-port', type=int, default=environ.get('TRADER_METRICS_PORT'),
+                        help='serve /metrics on this port (env TRADER_METRICS_PORT)')
+    parser.add_argument('--summary-interval', type=float, default=60.,
+                        help='seconds between rewrites of metrics.json beside the config (default: %(default)s)')
+    parser.add_argument('--simulated', action='store_true',
+                        help='trade synthetic data on the simulated broker instead of a terminal')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the simulated data')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = create_parser().parse_args(argv)
+
+    config = Config(args.config)
+    if args.simulated:
+        broker = create_simulated_broker(list(config.get()), seed=args.seed)
+    else:
+        broker = MT5Broker()
+
+    if not broker.initialize(**get_initialize_arguments(args)):
+        print('initialize failed:', broker.last_error(), file=sys.stderr)
+        config.close()
+        return 1
+
+    daemon = TradingDaemon(config, broker, workers=args.workers,
+                           metrics_port=int(args.metrics_port) if args.metrics_port else None,
+                           summary_interval=args.summary_interval)
+    if args.simulated:
+        threading.Thread(target=drive_simulated, args=(broker, daemon.stop_event), name='SimulatedClock', daemon=True).start()
+
+    def on_signal(signum, _):
+        print('signal', signum, 'received, stopping')
+        daemon.stop()
+
+    for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_signal)
+
+    try:
+        return daemon.run()
+    finally:
+        broker.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,12 @@
+import numpy as np
 import pandas as pd
 
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, List, Optional, Tuple, Union
+
+
+DETECTION_WINDOW = 150
+PIVOT_BAR_WINDOW = 5
 
 
 @dataclass
@@ -17,6 +22,16 @@ class DivergenceSignal:
     price_point: DivergencePoint
 
 
+@dataclass
+class DivergenceSetup:
+    signal: DivergenceSignal
+    trigger: float
+
+    def is_triggered(self, prices: np.ndarray) -> np.ndarray:
+        # Per price, whether it is beyond the trigger in the signal's direction
+        return prices > self.trigger if self.signal.divergence_type == 0 else prices < self.trigger
+
+
 def get_highest_pivot_bar(df: pd.DataFrame, pivot_candle: pd.Series, window_size: int = 5) -> pd.Series:
     left_bars = df[df['time'] < pivot_candle['time']].tail(window_size)
     right_bars = df[df['time'] > pivot_candle['time']].head(window_size)
@@ -86,54 +101,354 @@ def is_bullish_divergence(df: pd.DataFrame, current_pivot_low: pd.Series) -> Opt
     return None
 
 
-def detect_divergence(df: pd.DataFrame, max_pivot_distance: int = 9) -> Optional[DivergenceSignal]:
-    df = df.copy()
-    df = df.tail(150)
-    
-    prev_candle = df.iloc[-2]
-
-    current_rsi_pivot_low = df[df['rsi_pivot_low']].iloc[-1]
-    current_pivot_low = df[df['pivot_low']].iloc[-1]
-    distance_to_pivot_low = len(df) - df.index.get_loc(current_pivot_low.name) - 1
-    bullish_divergence_point = is_bullish_divergence(df, current_rsi_pivot_low)
-    if bullish_divergence_point is not None \
-            and distance_to_pivot_low <= max_pivot_distance \
-            and prev_candle['close'] > current_pivot_low['high']:
-        current_pivot_low_candle = get_lowest_pivot_bar(df, current_rsi_pivot_low)
-        nearest_pivot_low_candle = get_lowest_pivot_bar(df, bullish_divergence_point)
-
-        return DivergenceSignal(
-            divergence_type=0,
-            rsi_point=DivergencePoint(
-                start=(bullish_divergence_point['time'], bullish_divergence_point['rsi']),
-                end=(current_rsi_pivot_low['time'], current_rsi_pivot_low['rsi'])
-            ),
-            price_point=DivergencePoint(
-                start=(nearest_pivot_low_candle['time'], nearest_pivot_low_candle['low']),
-                end=(current_pivot_low_candle['time'], current_pivot_low_candle['low'])
-            )
-        )
-    
-    current_rsi_pivot_high = df[df['rsi_pivot_high']].iloc[-1]
-    current_pivot_high = df[df['pivot_high']].iloc[-1]
-    distance_to_pivot_high = len(df) - df.index.get_loc(current_pivot_high.name) - 1
-    bearish_divergence_point = is_bearish_divergence(df, current_rsi_pivot_high)
-    if bearish_divergence_point is not None \
-            and distance_to_pivot_high <= max_pivot_distance \
-            and prev_candle['close'] < current_pivot_high['low']:
-        current_pivot_high_candle = get_highest_pivot_bar(df, current_rsi_pivot_high)
-        nearest_pivot_high_candle = get_highest_pivot_bar(df, bearish_divergence_point)
-
-        return DivergenceSignal(
-            divergence_type=1,
-            rsi_point=DivergencePoint(
-                start=(bearish_divergence_point['time'], bearish_divergence_point['rsi']),
-                end=(current_rsi_pivot_high['time'], current_rsi_pivot_high['rsi'])
-            ),
-            price_point=DivergencePoint(
-                start=(nearest_pivot_high_candle['time'], nearest_pivot_high_candle['high']),
-                end=(current_pivot_high_candle['time'], current_pivot_high_candle['high'])
-            )
+def _pivot_bar_index(pivots: np.ndarray,
+                     flags: np.ndarray,
+                     index: int,
+                     first: int,
+                     last: int,
+                     window_size: int = PIVOT_BAR_WINDOW) -> int:
+    # Array form of get_highest_pivot_bar/get_lowest_pivot_bar: the rightmost pivot within
+    # window_size bars on either side, excluding the bar itself, inside the [first, last] frame
+    k = np.searchsorted(pivots, min(index + window_size, last), side='right') - 1
+    if k >= 0 and pivots[k] == index:
+        k -= 1
+
+    if k >= 0 and pivots[k] >= max(index - window_size, first):
+        return int(pivots[k])
+
+    return index if flags[index] else -1
+
+
+def _nearest_rsi_pivot(rsi_pivots: np.ndarray, rsi: np.ndarray, index: int, bullish: bool, first: int = 0) -> int:
+    candidates = rsi_pivots[np.searchsorted(rsi_pivots, first):np.searchsorted(rsi_pivots, index)]
+    values = rsi[candidates]
+
+    if bullish:
+        candidates = candidates[(values < rsi[index]) & (values < 30)]
+    else:
+        candidates = candidates[(values > rsi[index]) & (values > 70)]
+
+    return int(candidates[-1]) if len(candidates) else -1
+
+
+def _divergence_signal(divergence_type: int,
+                       time: np.ndarray,
+                       rsi: np.ndarray,
+                       price: np.ndarray,
+                       rsi_start: int,
+                       rsi_end: int,
+                       price_start: int,
+                       price_end: int) -> DivergenceSignal:
+    return DivergenceSignal(
+        divergence_type=divergence_type,
+        rsi_point=DivergencePoint(
+            start=(pd.Timestamp(time[rsi_start]), rsi[rsi_start]),
+            end=(pd.Timestamp(time[rsi_end]), rsi[rsi_end])
+        ),
+        price_point=DivergencePoint(
+            start=(pd.Timestamp(time[price_start]), price[price_start]),
+            end=(pd.Timestamp(time[price_end]), price[price_end])
         )
+    )
+
+
+def _detect_side(divergence_type: int,
+                 time: np.ndarray,
+                 high: np.ndarray,
+                 low: np.ndarray,
+                 rsi: np.ndarray,
+                 pivot_flags: np.ndarray,
+                 rsi_pivot_flags: np.ndarray,
+                 prev_close: Optional[float],
+                 max_pivot_distance: int,
+                 bars_ahead: int = 0) -> Optional[Tuple[DivergenceSignal, float]]:
+    # One direction of detect_divergence_arrays. Returns the signal and its trigger, the level
+    # prev_close has to be beyond (above the last pivot low's high, below the last pivot high's
+    # low). prev_close None skips that check; bars_ahead shifts the pivot distance check to a
+    # frame that many bars later.
+    bullish = divergence_type == 0
+    size = len(time)
+
+    pivots = np.flatnonzero(pivot_flags)
+    rsi_pivots = np.flatnonzero(rsi_pivot_flags)
+    if not len(pivots) or not len(rsi_pivots):
+        return None
+
+    current_rsi_pivot = int(rsi_pivots[-1])
+    current_pivot = int(pivots[-1])
+    trigger = high[current_pivot] if bullish else low[current_pivot]
+
+    if size + bars_ahead - current_pivot - 1 > max_pivot_distance:
+        return None
+    if prev_close is not None and not (prev_close > trigger if bullish else prev_close < trigger):
+        return None
+
+    divergence_point = _nearest_rsi_pivot(rsi_pivots, rsi, current_rsi_pivot, bullish=bullish)
+    if divergence_point < 0:
+        return None
+
+    current_pivot_candle = _pivot_bar_index(pivots, pivot_flags, current_rsi_pivot, 0, size - 1)
+    nearest_pivot_candle = _pivot_bar_index(pivots, pivot_flags, divergence_point, 0, size - 1)
+    if current_pivot_candle < 0 or nearest_pivot_candle < 0:
+        return None
+
+    if bullish and not low[current_rsi_pivot] < low[nearest_pivot_candle]:
+        return None
+    if not bullish and not high[current_pivot_candle] > high[nearest_pivot_candle]:
+        return None
+
+    signal = _divergence_signal(divergence_type, time, rsi, low if bullish else high,
+                                divergence_point, current_rsi_pivot,
+                                nearest_pivot_candle, current_pivot_candle)
+    return signal, float(trigger)
+
+
+def detect_divergence_arrays(time: np.ndarray,
+                             high: np.ndarray,
+                             low: np.ndarray,
+                             close: np.ndarray,
+                             rsi: np.ndarray,
+                             pivot_high: np.ndarray,
+                             pivot_low: np.ndarray,
+                             rsi_pivot_high: np.ndarray,
+                             rsi_pivot_low: np.ndarray,
+                             max_pivot_distance: int = 9) -> Optional[DivergenceSignal]:
+    start = max(len(time) - DETECTION_WINDOW, 0)
+    time, high, low, close, rsi = time[start:], high[start:], low[start:], close[start:], rsi[start:]
+    pivot_high, pivot_low = pivot_high[start:], pivot_low[start:]
+    rsi_pivot_high, rsi_pivot_low = rsi_pivot_high[start:], rsi_pivot_low[start:]
+
+    if len(time) < 2:
+        return None
+
+    prev_close = close[-2]
+
+    for divergence_type, pivot_flags, rsi_pivot_flags in ((0, pivot_low, rsi_pivot_low),
+                                                          (1, pivot_high, rsi_pivot_high)):
+        result = _detect_side(divergence_type, time, high, low, rsi, pivot_flags, rsi_pivot_flags,
+                              prev_close, max_pivot_distance)
+        if result is not None:
+            return result[0]
 
     return None
+
+
+def _last_flag_index(flags: np.ndarray) -> np.ndarray:
+    last = flags.shape[1] - 1 - np.argmax(flags[:, ::-1], axis=1)
+    return np.where(flags.any(axis=1), last, -1)
+
+
+def detect_divergence_batch(time: np.ndarray,
+                            high: np.ndarray,
+                            low: np.ndarray,
+                            close: np.ndarray,
+                            rsi: np.ndarray,
+                            pivot_high: np.ndarray,
+                            pivot_low: np.ndarray,
+                            rsi_pivot_high: np.ndarray,
+                            rsi_pivot_low: np.ndarray,
+                            max_pivot_distance: Union[int, np.ndarray] = 9) -> List[Optional[DivergenceSignal]]:
+    # Every argument is a (symbols x bars) block aligned on the last bar. Shorter histories
+    # are left-padded with NaN prices and False pivot flags, which the kernel never selects.
+    columns = [np.asarray(item)[:, -DETECTION_WINDOW:] for item in (time, high, low, close, rsi,
+                                                                    pivot_high, pivot_low,
+                                                                    rsi_pivot_high, rsi_pivot_low)]
+    time, high, low, close, rsi, pivot_high, pivot_low, rsi_pivot_high, rsi_pivot_low = columns
+
+    symbols, size = close.shape
+    rows = np.arange(symbols)
+    max_pivot_distance = np.broadcast_to(max_pivot_distance, (symbols,))
+    prev_close = close[:, -2]
+
+    # Cheap distance and breakout checks for all symbols at once; only survivors reach the kernel
+    last_pivot_low = _last_flag_index(pivot_low)
+    bullish = (last_pivot_low >= 0) & rsi_pivot_low.any(axis=1) \
+        & (size - last_pivot_low - 1 <= max_pivot_distance) \
+        & (prev_close > high[rows, last_pivot_low])
+
+    last_pivot_high = _last_flag_index(pivot_high)
+    bearish = (last_pivot_high >= 0) & rsi_pivot_high.any(axis=1) \
+        & (size - last_pivot_high - 1 <= max_pivot_distance) \
+        & (prev_close < low[rows, last_pivot_high])
+
+    signals = [None] * symbols
+    for row in np.flatnonzero(bullish | bearish):
+        signals[row] = detect_divergence_arrays(*(item[row] for item in columns),
+                                                max_pivot_distance=max_pivot_distance[row])
+
+    return signals
+
+
+def detect_divergence(df: pd.DataFrame, max_pivot_distance: int = 9) -> Optional[DivergenceSignal]:
+    df = df.tail(DETECTION_WINDOW)
+
+    return detect_divergence_arrays(
+        df['time'].to_numpy(),
+        df['high'].to_numpy(),
+        df['low'].to_numpy(),
+        df['close'].to_numpy(),
+        df['rsi'].to_numpy(),
+        df['pivot_high'].to_numpy(),
+        df['pivot_low'].to_numpy(),
+        df['rsi_pivot_high'].to_numpy(),
+        df['rsi_pivot_low'].to_numpy(),
+        max_pivot_distance=max_pivot_distance
+    )
+
+
+def detect_divergence_setups_arrays(time: np.ndarray,
+                                    high: np.ndarray,
+                                    low: np.ndarray,
+                                    rsi: np.ndarray,
+                                    pivot_high: np.ndarray,
+                                    pivot_low: np.ndarray,
+                                    rsi_pivot_high: np.ndarray,
+                                    rsi_pivot_low: np.ndarray,
+                                    max_pivot_distance: int = 9) -> List[DivergenceSetup]:
+    start = max(len(time) - DETECTION_WINDOW, 0)
+    time, high, low, rsi = time[start:], high[start:], low[start:], rsi[start:]
+    pivot_high, pivot_low = pivot_high[start:], pivot_low[start:]
+    rsi_pivot_high, rsi_pivot_low = rsi_pivot_high[start:], rsi_pivot_low[start:]
+
+    if len(time) < 2:
+        return []
+
+    setups = []
+    for divergence_type, pivot_flags, rsi_pivot_flags in ((0, pivot_low, rsi_pivot_low),
+                                                          (1, pivot_high, rsi_pivot_high)):
+        result = _detect_side(divergence_type, time, high, low, rsi, pivot_flags, rsi_pivot_flags,
+                              None, max_pivot_distance, bars_ahead=1)
+        if result is not None:
+            setups.append(DivergenceSetup(*result))
+
+    return setups
+
+
+def detect_divergence_setups(df: pd.DataFrame, max_pivot_distance: int = 9) -> List[DivergenceSetup]:
+    # Setups that detect_divergence would confirm on the next frame if the forming bar (the last
+    # row of df) closed beyond their trigger. Used by the tick trigger mode, which fires on the
+    # first tick that crosses the trigger instead of waiting for the close.
+    df = df.tail(DETECTION_WINDOW)
+
+    return detect_divergence_setups_arrays(
+        df['time'].to_numpy(),
+        df['high'].to_numpy(),
+        df['low'].to_numpy(),
+        df['rsi'].to_numpy(),
+        df['pivot_high'].to_numpy(),
+        df['pivot_low'].to_numpy(),
+        df['rsi_pivot_high'].to_numpy(),
+        df['rsi_pivot_low'].to_numpy(),
+        max_pivot_distance=max_pivot_distance
+    )
+
+
+def detect_divergence_setups_batch(time: np.ndarray,
+                                   high: np.ndarray,
+                                   low: np.ndarray,
+                                   rsi: np.ndarray,
+                                   pivot_high: np.ndarray,
+                                   pivot_low: np.ndarray,
+                                   rsi_pivot_high: np.ndarray,
+                                   rsi_pivot_low: np.ndarray,
+                                   max_pivot_distance: Union[int, np.ndarray] = 9) -> List[List[DivergenceSetup]]:
+    # detect_divergence_setups for every row of a block laid out as for detect_divergence_batch
+    columns = [np.asarray(item)[:, -DETECTION_WINDOW:] for item in (time, high, low, rsi,
+                                                                    pivot_high, pivot_low,
+                                                                    rsi_pivot_high, rsi_pivot_low)]
+    time, high, low, rsi, pivot_high, pivot_low, rsi_pivot_high, rsi_pivot_low = columns
+
+    symbols, size = rsi.shape
+    max_pivot_distance = np.broadcast_to(max_pivot_distance, (symbols,))
+
+    # The distance check is made against the next frame, one bar further from the pivot
+    last_pivot_low = _last_flag_index(pivot_low)
+    bullish = (last_pivot_low >= 0) & rsi_pivot_low.any(axis=1) & (size - last_pivot_low <= max_pivot_distance)
+
+    last_pivot_high = _last_flag_index(pivot_high)
+    bearish = (last_pivot_high >= 0) & rsi_pivot_high.any(axis=1) & (size - last_pivot_high <= max_pivot_distance)
+
+    setups = [[] for _ in range(symbols)]
+    for row in np.flatnonzero(bullish | bearish):
+        setups[row] = detect_divergence_setups_arrays(*(item[row] for item in columns),
+                                                      max_pivot_distance=max_pivot_distance[row])
+
+    return setups
+
+
+SIGNAL_COLUMNS = ['bar', 'time', 'divergence_type',
+                  'rsi_start_bar', 'rsi_start', 'rsi_end_bar', 'rsi_end',
+                  'price_start_bar', 'price_start', 'price_end_bar', 'price_end']
+
+
+def scan_divergences(df: pd.DataFrame, pivot_lookback: int = 5, max_pivot_distance: int = 9) -> pd.DataFrame:
+    # Walk-forward equivalent of calling detect_divergence on the frame ending at every bar.
+    # df holds features computed once over the whole history; a pivot at bar i only becomes
+    # visible at bar i + pivot_lookback, as it does in a frame built from bars up to that point.
+    # Each row of the result is keyed by the position of the last bar of the frame that emitted it.
+    time = df['time'].to_numpy()
+    high = df['high'].to_numpy()
+    low = df['low'].to_numpy()
+    close = df['close'].to_numpy()
+    rsi = df['rsi'].to_numpy()
+    flags = {name: df[name].to_numpy(dtype=bool) for name in ('pivot_high', 'pivot_low', 'rsi_pivot_high', 'rsi_pivot_low')}
+
+    size = len(df)
+    positions = np.arange(size)
+    pivots = {name: np.flatnonzero(value) for name, value in flags.items()}
+    last_flags = {name: np.maximum.accumulate(np.where(value, positions, -1)) for name, value in flags.items()}
+
+    ends = positions[max(pivot_lookback, 1):]
+    starts = np.maximum(ends - DETECTION_WINDOW + 1, 0)
+    visible = ends - pivot_lookback
+    prev_close = close[ends - 1]
+
+    nearest_cache: Dict[tuple, int] = {}
+    records = []
+    signalled = np.zeros(size, dtype=bool)
+
+    for divergence_type, price_name, rsi_name, price in ((0, 'pivot_low', 'rsi_pivot_low', low),
+                                                          (1, 'pivot_high', 'rsi_pivot_high', high)):
+        current_pivot = last_flags[price_name][visible]
+        current_rsi_pivot = last_flags[rsi_name][visible]
+
+        candidates = (current_pivot >= starts) & (current_rsi_pivot >= starts) \
+            & (ends - current_pivot <= max_pivot_distance) & ~signalled[ends]
+        if divergence_type == 0:
+            candidates &= prev_close > high[np.maximum(current_pivot, 0)]
+        else:
+            candidates &= prev_close < low[np.maximum(current_pivot, 0)]
+
+        price_pivots = pivots[price_name]
+        price_flags = flags[price_name]
+
+        for k in np.flatnonzero(candidates):
+            end, start, last = int(ends[k]), int(starts[k]), int(visible[k])
+            current = int(current_rsi_pivot[k])
+
+            key = (divergence_type, current)
+            if key not in nearest_cache:
+                nearest_cache[key] = _nearest_rsi_pivot(pivots[rsi_name], rsi, current,
+                                                        bullish=divergence_type == 0,
+                                                        first=current - DETECTION_WINDOW)
+            divergence_point = nearest_cache[key]
+            if divergence_point < start:
+                continue
+
+            current_candle = _pivot_bar_index(price_pivots, price_flags, current, start, last)
+            nearest_candle = _pivot_bar_index(price_pivots, price_flags, divergence_point, start, last)
+            if current_candle < 0 or nearest_candle < 0:
+                continue
+
+            if divergence_type == 0 and not low[current] < low[nearest_candle]:
+                continue
+            if divergence_type == 1 and not high[current_candle] > high[nearest_candle]:
+                continue
+
+            signalled[end] = True
+            records.append((end, time[end], divergence_type,
+                            divergence_point, rsi[divergence_point], current, rsi[current],
+                            nearest_candle, price[nearest_candle], current_candle, price[current_candle]))
+
+    signals = pd.DataFrame.from_records(records, columns=SIGNAL_COLUMNS)
+    return signals.sort_values('bar', ignore_index=True)
@@ -0,0 +1,543 @@
+import numpy as np
+import pandas as pd
+
+from collections import deque
+from typing import Dict, Optional
+
+
+RSI_LENGTH = 14
+PIVOT_COLUMNS = ['rsi_pivot_high', 'rsi_pivot_low', 'pivot_high', 'pivot_low']
+
+
+def decayed_sums(values: np.ndarray, decay: float, carry=0.) -> np.ndarray:
+    # s[i] = values[i] + decay * s[i - 1], s[-1] = carry, along the last axis (carry holds one
+    # value per row of a 2-D block). Evaluated in blocks where decay ** -k stays below 16, so
+    # the closed form inside a block loses no precision.
+    values = np.asarray(values, dtype=float)
+    result = np.empty(values.shape)
+    if decay == 0.:
+        result[:] = values
+        return result
+
+    block = max(int(np.log(16.) / -np.log(decay)), 1)
+    powers = decay ** np.arange(1, block + 1)
+    carry = np.asarray(carry, dtype=float)
+
+    for start in range(0, values.shape[-1], block):
+        chunk = values[..., start:start + block]
+        size = chunk.shape[-1]
+        sums = powers[:size] * (carry[..., None] + np.cumsum(chunk / powers[:size], axis=-1))
+        result[..., start:start + size] = sums
+        carry = sums[..., -1]
+
+    return result
+
+
+def rolling_extreme(values: np.ndarray, window: int, highest: bool = True) -> np.ndarray:
+    # Trailing max/min over window values along the last axis (NaN before the first full
+    # window) in O(n) with the van Herk/Gil-Werman block prefix/suffix scans, which vectorize
+    # where a deque cannot
+    values = np.asarray(values, dtype=float)
+    rows, size = values.shape[:-1], values.shape[-1]
+    result = np.full(values.shape, np.nan)
+    if size < window:
+        return result
+
+    accumulate = np.maximum.accumulate if highest else np.minimum.accumulate
+    blocks = -(-size // window)
+    padded = np.full(rows + (blocks * window,), -np.inf if highest else np.inf)
+    padded[..., :size] = values
+    padded = padded.reshape(rows + (blocks, window))
+
+    prefix = accumulate(padded, axis=-1).reshape(rows + (-1,))[..., :size]
+    suffix = accumulate(padded[..., ::-1], axis=-1)[..., ::-1].reshape(rows + (-1,))[..., :size]
+
+    combine = np.maximum if highest else np.minimum
+    result[..., window - 1:] = combine(suffix[..., :size - window + 1], prefix[..., window - 1:])
+
+    return result
+
+
+class WilderAverage:
+    # Same recurrence as pandas_ta.rma: ewm(alpha=1 / length, min_periods=length).mean()
+    def __init__(self, length: int):
+        self.length = length
+        self.decay = 1 - 1 / length
+        self.numerator = 0.
+        self.denominator = 0.
+        self.count = 0
+
+    def peek(self, value: float) -> float:
+        if self.count + 1 < self.length:
+            return np.nan
+        return (value + self.decay * self.numerator) / (1 + self.decay * self.denominator)
+
+    def push(self, value: float) -> float:
+        result = self.peek(value)
+
+        self.numerator = value + self.decay * self.numerator
+        self.denominator = 1 + self.decay * self.denominator
+        self.count += 1
+
+        return result
+
+    def extend(self, values: np.ndarray) -> np.ndarray:
+        # Same as push() for each value, as one array pass
+        numerators = decayed_sums(values, self.decay, self.numerator)
+        denominators = decayed_sums(np.ones(len(values)), self.decay, self.denominator)
+
+        result = numerators / denominators
+        result[:max(self.length - 1 - self.count, 0)] = np.nan
+
+        if len(values):
+            self.numerator = numerators[-1]
+            self.denominator = denominators[-1]
+            self.count += len(values)
+
+        return result
+
+
+class RsiState:
+    def __init__(self, length: int = RSI_LENGTH):
+        self.gain = WilderAverage(length)
+        self.loss = WilderAverage(length)
+        self.prev_close = None
+
+    def _value(self, gain: float, loss: float) -> float:
+        total = gain + abs(loss)
+        return 100 * gain / total if total else np.nan
+
+    def peek(self, close: float) -> float:
+        if self.prev_close is None:
+            return np.nan
+
+        change = close - self.prev_close
+        return self._value(self.gain.peek(max(change, 0.)), self.loss.peek(min(change, 0.)))
+
+    def push(self, close: float) -> float:
+        if self.prev_close is None:
+            self.prev_close = close
+            return np.nan
+
+        change = close - self.prev_close
+        self.prev_close = close
+
+        return self._value(self.gain.push(max(change, 0.)), self.loss.push(min(change, 0.)))
+
+    def extend(self, close: np.ndarray) -> np.ndarray:
+        close = np.asarray(close, dtype=float)
+        result = np.full(len(close), np.nan)
+        if not len(close):
+            return result
+
+        previous = np.concatenate([[close[0] if self.prev_close is None else self.prev_close], close[:-1]])
+        first = 1 if self.prev_close is None else 0
+        change = (close - previous)[first:]
+        self.prev_close = close[-1]
+
+        gain = self.gain.extend(np.maximum(change, 0.))
+        loss = np.abs(self.loss.extend(np.minimum(change, 0.)))
+        total = gain + loss
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[first:] = np.where(total != 0, 100 * gain / total, np.nan)
+
+        return result
+
+
+class AtrState:
+    def __init__(self, length: int = 14):
+        self.average = WilderAverage(length)
+        self.prev_close = None
+
+    def _true_range(self, high: float, low: float) -> float:
+        return max(high - low, abs(high - self.prev_close), abs(self.prev_close - low))
+
+    def peek(self, high: float, low: float) -> float:
+        if self.prev_close is None:
+            return np.nan
+        return self.average.peek(self._true_range(high, low))
+
+    def push(self, high: float, low: float, close: float) -> float:
+        if self.prev_close is None:
+            self.prev_close = close
+            return np.nan
+
+        result = self.average.push(self._true_range(high, low))
+        self.prev_close = close
+
+        return result
+
+    def extend(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+        high, low, close = (np.asarray(item, dtype=float) for item in (high, low, close))
+        result = np.full(len(close), np.nan)
+        if not len(close):
+            return result
+
+        previous = np.concatenate([[np.nan if self.prev_close is None else self.prev_close], close[:-1]])
+        first = 1 if self.prev_close is None else 0
+        true_range = np.maximum.reduce([high - low, np.abs(high - previous), np.abs(previous - low)])[first:]
+        self.prev_close = close[-1]
+
+        result[first:] = self.average.extend(true_range)
+
+        return result
+
+
+class PivotState:
+    # Centered rolling max/min over 2 * window_size + 1 values kept as a monotonic deque,
+    # so a pivot is confirmed in O(1) once window_size newer values have arrived.
+    def __init__(self, window_size: int, highest: bool = True):
+        self.window_size = window_size
+        self.span = 2 * window_size + 1
+        self.highest = highest
+        self.values = deque(maxlen=self.span)
+        self.extrema = deque()
+        self.count = 0
+
+    def _dominates(self, a: float, b: float) -> bool:
+        return a >= b if self.highest else a <= b
+
+    def _center_value(self, value: float) -> float:
+        return value if self.window_size == 0 else self.values[-self.window_size]
+
+    def peek(self, value: float) -> Optional[bool]:
+        if self.count + 1 < self.span:
+            return None
+
+        extreme = value
+        for index, item in self.extrema:
+            if index > self.count - self.span:
+                extreme = item if self._dominates(item, value) else value
+                break
+
+        return self._center_value(value) == extreme
+
+    def push(self, value: float) -> Optional[bool]:
+        index = self.count
+
+        while self.extrema and self._dominates(value, self.extrema[-1][1]):
+            self.extrema.pop()
+        self.extrema.append((index, value))
+
+        while self.extrema[0][0] <= index - self.span:
+            self.extrema.popleft()
+
+        self.values.append(value)
+        self.count += 1
+
+        if self.count < self.span:
+            return None
+
+        return self.values[-1 - self.window_size] == self.extrema[0][1]
+
+    def extend(self, values: np.ndarray) -> np.ndarray:
+        # push() for each value as one array pass; the None results (window not yet full) are False
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return np.zeros(0, dtype=bool)
+
+        history = np.fromiter(self.values, dtype=float, count=len(self.values))
+        sequence = np.concatenate([history, values]) if len(history) else values
+        extreme = rolling_extreme(sequence, self.span, self.highest)[len(history):]
+
+        positions = np.arange(len(history), len(sequence)) - self.window_size
+        center = np.where(positions >= 0, sequence[np.maximum(positions, 0)], np.nan)
+
+        counts = self.count + 1 + np.arange(len(values))
+        result = (counts >= self.span) & (center == extreme)
+
+        # Rebuild the deques from the last span values
+        start = self.count + len(values) - min(len(sequence), self.span)
+        self.values.extend(values[-self.span:])
+        self.extrema.clear()
+        for offset, value in enumerate(sequence[-self.span:].tolist()):
+            while self.extrema and self._dominates(value, self.extrema[-1][1]):
+                self.extrema.pop()
+            self.extrema.append((start + offset, value))
+        self.count += len(values)
+
+        return result
+
+
+class FeatureStream:
+    # Incremental equivalent of OrderExecutorThread.create_data_frame for one symbol/timeframe:
+    # closed bars are committed once, the forming bar is only peeked at.
+    def __init__(self, atr_length: int = 14, pivot_lookback: int = 5, count: int = 500):
+        self.atr_length = atr_length
+        self.pivot_lookback = pivot_lookback
+        self.count = count
+        self.warmup = max(RSI_LENGTH, atr_length)
+        self.reset()
+
+    def reset(self):
+        self.rsi = RsiState(RSI_LENGTH)
+        self.atr = AtrState(self.atr_length)
+        self.pivots = {
+            'rsi_pivot_high': PivotState(self.pivot_lookback, highest=True),
+            'rsi_pivot_low': PivotState(self.pivot_lookback, highest=False),
+            'pivot_high': PivotState(self.pivot_lookback, highest=True),
+            'pivot_low': PivotState(self.pivot_lookback, highest=False)
+        }
+        self.buffer = None
+        self.names = None
+        self.size = 0
+        self.last_time = None
+        self.forming = None
+
+    def _allocate(self, rates: np.ndarray):
+        self.names = rates.dtype.names
+        dtype = rates.dtype.descr + [('rsi', '<f8'), ('atr', '<f8')] + [(name, '?') for name in PIVOT_COLUMNS]
+        self.buffer = np.zeros(2 * self.count, dtype=dtype)
+
+    def _pivot_sources(self, row) -> dict:
+        return {
+            'rsi_pivot_high': row['rsi'],
+            'rsi_pivot_low': row['rsi'],
+            'pivot_high': row['high'],
+            'pivot_low': row['low']
+        }
+
+    def _commit(self, bar):
+        rsi = self.rsi.push(float(bar['close']))
+        atr = self.atr.push(float(bar['high']), float(bar['low']), float(bar['close']))
+        self.last_time = int(bar['time'])
+
+        # Rows with missing indicators are dropped, as df.dropna() does
+        if np.isnan(rsi) or np.isnan(atr):
+            return
+
+        if self.size == len(self.buffer):
+            self.buffer[:self.count] = self.buffer[self.size - self.count:self.size]
+            self.size = self.count
+
+        row = self.buffer[self.size]
+        for name in self.names:
+            row[name] = bar[name]
+        row['rsi'] = rsi
+        row['atr'] = atr
+        for name in PIVOT_COLUMNS:
+            row[name] = False
+        self.size += 1
+
+        for name, value in self._pivot_sources(row).items():
+            result = self.pivots[name].push(float(value))
+            if result is not None:
+                self.buffer[self.size - 1 - self.pivot_lookback][name] = result
+
+    def _commit_many(self, bars: Dict[str, np.ndarray]):
+        # _commit for each bar as array passes, used when more than a few bars close at once
+        rsi = self.rsi.extend(bars['close'])
+        atr = self.atr.extend(bars['high'], bars['low'], bars['close'])
+        self.last_time = int(bars['time'][-1])
+
+        kept = ~(np.isnan(rsi) | np.isnan(atr))
+        if not kept.any():
+            return
+
+        rows = np.zeros(int(kept.sum()), dtype=self.buffer.dtype)
+        for name in self.names:
+            rows[name] = bars[name][kept]
+        rows['rsi'] = rsi[kept]
+        rows['atr'] = atr[kept]
+
+        rows = np.concatenate([self.buffer[:self.size], rows])
+        first = self.size
+        for name, values in self._pivot_sources(rows[first:]).items():
+            flags = self.pivots[name].extend(values)
+            rows[name][np.flatnonzero(flags) + first - self.pivot_lookback] = True
+
+        if len(rows) > len(self.buffer):
+            rows = rows[-self.count:]
+        self.buffer[:len(rows)] = rows
+        self.size = len(rows)
+
+    def update(self, rates: np.ndarray, closed: Optional[Dict[str, np.ndarray]] = None):
+        # rates ends with the forming bar. The closed bars before it may instead be passed as
+        # columns (e.g. BarStore.columns views), which are read in place rather than copied
+        # into one array with the forming bar first.
+        if rates is None or len(rates) == 0:
+            return
+
+        if self.buffer is None:
+            self._allocate(rates)
+
+        if closed is None:
+            closed = {name: rates[name][:-1] for name in self.names}
+        elif len(rates) > 1:
+            closed = {name: np.concatenate([closed[name], rates[name][:-1]]) if closed else rates[name][:-1]
+                      for name in self.names}
+
+        start = 0
+        size = len(closed['time']) if closed else 0
+        if self.last_time is not None and size:
+            start = int(np.searchsorted(closed['time'], self.last_time, side='right'))
+
+        if size - start > 8:
+            self._commit_many({name: closed[name][start:] for name in self.names})
+        else:
+            for i in range(start, size):
+                self._commit({name: closed[name][i] for name in self.names})
+
+        forming = rates[-1]
+        self.forming = forming if self.last_time is None or forming['time'] > self.last_time else None
+
+    def _forming_row(self) -> Optional[np.ndarray]:
+        if self.forming is None:
+            return None
+
+        row = np.zeros(1, dtype=self.buffer.dtype)
+        for name in self.forming.dtype.names:
+            row[0][name] = self.forming[name]
+        row[0]['rsi'] = self.rsi.peek(float(self.forming['close']))
+        row[0]['atr'] = self.atr.peek(float(self.forming['high']), float(self.forming['low']))
+
+        if np.isnan(row[0]['rsi']) or np.isnan(row[0]['atr']):
+            return None
+
+        return row
+
+    def get_rows(self, size: Optional[int] = None) -> Optional[np.ndarray]:
+        # The last size rows of to_frame as a structured array, time in epoch seconds. Only
+        # those rows are copied, so a detection window does not pay for the whole frame.
+        if self.buffer is None:
+            return None
+
+        forming = self._forming_row()
+        frame_size = min(self.size + (forming is not None), self.count - self.warmup)
+        size = frame_size if size is None else min(size, frame_size)
+
+        if forming is None:
+            rows = self.buffer[self.size - size:self.size].copy()
+        else:
+            rows = np.concatenate([self.buffer[self.size - size + 1:self.size], forming])
+
+            # The forming bar closes the window of the bar pivot_lookback positions back
+            center = len(rows) - 1 - self.pivot_lookback
+            if center >= 0:
+                for name, value in self._pivot_sources(forming[0]).items():
+                    result = self.pivots[name].peek(float(value))
+                    rows[center][name] = bool(result) if result is not None else False
+
+        # The rolling window is centered, so the first and last bars of the frame can never be pivots
+        first = max(self.pivot_lookback - (frame_size - size), 0)
+        for name in PIVOT_COLUMNS:
+            rows[name][:first] = False
+
+        return rows
+
+    def to_frame(self) -> pd.DataFrame:
+        rows = self.get_rows()
+        if rows is None:
+            return pd.DataFrame()
+
+        columns = {name: rows[name] for name in rows.dtype.names}
+        columns['time'] = pd.to_datetime(rows['time'], unit='s')
+
+        return pd.DataFrame(columns, index=pd.RangeIndex(self.warmup, self.warmup + len(rows)))
+
+
+def compute_rsi(close: pd.Series, length: int = RSI_LENGTH) -> pd.Series:
+    return pd.Series(RsiState(length).extend(close.to_numpy(dtype=float)), index=close.index)
+
+
+def compute_atr(high: pd.Series, low: pd.Series, close: pd.Series, length: int = 14) -> pd.Series:
+    atr = AtrState(length).extend(high.to_numpy(dtype=float), low.to_numpy(dtype=float), close.to_numpy(dtype=float))
+    return pd.Series(atr, index=close.index)
+
+
+def get_pivot_flags(values: np.ndarray, pivot_lookback: int = 5, highest: bool = True) -> np.ndarray:
+    # values[i] equal to the max/min of the window centered on it, along the last axis; the
+    # first and last pivot_lookback values have no full window and are never pivots
+    values = np.asarray(values, dtype=float)
+    size = values.shape[-1]
+    flags = np.zeros(values.shape, dtype=bool)
+
+    extreme = rolling_extreme(values, 2 * pivot_lookback + 1, highest)
+    if size > 2 * pivot_lookback:
+        flags[..., pivot_lookback:size - pivot_lookback] = values[..., pivot_lookback:size - pivot_lookback] \
+            == extreme[..., 2 * pivot_lookback:]
+
+    return flags
+
+
+def compute_pivots(df: pd.DataFrame, pivot_lookback: int = 5) -> pd.DataFrame:
+    rsi = df['rsi'].to_numpy(dtype=float)
+
+    return pd.DataFrame({
+        'rsi_pivot_high': get_pivot_flags(rsi, pivot_lookback, highest=True),
+        'rsi_pivot_low': get_pivot_flags(rsi, pivot_lookback, highest=False),
+        'pivot_high': get_pivot_flags(df['high'].to_numpy(dtype=float), pivot_lookback, highest=True),
+        'pivot_low': get_pivot_flags(df['low'].to_numpy(dtype=float), pivot_lookback, highest=False)
+    }, index=df.index)
+
+
+def compute_features(rates: np.ndarray, atr_length: int = 14, pivot_lookback: int = 5) -> pd.DataFrame:
+    # Whole-history version of the columns FeatureStream produces, for offline tools
+    df = pd.DataFrame(rates)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+
+    df['rsi'] = compute_rsi(df['close'])
+    df['atr'] = compute_atr(df['high'], df['low'], df['close'], atr_length)
+
+    df.dropna(inplace=True)
+
+    df[PIVOT_COLUMNS] = compute_pivots(df, pivot_lookback)
+
+    return df
+
+
+def _wilder_batch(values: np.ndarray, counts: np.ndarray, length: int) -> np.ndarray:
+    # WilderAverage.extend for each row of a block whose leading values (counts < 1) are zeros
+    # that must not count: they add nothing to the numerator and no weight to the denominator
+    decay = 1 - 1 / length
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average = decayed_sums(values, decay) / decayed_sums((counts >= 1).astype(float), decay)
+    average[counts < length] = np.nan
+    return average
+
+
+def compute_features_batch(high: np.ndarray,
+                           low: np.ndarray,
+                           close: np.ndarray,
+                           atr_length: int = 14,
+                           pivot_lookback: int = 5) -> dict:
+    # compute_features for a (symbols x bars) block aligned on the last bar, each row's shorter
+    # history left-padded with NaN, in one pass per column over the whole block. The bars
+    # compute_features drops while the indicators warm up stay in place with NaN indicators
+    # and no pivots; 'start' holds the column of each row's first kept bar.
+    high, low, close = (np.asarray(item, dtype=float) for item in (high, low, close))
+    size = close.shape[-1]
+
+    present = ~np.isnan(close)
+    first = np.where(present.any(axis=-1), np.argmax(present, axis=-1), size)[..., None]
+    # Per bar, how many changes from the previous close the row has seen so far
+    counts = np.arange(size) - first
+
+    previous = np.concatenate([close[..., :1], close[..., :-1]], axis=-1)
+    moved = counts >= 1
+    change = np.where(moved, close - previous, 0.)
+
+    gain = _wilder_batch(np.maximum(change, 0.), counts, RSI_LENGTH)
+    loss = _wilder_batch(np.abs(np.minimum(change, 0.)), counts, RSI_LENGTH)
+    total = gain + loss
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rsi = np.where(total != 0, 100 * gain / total, np.nan)
+
+    true_range = np.maximum.reduce([high - low, np.abs(high - previous), np.abs(previous - low)])
+    atr = _wilder_batch(np.where(moved, true_range, 0.), counts, atr_length)
+
+    start = first + max(RSI_LENGTH, atr_length)
+    kept = np.arange(size) >= start
+    rsi[~kept] = np.nan
+    atr[~kept] = np.nan
+
+    # Windows reaching into the dropped bars do not exist in the compute_features frame
+    framed = np.arange(size) >= start + pivot_lookback
+    sources = {'rsi_pivot_high': (rsi, True), 'rsi_pivot_low': (rsi, False),
+               'pivot_high': (high, True), 'pivot_low': (low, False)}
+
+    features = {'rsi': rsi, 'atr': atr, 'start': np.minimum(start[..., 0], size)}
+    for name, (values, highest) in sources.items():
+        features[name] = get_pivot_flags(values, pivot_lookback, highest) & framed
+
+    return features
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+
+from collections import deque
+from typing import List, Optional
+from metrics import registry
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    symbol TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    signal TEXT,
+    retcode INTEGER,
+    latency REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_symbol_time ON events (symbol, time);
+CREATE INDEX IF NOT EXISTS events_time ON events (time);
+CREATE INDEX IF NOT EXISTS events_signal ON events (signal) WHERE signal IS NOT NULL;
+'''
+
+# Kinds of event: a confirmed divergence, one timeframe filter's verdict, a signal that was
+# not traded and why, an order_send with its retcode and latency, and a recovery ladder
+# planned, extended or stopped
+SIGNAL = 'signal'
+FILTER = 'filter'
+REJECT = 'reject'
+ORDER = 'order'
+LADDER = 'ladder'
+
+
+def get_signal_id(symbol: str, divergence_type: int, bar_time) -> str:
+    # Ties the filter, reject, order and ladder events of a signal to it
+    return f'{symbol}:{divergence_type}:{bar_time}'
+
+
+class Journal:
+    # Append-only log of what the engines decided and sent, in a SQLite file in WAL mode.
+    # record() only appends to a queue; a writer thread inserts the queued events in one
+    # transaction every interval seconds, so the trading threads never wait on the disk.
+    # Rows are never updated. Queries by symbol and time range use the indexes and read
+    # through their own connection while the writer commits. The file is created on the
+    # first record; past max_queue pending events new ones are dropped and counted.
+    def __init__(self, file_path: Optional[str] = None, interval: float = 0.5, max_queue: int = 100_000):
+        self.file_path = file_path or os.path.join(os.getcwd(), 'journal.db')
+        self.interval = interval
+        self.max_queue = max_queue
+
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.written = 0
+        self.queued = 0
+        self.flushing = 0
+        self.closed = False
+        self.thread = None
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.file_path, timeout=30.)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _start(self):
+        # Called under the condition
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._write_loop, name='JournalWriter', daemon=True)
+            self.thread.start()
+
+    def record(self, kind: str, symbol: str = '', data: Optional[dict] = None, signal: Optional[str] = None,
+               retcode: Optional[int] = None, latency: Optional[float] = None):
+        row = (time.time(), symbol, kind, signal, retcode, latency, data)
+        with self.condition:
+            if self.closed:
+                return
+            if len(self.queue) >= self.max_queue:
+                registry.increment('journal_dropped', symbol)
+                return
+
+            self.queue.append(row)
+            self.queued += 1
+            self._start()
+            self.condition.notify()
+
+    def _write_loop(self):
+        try:
+            connection = self._connect()
+            connection.executescript(SCHEMA)
+        except sqlite3.Error as ex:
+            print(__class__.__name__ + ':', ex)
+            return
+
+        while 1:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+
+                if not self.queue:
+                    break
+
+                # Lets a burst of events gather into one transaction
+                self.condition.wait_for(lambda: self.closed or self.flushing, self.interval)
+                rows = list(self.queue)
+                self.queue.clear()
+
+            try:
+                with registry.span('journal_write'):
+                    with connection:
+                        connection.executemany(
+                            'INSERT INTO events (time, symbol, kind, signal, retcode, latency, data) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            [row[:6] + (json.dumps(row[6] or {}, default=str),) for row in rows])
+            except sqlite3.Error as ex:
+                print(__class__.__name__ + ':', ex)
+
+            with self.condition:
+                self.written += len(rows)
+                self.condition.notify_all()
+
+        connection.close()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # Waits until every event recorded so far is committed
+        with self.condition:
+            if self.thread is None:
+                return True
+            target = self.queued
+            self.flushing += 1
+            self.condition.notify_all()
+            try:
+                return self.condition.wait_for(lambda: self.written >= target or not self.thread.is_alive(), timeout)
+            finally:
+                self.flushing -= 1
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            thread = self.thread
+
+        if thread is not None:
+            thread.join()
+
+    def query(self,
+              symbol: Optional[str] = None,
+              start: Optional[float] = None,
+              end: Optional[float] = None,
+              kind: Optional[str] = None,
+              signal: Optional[str] = None,
+              limit: Optional[int] = None) -> List[dict]:
+        # Events in time order; start and end are local epoch seconds, end excluded
+        clauses = []
+        values = []
+        for column, operator, value in (('symbol', '=', symbol), ('time', '>=', start), ('time', '<', end),
+                                        ('kind', '=', kind), ('signal', '=', signal)):
+            if value is not None:
+                clauses.append(f'{column} {operator} ?')
+                values.append(value)
+
+        sql = 'SELECT id, time, symbol, kind, signal, retcode, latency, data FROM events'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY time, id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            values.append(limit)
+
+        if not os.path.exists(self.file_path):
+            return []
+
+        connection = self._connect()
+        try:
+            rows = connection.execute(sql, values).fetchall()
+        except sqlite3.OperationalError:
+            # Nothing was written yet
+            return []
+        finally:
+            connection.close()
+
+        columns = ['id', 'time', 'symbol', 'kind', 'signal', 'retcode', 'latency', 'data']
+        events = [dict(zip(columns, row)) for row in rows]
+        for event in events:
+            event['data'] = json.loads(event['data'])
+        return events
+
+
+journal = Journal()
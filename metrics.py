@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import threading
+
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+QUANTILES = [0.5, 0.9, 0.99, 0.999]
+
+
+class Histogram:
+    # Log-linear buckets over whole microseconds, as HdrHistogram does with two significant
+    # digits: exact below 128 us, then 64 buckets per power of two (under 1.6 % error).
+    # Buckets are kept sparse, so an idle symbol costs nothing.
+    SUB_BUCKETS = 64
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        if value < 2 * cls.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - 7
+        return cls.SUB_BUCKETS * shift + (value >> shift)
+
+    @classmethod
+    def _lower_bound(cls, index: int) -> int:
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.SUB_BUCKETS - 1
+        return (index - cls.SUB_BUCKETS * shift) << shift
+
+    def record(self, seconds: float):
+        value = max(int(seconds * 1e6), 0)
+        index = self._index(value)
+
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.
+
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._lower_bound(index) / 1e6, self.max)
+
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min or 0.,
+            'max': self.max or 0.,
+            **{f'p{q * 100:g}': self.quantile(q) for q in QUANTILES}
+        }
+
+
+class Metrics:
+    # Per-symbol timing histograms keyed by stage, plus labelled counters
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Counter = Counter()
+        self.started_at = time.time()
+
+    def observe(self, stage: str, symbol: str, seconds: float):
+        with self.lock:
+            histogram = self.histograms.get((stage, symbol))
+            if histogram is None:
+                histogram = self.histograms[(stage, symbol)] = Histogram()
+            histogram.record(seconds)
+
+    @contextmanager
+    def span(self, stage: str, symbol: str = ''):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, symbol, time.perf_counter() - start)
+
+    def increment(self, name: str, symbol: str = '', value: int = 1, **labels):
+        key = (name, symbol, tuple(sorted((key, str(item)) for key, item in labels.items())))
+        with self.lock:
+            self.counters[key] += value
+
+    def summary(self) -> dict:
+        with self.lock:
+            histograms = {f'{stage}|{symbol}': histogram.summary() for (stage, symbol), histogram in self.histograms.items()}
+            counters = {
+                '|'.join([name, symbol] + [f'{key}={value}' for key, value in labels]): count
+                for (name, symbol, labels), count in self.counters.items()
+            }
+
+        return {
+            'time': time.time(),
+            'uptime': time.time() - self.started_at,
+            'histograms': histograms,
+            'counters': counters
+        }
+
+    def to_prometheus(self, prefix: str = 'trader') -> str:
+        lines = []
+
+        with self.lock:
+            stages = sorted({stage for stage, _ in self.histograms})
+            for stage in stages:
+                name = f'{prefix}_{stage}_seconds'
+                lines.append(f'# TYPE {name} summary')
+
+                for (item_stage, symbol), histogram in sorted(self.histograms.items()):
+                    if item_stage != stage:
+                        continue
+                    for q in QUANTILES:
+                        lines.append(f'{name}{{symbol="{symbol}",quantile="{q}"}} {histogram.quantile(q):.6f}')
+                    lines.append(f'{name}_sum{{symbol="{symbol}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{symbol="{symbol}"}} {histogram.count}')
+
+            names = sorted({name for name, _, _ in self.counters})
+            for counter_name in names:
+                name = f'{prefix}_{counter_name}_total'
+                lines.append(f'# TYPE {name} counter')
+
+                for (item_name, symbol, labels), count in sorted(self.counters.items()):
+                    if item_name != counter_name:
+                        continue
+                    label_text = ','.join([f'symbol="{symbol}"'] + [f'{key}="{value}"' for key, value in labels])
+                    lines.append(f'{name}{{{label_text}}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = Metrics()
+
+
+class MetricsServer:
+    # Serves registry.to_prometheus() on http://host:port/metrics from a daemon thread
+    def __init__(self, metrics: Metrics = registry, host: str = '127.0.0.1', port: int = 9108):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='MetricsServer', daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SummaryWriter:
+    # Rewrites file_path with registry.summary() every interval seconds (temp file + rename)
+    def __init__(self, metrics: Metrics = registry, file_path: Optional[str] = None, interval: float = 60.):
+        self.metrics = metrics
+        self.file_path = file_path or os.path.join(os.getcwd(), 'metrics.json')
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='SummaryWriter', daemon=True)
+
+    def write(self):
+        temp_path = self.file_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.metrics.summary(), file, indent=4)
+        os.replace(temp_path, self.file_path)
+
+    def save(self):
+        try:
+            self.write()
+        except OSError as ex:
+            print(__class__.__name__ + ':', ex)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.save()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.save()
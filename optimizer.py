@@ -0,0 +1,249 @@
+import itertools
+import numpy as np
+import pandas as pd
+import detector
+import indicators
+
+from typing import Dict, List, Optional, Tuple
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import ProcessPoolExecutor
+from pydantic import ValidationError
+from backtest import Backtester
+from windows.models import TradingStrategyConfig
+
+
+SWEEP_FIELDS = ['pivot_lookback', 'pivot_distance', 'atr_length', 'atr_multiplier',
+                'risk_reward', 'sl_min_price', 'sl_max_price']
+METRIC_COLUMNS = ['net_profit', 'max_drawdown', 'profit_to_drawdown', 'profit_factor',
+                  'trades', 'cycles', 'winning_cycles', 'max_depth', 'max_volume', 'rejected_orders']
+
+
+class FeatureCache:
+    # Per-process memo of the indicator columns: RSI once, ATR once per atr_length,
+    # pivot flags once per pivot_lookback and the signal table once per distinct
+    # (atr_length, pivot_lookback, pivot_distance). The price columns are views on rates,
+    # which in a worker is the SharedMemory block, so only derived columns are allocated.
+    def __init__(self, rates: np.ndarray):
+        self.rates = rates
+        self.columns = {name: rates[name] for name in ('open', 'high', 'low', 'close', 'spread') if name in rates.dtype.names}
+        self.columns['time'] = rates['time'].view('datetime64[s]')
+
+        self.rsi = indicators.RsiState().extend(rates['close'])
+        self.atr = {}
+        self.pivots = {}
+        self.signals = {}
+        self.frame_key = None
+        self.frame = None
+
+    def get_atr(self, atr_length: int) -> np.ndarray:
+        if atr_length not in self.atr:
+            self.atr[atr_length] = indicators.AtrState(atr_length).extend(self.rates['high'], self.rates['low'], self.rates['close'])
+        return self.atr[atr_length]
+
+    def get_pivots(self, pivot_lookback: int) -> Dict[str, np.ndarray]:
+        # Flags over the bars that have an RSI, as compute_pivots sees them after dropna
+        if pivot_lookback not in self.pivots:
+            start = indicators.RSI_LENGTH
+            sources = {'rsi_pivot_high': (self.rsi, True), 'rsi_pivot_low': (self.rsi, False),
+                       'pivot_high': (self.columns['high'], True), 'pivot_low': (self.columns['low'], False)}
+
+            pivots = {}
+            for name, (values, highest) in sources.items():
+                pivots[name] = np.zeros(len(self.rates), dtype=bool)
+                pivots[name][start:] = indicators.get_pivot_flags(values[start:], pivot_lookback, highest)
+            self.pivots[pivot_lookback] = pivots
+        return self.pivots[pivot_lookback]
+
+    def get_frame(self, atr_length: int, pivot_lookback: int) -> pd.DataFrame:
+        key = (atr_length, pivot_lookback)
+        if key == self.frame_key:
+            return self.frame
+
+        atr = self.get_atr(atr_length)
+        kept = ~(np.isnan(self.rsi) | np.isnan(atr))
+        warmup = max(indicators.RSI_LENGTH, atr_length)
+
+        if not kept[:warmup].any() and kept[warmup:].all():
+            # Only the warmup prefix is dropped: the frame is slices of the columns, and the flags
+            # computed once per lookback equal a fresh rolling pass except for the first bars,
+            # whose window now starts before the frame
+            rows = slice(warmup, None)
+            index = pd.RangeIndex(warmup, len(self.rates))
+            pivots = {}
+            for name, flags in self.get_pivots(pivot_lookback).items():
+                pivots[name] = flags[rows].copy()
+                pivots[name][:pivot_lookback] = False
+        else:
+            rows = np.flatnonzero(kept)
+            index = pd.Index(rows)
+            pivots = {
+                'rsi_pivot_high': indicators.get_pivot_flags(self.rsi[rows], pivot_lookback, True),
+                'rsi_pivot_low': indicators.get_pivot_flags(self.rsi[rows], pivot_lookback, False),
+                'pivot_high': indicators.get_pivot_flags(self.columns['high'][rows], pivot_lookback, True),
+                'pivot_low': indicators.get_pivot_flags(self.columns['low'][rows], pivot_lookback, False)
+            }
+
+        columns = {name: values[rows] for name, values in self.columns.items()}
+        columns.update(rsi=self.rsi[rows], atr=atr[rows], **pivots)
+        df = pd.DataFrame(columns, index=index, copy=False)
+
+        self.frame_key = key
+        self.frame = df
+
+        return df
+
+    def get_signals(self, atr_length: int, pivot_lookback: int, pivot_distance: int) -> pd.DataFrame:
+        key = (atr_length, pivot_lookback, pivot_distance)
+        if key not in self.signals:
+            df = self.get_frame(atr_length, pivot_lookback)
+            self.signals[key] = detector.scan_divergences(df, pivot_lookback, pivot_distance)
+        return self.signals[key]
+
+
+_shared_memory: Optional[SharedMemory] = None
+_cache: Optional[FeatureCache] = None
+_options: dict = {}
+
+
+def _attach(name: str, dtype: np.dtype, size: int, options: dict):
+    global _shared_memory, _cache, _options
+
+    _shared_memory = SharedMemory(name=name)
+    rates = np.ndarray((size,), dtype=dtype, buffer=_shared_memory.buf)
+
+    _cache = FeatureCache(rates)
+    _options = options
+
+
+def _metrics(result) -> dict:
+    equity = result.equity
+    net_profit = float(equity.iloc[-1] - equity.iloc[0]) if len(equity) else 0.
+    max_drawdown = float(result.drawdown.min()) if len(equity) else 0.
+
+    gains = result.trades.loc[result.trades['profit'] > 0, 'profit'].sum()
+    losses = -result.trades.loc[result.trades['profit'] < 0, 'profit'].sum()
+
+    return {
+        'net_profit': net_profit,
+        'max_drawdown': max_drawdown,
+        'profit_to_drawdown': net_profit / -max_drawdown if max_drawdown < 0 else np.inf if net_profit > 0 else 0.,
+        'profit_factor': gains / losses if losses else np.inf if gains else 0.,
+        'trades': len(result.trades),
+        'cycles': len(result.cycles),
+        'winning_cycles': int((result.cycles['profit'] > 0).sum()),
+        'max_depth': int(result.cycles['depth'].max()) if len(result.cycles) else 0,
+        'max_volume': float(result.cycles['max_volume'].max()) if len(result.cycles) else 0.,
+        'rejected_orders': result.rejected_orders
+    }
+
+
+def _evaluate(combinations: List[Tuple[dict, TradingStrategyConfig]]) -> List[dict]:
+    results = []
+
+    for params, strategy_config in combinations:
+        df = _cache.get_frame(strategy_config.atr_length, strategy_config.pivot_lookback)
+        signals = _cache.get_signals(strategy_config.atr_length, strategy_config.pivot_lookback, strategy_config.pivot_distance)
+
+        backtester = Backtester(df, strategy_config,
+                                point=_options['point'],
+                                contract_size=_options['contract_size'],
+                                initial_balance=_options['initial_balance'])
+
+        results.append({**params, **_metrics(backtester.run(signals))})
+
+    return results
+
+
+def grid(space: Dict[str, list]) -> List[dict]:
+    names = list(space)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+    return [item for item in combinations
+            if item.get('sl_min_price', -np.inf) < item.get('sl_max_price', np.inf)]
+
+
+def random_samples(space: Dict[str, list], samples: int, seed: int = 0) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    combinations = {}
+
+    for _ in range(samples * 10):
+        if len(combinations) == samples:
+            break
+
+        item = {name: values[rng.integers(len(values))] for name, values in space.items()}
+        if item.get('sl_min_price', -np.inf) < item.get('sl_max_price', np.inf):
+            combinations[tuple(item.items())] = item
+
+    return list(combinations.values())
+
+
+def get_models(symbol: str, base_config: dict, combinations: List[dict]) -> List[Tuple[dict, TradingStrategyConfig]]:
+    # Each combination as the strategy config the live engine would load; a combination
+    # config.json would reject is left out of the sweep
+    models = []
+
+    for item in combinations:
+        try:
+            models.append((item, TradingStrategyConfig.model_validate({**base_config, **item, 'symbol': symbol})))
+        except ValidationError as ex:
+            print('optimize:', item, 'rejected:', ex.errors()[0]['msg'])
+
+    return models
+
+
+def optimize(rates: np.ndarray,
+             symbol: str,
+             base_config: dict,
+             combinations: List[dict],
+             point: float = 0.,
+             contract_size: float = 1.,
+             initial_balance: float = 10000.,
+             workers: Optional[int] = None,
+             rank_by: str = 'profit_to_drawdown',
+             chunk_size: int = 16) -> pd.DataFrame:
+    # base_config is the config.json entry of symbol; each combination overrides some of
+    # SWEEP_FIELDS. Combinations sharing indicator parameters are chunked together so each
+    # worker hits its cache.
+    def cache_key(item: Tuple[dict, TradingStrategyConfig]) -> tuple:
+        strategy_config = item[1]
+        return strategy_config.atr_length, strategy_config.pivot_lookback, strategy_config.pivot_distance
+
+    models = sorted(get_models(symbol, base_config, combinations), key=cache_key)
+    chunks = [models[i:i + chunk_size] for i in range(0, len(models), chunk_size)]
+
+    rates = np.ascontiguousarray(rates)
+    shared_memory = SharedMemory(create=True, size=max(rates.nbytes, 1))
+    try:
+        np.ndarray(rates.shape, dtype=rates.dtype, buffer=shared_memory.buf)[:] = rates
+
+        options = {
+            'point': point,
+            'contract_size': contract_size,
+            'initial_balance': initial_balance
+        }
+
+        results = []
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_attach,
+                                 initargs=(shared_memory.name, rates.dtype, len(rates), options)) as executor:
+            for chunk_results in executor.map(_evaluate, chunks):
+                results.extend(chunk_results)
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+    results = pd.DataFrame(results, columns=list(dict.fromkeys(name for item, _ in models for name in item)) + METRIC_COLUMNS)
+
+    return results.sort_values(rank_by, ascending=False, ignore_index=True)
+
+
+def to_config_entry(results: pd.DataFrame, base_config: dict, rank: int = 0) -> dict:
+    # A config.json value for the symbol with the swept fields of the given rank applied
+    row = results.iloc[rank]
+    entry = dict(base_config)
+
+    for name in SWEEP_FIELDS:
+        if name in row:
+            entry[name] = type(base_config[name])(row[name]) if name in base_config else row[name].item()
+
+    return entry
@@ -0,0 +1,186 @@
+import time
+import threading
+
+from collections import deque, Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from metrics import registry
+from journal import journal, ORDER
+
+
+@dataclass
+class OrderRequest:
+    key: tuple
+    request: dict
+    attempts: int = 0
+    not_before: float = 0.
+    queued_at: float = 0.
+
+
+@dataclass
+class OrderRecord:
+    key: tuple
+    action: int
+    retcode: Optional[int]
+    attempts: int
+    latency: float
+    wait: float
+
+
+class OrderPipeline:
+    # Queue of TP/SL modifications and pending-order removals sent by one background thread.
+    # Callers state the levels they want per ticket; a request is only queued when that differs
+    # from the account mirror and from what was just sent. A newer request for the same ticket
+    # replaces a queued one. Requotes and busy retcodes are retried with exponential backoff,
+    # and each send is timed.
+    def __init__(self,
+                 broker,
+                 account,
+                 max_attempts: int = 4,
+                 backoff: float = 0.25,
+                 confirm_timeout: float = 5.,
+                 history: int = 1000):
+        self.broker = broker
+        self.account = account
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.confirm_timeout = confirm_timeout
+
+        self.retry_retcodes = {
+            broker.TRADE_RETCODE_REQUOTE,
+            broker.TRADE_RETCODE_PRICE_CHANGED,
+            broker.TRADE_RETCODE_PRICE_OFF,
+            broker.TRADE_RETCODE_TIMEOUT,
+            broker.TRADE_RETCODE_TOO_MANY_REQUESTS,
+            broker.TRADE_RETCODE_CONNECTION
+        }
+
+        self.condition = threading.Condition()
+        self.queue: 'OrderedDict[tuple, OrderRequest]' = OrderedDict()
+        self.sent = {}
+        self.records = deque(maxlen=history)
+        self.counters = Counter()
+
+        self.worker = threading.Thread(target=self._run, name='OrderPipeline', daemon=True)
+        self.worker.start()
+
+    def _is_sent(self, key: tuple, value: tuple) -> bool:
+        # Sent recently but not yet visible in the account snapshot
+        sent = self.sent.get(key)
+        return sent is not None and sent[0] == value and time.monotonic() - sent[1] < self.confirm_timeout
+
+    def submit(self, key: tuple, request: dict, value: tuple = ()) -> bool:
+        with self.condition:
+            queued = self.queue.get(key)
+            if queued is not None and queued.request == request:
+                return False
+
+            if self._is_sent(key, value):
+                return False
+
+            self.queue[key] = OrderRequest(key, request, queued_at=time.monotonic())
+            self.queue.move_to_end(key)
+            self.counters['queued'] += 1
+            self.condition.notify()
+
+            return True
+
+    def modify_position(self, position, sl: float = 0., tp: float = 0.) -> bool:
+        # Like the terminal, a level left out of an SLTP request is cleared, so both are always sent
+        if (position.sl, position.tp) == (sl, tp):
+            self.counters['unchanged'] += 1
+            return False
+
+        request = {
+            'action': self.broker.TRADE_ACTION_SLTP,
+            'position': position.ticket,
+            'symbol': position.symbol,
+            'sl': sl,
+            'tp': tp
+        }
+        return self.submit(('position', position.ticket), request, (sl, tp))
+
+    def remove_order(self, order) -> bool:
+        request = {
+            'action': self.broker.TRADE_ACTION_REMOVE,
+            'order': order.ticket
+        }
+        return self.submit(('order', order.ticket), request)
+
+    def pending(self) -> int:
+        with self.condition:
+            return len(self.queue)
+
+    def stats(self) -> dict:
+        with self.condition:
+            latencies = sorted(record.latency for record in self.records)
+
+        return {
+            **self.counters,
+            'pending': self.pending(),
+            'latency_p50': latencies[len(latencies) // 2] if latencies else 0.,
+            'latency_max': latencies[-1] if latencies else 0.
+        }
+
+    def _next(self) -> OrderRequest:
+        with self.condition:
+            while 1:
+                now = time.monotonic()
+                ready = [item for item in self.queue.values() if item.not_before <= now]
+                if ready:
+                    item = ready[0]
+                    self.queue.pop(item.key)
+                    return item
+
+                timeout = min(item.not_before for item in self.queue.values()) - now if self.queue else None
+                self.condition.wait(timeout)
+
+    def _send(self, item: OrderRequest):
+        item.attempts += 1
+
+        start = time.perf_counter()
+        result = self.broker.order_send(item.request)
+        latency = time.perf_counter() - start
+
+        retcode = result.retcode if result is not None else None
+        self.counters['sent'] += 1
+        self.counters[f'retcode_{retcode}'] += 1
+
+        symbol = item.request.get('symbol', '')
+        registry.observe('order_send', symbol, latency)
+        registry.increment('retcodes', symbol, retcode=retcode)
+        journal.record(ORDER, symbol, {'request': dict(item.request), 'attempt': item.attempts}, retcode=retcode, latency=latency)
+
+        with self.condition:
+            self.records.append(OrderRecord(item.key, item.request['action'], retcode, item.attempts, latency,
+                                            time.monotonic() - item.queued_at))
+
+            if retcode == self.broker.TRADE_RETCODE_DONE:
+                if len(self.sent) >= self.records.maxlen:
+                    self.sent = {key: value for key, value in self.sent.items()
+                                 if time.monotonic() - value[1] < self.confirm_timeout}
+
+                self.sent[item.key] = ((item.request.get('sl', 0.), item.request.get('tp', 0.))
+                                       if item.request['action'] == self.broker.TRADE_ACTION_SLTP else (),
+                                       time.monotonic())
+                self.account.invalidate()
+                return
+
+            if (retcode is None or retcode in self.retry_retcodes) and item.attempts < self.max_attempts \
+                    and item.key not in self.queue:
+                item.not_before = time.monotonic() + self.backoff * 2 ** (item.attempts - 1)
+                self.queue[item.key] = item
+                self.counters['retried'] += 1
+                return
+
+            self.counters['failed'] += 1
+
+        print(__class__.__name__ + ':', item.request, result)
+
+    def _run(self):
+        while 1:
+            item = self._next()
+            try:
+                self._send(item)
+            except Exception as ex:
+                print(__class__.__name__ + ':', repr(ex))
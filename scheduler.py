@@ -0,0 +1,102 @@
+import time
+import heapq
+import itertools
+
+from typing import Dict, List, Optional
+
+
+TIMEFRAME_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '4h': 14400,
+    '1d': 86400
+}
+
+
+def get_next_bar_close(bar_time: int, timeframe: str) -> int:
+    # Close time, in server seconds, of the bar that contains bar_time
+    period = TIMEFRAME_SECONDS[timeframe]
+    return (int(bar_time) // period + 1) * period
+
+
+class ServerClock:
+    # Bar and tick times are in the broker's server time zone. The offset to the local clock
+    # is estimated from the newest tick seen on any symbol and rounded to half an hour, which
+    # absorbs the age of that tick; stale ticks of closed markets are ignored.
+    def __init__(self, resolution: int = 1800):
+        self.resolution = resolution
+        self.offset: Optional[int] = None
+        self.last_time = None
+
+    def observe(self, server_time: int):
+        if self.last_time is not None and server_time < self.last_time:
+            return
+
+        self.last_time = int(server_time)
+        self.offset = round((self.last_time - time.time()) / self.resolution) * self.resolution
+
+    def now(self) -> float:
+        return time.time() + (self.offset or 0)
+
+    def to_local(self, server_time: float) -> float:
+        return server_time - (self.offset or 0)
+
+
+class BarScheduler:
+    # Min-heap of (due, sequence, symbol) in local epoch seconds. Each symbol has one live
+    # entry; rescheduling pushes a new one and the old one is dropped when it surfaces.
+    def __init__(self):
+        self.queue = []
+        self.due: Dict[str, float] = {}
+        self.counter = itertools.count()
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.due
+
+    def __len__(self) -> int:
+        return len(self.due)
+
+    def symbols(self) -> List[str]:
+        return list(self.due)
+
+    def schedule(self, symbol: str, due: float):
+        self.due[symbol] = due
+        heapq.heappush(self.queue, (due, next(self.counter), symbol))
+
+    def remove(self, symbol: str):
+        self.due.pop(symbol, None)
+
+    def _discard_stale(self):
+        while self.queue:
+            due, _, symbol = self.queue[0]
+            if self.due.get(symbol) == due:
+                return
+            heapq.heappop(self.queue)
+
+    def get_next_due(self) -> Optional[float]:
+        self._discard_stale()
+        return self.queue[0][0] if self.queue else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        symbols = []
+
+        while 1:
+            self._discard_stale()
+            if not self.queue or self.queue[0][0] > now:
+                break
+
+            _, _, symbol = heapq.heappop(self.queue)
+            self.due.pop(symbol)
+            symbols.append(symbol)
+
+        return symbols
+
+    def get_wait(self, now: Optional[float] = None, limit: float = 1.) -> float:
+        # Seconds until the next entry is due, capped so callers still notice config changes
+        now = time.time() if now is None else now
+        due = self.get_next_due()
+        return limit if due is None else min(max(due - now, 0.), limit)
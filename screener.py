@@ -0,0 +1,259 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+import detector
+import indicators
+
+from typing import Dict, List, Optional
+from bar_store import BarStore
+from brokers import Broker, MT5Broker
+from metrics import registry
+
+
+TIMEFRAMES = {
+    '1m': Broker.TIMEFRAME_M1,
+    '5m': Broker.TIMEFRAME_M5,
+    '15m': Broker.TIMEFRAME_M15,
+    '30m': Broker.TIMEFRAME_M30,
+    '1h': Broker.TIMEFRAME_H1,
+    '4h': Broker.TIMEFRAME_H4,
+    '1d': Broker.TIMEFRAME_D1
+}
+
+# A signal is what detect_divergence confirms on the bar that just closed, the executor would
+# enter it now; a setup is what detect_divergence_setups arms, waiting for its trigger
+SIGNAL = 'signal'
+SETUP = 'setup'
+
+SETUP_COLUMNS = ['symbol', 'status', 'divergence_type', 'time', 'close', 'atr', 'trigger', 'distance',
+                 'rsi_start', 'rsi_end', 'rsi_gap', 'price_start', 'price_end', 'price_gap']
+
+
+class Screener:
+    # Looks for RSI divergences across a whole symbol universe at once. The last count bars of
+    # every symbol (closed bars kept in the BarStore, so a rescreen only pulls what is new)
+    # are packed into one (symbols x bars) block aligned on the forming bar, the indicators and
+    # pivots are computed with one array pass per column over the block, and only the rows the
+    # vectorized checks of the detector leave over reach its per-symbol kernel. Each row sees
+    # the frame OrderExecutorThread.create_data_frame would build for it with the same count.
+    def __init__(self,
+                 broker: Broker,
+                 timeframe: str = '5m',
+                 count: int = 500,
+                 atr_length: int = 14,
+                 pivot_lookback: int = 5,
+                 pivot_distance: int = 9,
+                 bar_store: Optional[BarStore] = None):
+        self.broker = broker
+        self.timeframe = timeframe
+        self.count = count
+        self.atr_length = atr_length
+        self.pivot_lookback = pivot_lookback
+        self.pivot_distance = pivot_distance
+        self.bar_store = bar_store or BarStore()
+
+    def get_symbols(self, group: Optional[str] = None) -> List[str]:
+        # group is passed to symbols_get as is, e.g. '*USD*,!*JPY*'; symbols that cannot be
+        # traded at all are left out
+        symbols = self.broker.symbols_get(group=group) if group else self.broker.symbols_get()
+        if symbols is None:
+            print(__class__.__name__ + ':', 'symbols_get failed', self.broker.last_error())
+            return []
+
+        return [item.name for item in symbols
+                if getattr(item, 'trade_mode', self.broker.SYMBOL_TRADE_MODE_FULL) != self.broker.SYMBOL_TRADE_MODE_DISABLED]
+
+    def fetch(self, symbol: str) -> Optional[np.ndarray]:
+        timeframe = TIMEFRAMES[self.timeframe]
+        forming = self.bar_store.sync(symbol, timeframe, self.broker.copy_rates_from_pos, self.count)
+        if forming is None or len(forming) == 0:
+            return None
+
+        closed = self.bar_store.rates(symbol, timeframe, count=self.count - 1)
+        return np.concatenate([closed, forming]) if len(closed) else forming
+
+    def pack(self, rates: List[np.ndarray]) -> Dict[str, np.ndarray]:
+        # Rows shorter than count are left-padded with NaN prices and NaT times
+        shape = (len(rates), self.count)
+        block = {name: np.full(shape, np.nan) for name in ('high', 'low', 'close')}
+        block['time'] = np.full(shape, np.datetime64('NaT'), dtype='datetime64[s]')
+
+        for row, item in enumerate(rates):
+            item = item[-self.count:]
+            for name in ('high', 'low', 'close'):
+                block[name][row, self.count - len(item):] = item[name]
+            block['time'][row, self.count - len(item):] = item['time'].astype('datetime64[s]')
+
+        return block
+
+    def screen(self, symbols: Optional[List[str]] = None, group: Optional[str] = None) -> pd.DataFrame:
+        # Live signals and setups, one row each (SETUP_COLUMNS), signals first, then nearest
+        # to the trigger first. distance is how far the forming bar's close still has to move
+        # to cross the trigger, in ATRs (negative once beyond it); rsi_gap is the RSI
+        # difference between the two pivots and price_gap the price difference in ATRs.
+        symbols = self.get_symbols(group) if symbols is None else symbols
+
+        names = []
+        rates = []
+        with registry.span('screen_fetch'):
+            for symbol in symbols:
+                item = self.fetch(symbol)
+                if item is not None and len(item) > 1:
+                    names.append(symbol)
+                    rates.append(item)
+
+        if not names:
+            return pd.DataFrame(columns=SETUP_COLUMNS)
+
+        with registry.span('screen_indicators'):
+            block = self.pack(rates)
+            features = indicators.compute_features_batch(block['high'], block['low'], block['close'],
+                                                         self.atr_length, self.pivot_lookback)
+
+            # The bars compute_features would drop are padding to the detector
+            dropped = np.arange(self.count) < features['start'][:, None]
+            for name in ('high', 'low', 'close'):
+                block[name][dropped] = np.nan
+            block['time'][dropped] = np.datetime64('NaT')
+
+        with registry.span('screen_detect'):
+            arguments = [block['time'], block['high'], block['low']]
+            flags = [features[name] for name in ('pivot_high', 'pivot_low', 'rsi_pivot_high', 'rsi_pivot_low')]
+            signals = detector.detect_divergence_batch(*arguments, block['close'], features['rsi'], *flags,
+                                                       max_pivot_distance=self.pivot_distance)
+            setups = detector.detect_divergence_setups_batch(*arguments, features['rsi'], *flags,
+                                                             max_pivot_distance=self.pivot_distance)
+
+        records = []
+        for row, symbol in enumerate(names):
+            found = [(SIGNAL, signals[row], self.get_trigger(block, features, row, signals[row].divergence_type))] \
+                if signals[row] is not None else []
+            # A setup on the side that just confirmed is the same divergence
+            found += [(SETUP, item.signal, item.trigger) for item in setups[row]
+                      if not found or item.signal.divergence_type != found[0][1].divergence_type]
+
+            for status, signal, trigger in found:
+                records.append(self.get_record(symbol, status, signal, trigger,
+                                               float(block['close'][row, -1]), float(features['atr'][row, -1])))
+
+        df = pd.DataFrame(records, columns=SETUP_COLUMNS)
+        order = df['status'].map({SIGNAL: 0, SETUP: 1})
+        df = df.assign(order=order, nearest=df['distance'].abs())
+        df = df.sort_values(['order', 'nearest', 'rsi_gap'], ascending=[True, True, False], kind='stable')
+
+        return df.drop(columns=['order', 'nearest']).reset_index(drop=True)
+
+    def get_trigger(self, block: Dict[str, np.ndarray], features: Dict[str, np.ndarray], row: int, divergence_type: int) -> float:
+        # The high of the last pivot low or the low of the last pivot high, as in the detector
+        if divergence_type == 0:
+            return float(block['high'][row, np.flatnonzero(features['pivot_low'][row])[-1]])
+        return float(block['low'][row, np.flatnonzero(features['pivot_high'][row])[-1]])
+
+    def get_record(self,
+                   symbol: str,
+                   status: str,
+                   signal: detector.DivergenceSignal,
+                   trigger: float,
+                   close: float,
+                   atr: float) -> dict:
+        bullish = signal.divergence_type == 0
+        price_start = float(signal.price_point.start[1])
+        price_end = float(signal.price_point.end[1])
+
+        return {
+            'symbol': symbol,
+            'status': status,
+            'divergence_type': signal.divergence_type,
+            'time': signal.rsi_point.end[0],
+            'close': close,
+            'atr': atr,
+            'trigger': trigger,
+            'distance': ((trigger - close) if bullish else (close - trigger)) / atr,
+            'rsi_start': float(signal.rsi_point.start[1]),
+            'rsi_end': float(signal.rsi_point.end[1]),
+            'rsi_gap': abs(float(signal.rsi_point.end[1]) - float(signal.rsi_point.start[1])),
+            'price_start': price_start,
+            'price_end': price_end,
+            'price_gap': abs(price_end - price_start) / atr
+        }
+
+
+def create_simulated_broker(symbols: int, timeframe: str, count: int, seed: int = 0) -> Broker:
+    # Enough M1 history for count bars of the timeframe on every synthetic symbol
+    from daemon import create_simulated_broker as create_broker
+
+    period = int(pd.Timedelta(timeframe).total_seconds()) // 60
+    return create_broker([f'SYN{i:03d}' for i in range(symbols)], history=(count + 1) * period, bars=1, seed=seed)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    environ = os.environ
+    parser = argparse.ArgumentParser(description='Lists the symbols that show an RSI divergence now.')
+    parser.add_argument('--group', help="symbols_get group filter, e.g. '*USD*,!*JPY*' (default: every symbol)")
+    parser.add_argument('--timeframe', choices=list(TIMEFRAMES), default='5m', help='default: %(default)s')
+    parser.add_argument('--bars', type=int, default=500, help='bars per symbol, as the executor fetches (default: %(default)s)')
+    parser.add_argument('--atr-length', type=int, default=14)
+    parser.add_argument('--pivot-lookback', type=int, default=5)
+    parser.add_argument('--pivot-distance', type=int, default=9)
+    parser.add_argument('--top', type=int, default=50, help='rows printed (default: %(default)s)')
+    parser.add_argument('--output', help='also write the whole list to this csv file')
+    parser.add_argument('--path', default=environ.get('TRADER_TERMINAL_PATH'),
+                        help='terminal64.exe of the MetaTrader 5 terminal (env TRADER_TERMINAL_PATH)')
+    parser.add_argument('--login', default=environ.get('TRADER_LOGIN'), help='account number (env TRADER_LOGIN)')
+    parser.add_argument('--password', default=environ.get('TRADER_PASSWORD'), help='account password (env TRADER_PASSWORD)')
+    parser.add_argument('--server', default=environ.get('TRADER_SERVER'), help='trade server (env TRADER_SERVER)')
+    parser.add_argument('--simulated', type=int, metavar='SYMBOLS',
+                        help='screen this many synthetic symbols on the simulated broker instead of a terminal')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the simulated data')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from daemon import get_initialize_arguments
+
+    args = create_parser().parse_args(argv)
+
+    directory = None
+    if args.simulated:
+        # Synthetic bars must not mix with the terminal's in the shared bar store
+        broker = create_simulated_broker(args.simulated, args.timeframe, args.bars, args.seed)
+        directory = tempfile.mkdtemp(prefix='screener')
+        bar_store = BarStore(directory)
+    else:
+        broker = MT5Broker()
+        bar_store = None
+
+    if not broker.initialize(**get_initialize_arguments(args)):
+        print('initialize failed:', broker.last_error(), file=sys.stderr)
+        return 1
+
+    try:
+        screener = Screener(broker, args.timeframe, args.bars, args.atr_length, args.pivot_lookback,
+                            args.pivot_distance, bar_store)
+
+        start = time.perf_counter()
+        symbols = screener.get_symbols(args.group)
+        df = screener.screen(symbols)
+        elapsed = time.perf_counter() - start
+
+        with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.5g}'.format):
+            print(df.head(args.top).to_string() if len(df) else 'no divergence')
+        print(f'{len(df)} setups in {len(symbols)} symbols, {elapsed:.2f}s')
+
+        if args.output:
+            df.to_csv(args.output, index=False)
+    finally:
+        broker.shutdown()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import math
+
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from windows.models import TradingStrategyConfig
+
+
+# Trading rules shared by the live threads and the offline tools. Position and
+# divergence types follow MT5: 0 is buy, 1 is sell.
+
+def get_take_profit_price(position_type: int, price_gap: float, risk_reward: float, entry: float) -> float:
+    price_gap = price_gap * risk_reward
+
+    take_profit = {
+        0: entry + price_gap,
+        1: entry - price_gap
+    }
+
+    return take_profit[position_type]
+
+
+def get_trade_volume(unit_factor: int, entry: float, stop_loss: float, risk_amount: float) -> float:
+    price_gap = abs(entry - stop_loss)
+    trade_volume = risk_amount / price_gap
+
+    if unit_factor != 0:
+        trade_volume = int(trade_volume)
+        trade_volume = trade_volume / unit_factor
+
+    minimum_volume = 0.01
+    trade_volume = round(trade_volume, 2) if trade_volume >= minimum_volume else minimum_volume
+
+    return trade_volume
+
+
+def get_stop_loss_gaps(strategy_config: 'TradingStrategyConfig',
+                       divergence_type: int,
+                       candidates: List[Tuple[float, float]]) -> List[float]:
+    gaps = []
+
+    for atr, entry in candidates:
+        stop_loss_mapping = {
+            0: entry - atr * strategy_config.atr_multiplier,
+            1: entry + atr * strategy_config.atr_multiplier
+        }
+        gaps.append(abs(entry - stop_loss_mapping[divergence_type]))
+
+    return gaps
+
+
+def get_filter_condition(prev_candle, current_candle) -> int:
+    # Liquidity sweep of the previous higher-timeframe candle: 0 allows buys, 1 sells, 2 neither
+    low_level_swept = current_candle['low'] < prev_candle['low'] and current_candle['close'] > prev_candle['low']
+    high_level_swept = current_candle['high'] > prev_candle['high'] and current_candle['close'] < prev_candle['high']
+
+    is_bullish_reversal = (current_candle['close'] < prev_candle['close']) or (current_candle['close'] < prev_candle['open'])
+    is_bearish_reversal = (current_candle['close'] > prev_candle['open']) or (current_candle['close'] > prev_candle['close'])
+
+    result = 2
+
+    if low_level_swept and is_bullish_reversal:
+        result = 0
+    elif high_level_swept and is_bearish_reversal:
+        result = 1
+
+    return result
+
+
+def determine_entry_and_stop_loss(strategy_config: 'TradingStrategyConfig',
+                                  divergence_type: int,
+                                  entry: float,
+                                  atr: float,
+                                  pivot_atr: float,
+                                  pivot_close: float) -> Optional[Tuple[float, float]]:
+    # The market entry with the last closed bar ATR comes first, the divergence pivot candle second.
+    # With sl_min/sl_max the gap is measured from the pivot candle close, as the live loop always has.
+    candidates = [(atr, entry), (pivot_atr, pivot_close)]
+    gaps = get_stop_loss_gaps(strategy_config, divergence_type, candidates)
+
+    if not strategy_config.use_sl_min_max:
+        gap = gaps[0]
+    else:
+        valid_gaps = list(filter(lambda x: strategy_config.sl_min_price < x < strategy_config.sl_max_price, gaps))
+        if not valid_gaps:
+            return None
+
+        gap = valid_gaps[-1] if len(valid_gaps) < 2 else max(valid_gaps)
+        entry = pivot_close
+
+    stop_loss_mapping = {
+        0: entry - gap,
+        1: entry + gap
+    }
+
+    return entry, stop_loss_mapping[divergence_type]
+
+
+def get_recovery_entry(first_position_type: int, lastest_position_type: int, first_price_open: float, stop_loss: float) -> float:
+    return stop_loss if lastest_position_type == first_position_type else first_price_open
+
+
+def get_recovery_volume(volumes: List[float]) -> float:
+    trade_volume = volumes[-1] * 2 if len(volumes) < 2 else volumes[-2] + volumes[-1]
+    return round(trade_volume, 2)
+
+
+def round_volume(volume: float, volume_step: float = 0.01, volume_min: float = 0.01) -> float:
+    decimals = max(0, -math.floor(math.log10(volume_step))) if volume_step < 1 else 0
+    return max(round(round(volume / volume_step) * volume_step, decimals), volume_min)
+
+
+def build_recovery_plan(first_position_type: int,
+                        first_price_open: float,
+                        first_volume: float,
+                        price_gap: float,
+                        risk_reward: float,
+                        volume_step: float = 0.01,
+                        volume_min: float = 0.01,
+                        volume_max: float = math.inf,
+                        contract_size: float = 1.,
+                        size: int = 30) -> List[dict]:
+    # The whole ladder RecoveryZoneThread walks once the first position is open. Step 0 is that
+    # position; every further step is the stop order placed when the previous one has filled,
+    # alternating direction between the stop loss and the first entry. worst_loss is what all
+    # steps up to this one lose at the price where the next step would trigger. The plan ends
+    # before the first volume the symbol does not accept.
+    stop_loss = first_price_open - price_gap if first_position_type == 0 else first_price_open + price_gap
+    first_volume = round_volume(first_volume, volume_step, volume_min)
+
+    steps = []
+    position_type = first_position_type
+    entry = first_price_open
+    volumes = [first_volume]
+
+    for depth in range(size):
+        if depth:
+            entry = get_recovery_entry(first_position_type, position_type, first_price_open, stop_loss)
+            position_type = 1 - position_type
+            volumes.append(round_volume(get_recovery_volume(volumes[-2:]), volume_step, volume_min))
+
+        if volumes[-1] > volume_max:
+            break
+
+        steps.append({
+            'depth': depth,
+            'type': position_type,
+            'entry': entry,
+            'volume': volumes[-1],
+            'take_profit': get_take_profit_price(position_type, price_gap, risk_reward, entry)
+        })
+
+    for index, step in enumerate(steps):
+        next_entry = get_recovery_entry(first_position_type, step['type'], first_price_open, stop_loss)
+        loss = 0.
+        net_volume = 0.
+
+        for item in steps[:index + 1]:
+            direction = 1 if item['type'] == 0 else -1
+            loss -= direction * (next_entry - item['entry']) * item['volume'] * contract_size
+            net_volume += direction * item['volume']
+
+        step['total_volume'] = round(sum(item['volume'] for item in steps[:index + 1]), 8)
+        step['net_volume'] = round(net_volume, 8)
+        step['worst_loss'] = loss
+
+    return steps
+
+
+def is_recovery_step_allowed(step: dict, max_depth: int = 0, max_loss: float = 0.) -> bool:
+    # A limit of 0 means no limit
+    if max_depth and step['depth'] > max_depth:
+        return False
+    if max_loss and step['worst_loss'] > max_loss:
+        return False
+    return True
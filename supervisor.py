@@ -0,0 +1,352 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import subprocess
+
+from typing import Dict, List, Optional
+
+
+DAEMON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'daemon.py')
+# Spans of one evaluation in the order executor; their total time per symbol is its cost
+EVALUATION_STAGES = ['rates_fetch', 'indicators', 'detect_divergence', 'filters', 'order_parameters']
+# Fields of a symbol's entry the engines write; everything else is owned by whoever edits config.json
+ENGINE_FIELDS = ['position', 'next_search_signal_time']
+
+
+def read_json(file_path: str) -> dict:
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_json(file_path: str, data: dict):
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=4)
+    os.replace(temp_path, file_path)
+
+
+def get_symbol_costs(summary: dict) -> Dict[str, float]:
+    # Seconds of evaluation work per second of uptime, by symbol, from a metrics.json summary
+    uptime = summary.get('uptime') or 0.
+    if uptime <= 0:
+        return {}
+
+    costs = {}
+    for key, histogram in summary.get('histograms', {}).items():
+        stage, _, symbol = key.partition('|')
+        if symbol and stage in EVALUATION_STAGES:
+            costs[symbol] = costs.get(symbol, 0.) + histogram['sum'] / uptime
+    return costs
+
+
+def partition(symbols: List[str], costs: Dict[str, float], shards: int) -> List[List[str]]:
+    # Longest processing time first: each symbol, most expensive first, goes to the shard
+    # with the least load. Symbols never measured count as the average measured one.
+    known = [costs[symbol] for symbol in symbols if symbol in costs]
+    default = sum(known) / len(known) if known else 1.
+
+    result = [[] for _ in range(shards)]
+    loads = [0.] * shards
+    for symbol in sorted(symbols, key=lambda item: (-costs.get(item, default), item)):
+        index = loads.index(min(loads))
+        result[index].append(symbol)
+        loads[index] += costs.get(symbol, default)
+
+    return result
+
+
+class Worker:
+    # One daemon.py process trading a shard of the symbols from its own directory, which
+    # holds its config.json, metrics.json, bar store and worker.log. terminal holds the
+    # path, login, password and server it attaches to; empty values use the defaults.
+    def __init__(self, index: int, directory: str, terminal: Optional[dict] = None, arguments: Optional[List[str]] = None):
+        self.index = index
+        self.directory = directory
+        self.terminal = terminal or {}
+        self.arguments = arguments or []
+        self.config_path = os.path.join(directory, 'config.json')
+        self.metrics_path = os.path.join(directory, 'metrics.json')
+
+        self.symbols: List[str] = []
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = None
+        self.restarts = 0
+        self.exit_code = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def get_command(self) -> List[str]:
+        command = [sys.executable, '-u', DAEMON_PATH, '--config', self.config_path]
+        for key in ('path', 'login', 'server'):
+            if self.terminal.get(key):
+                command += [f'--{key}', str(self.terminal[key])]
+        return command + self.arguments
+
+    def start(self):
+        # The password goes through the environment to stay out of the process list
+        env = dict(os.environ)
+        if self.terminal.get('password'):
+            env['TRADER_PASSWORD'] = str(self.terminal['password'])
+
+        with open(os.path.join(self.directory, 'worker.log'), 'a', encoding='utf-8') as log:
+            self.process = subprocess.Popen(self.get_command(), cwd=self.directory, env=env, stdout=log,
+                                            stderr=subprocess.STDOUT,
+                                            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0)
+        self.started_at = time.time()
+        self.exit_code = None
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self, timeout: float = 15.):
+        if not self.is_alive():
+            return
+
+        # daemon.py shuts down cleanly on SIGTERM, or CTRL_BREAK on Windows
+        self.process.send_signal(signal.CTRL_BREAK_EVENT if os.name == 'nt' else signal.SIGTERM)
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            print(__class__.__name__ + ':', self.index, 'did not stop, killing it')
+            self.process.kill()
+            self.process.wait()
+
+    def read_metrics(self) -> dict:
+        return read_json(self.metrics_path)
+
+    def get_status(self) -> dict:
+        return {
+            'index': self.index,
+            'pid': self.process.pid if self.process is not None else None,
+            'alive': self.is_alive(),
+            'uptime': time.time() - self.started_at if self.is_alive() else 0.,
+            'restarts': self.restarts,
+            'exit_code': self.exit_code,
+            'terminal': {key: value for key, value in self.terminal.items() if key != 'password'},
+            'symbols': self.symbols
+        }
+
+
+class Supervisor:
+    # Shards the symbols of config.json across one worker per terminal. While the workers run
+    # their shard files are the live config; they are merged back into config.json when the
+    # supervisor rebalances or stops, and symbols added to config.json meanwhile are picked up
+    # at the next rebalance. Every rebalance_interval seconds the measured per-symbol costs
+    # are repartitioned and, if the busiest shard is more than imbalance times the average and
+    # the new split is clearly better, all workers are restarted on the new shards. Crashed
+    # workers are restarted with a backoff; status.json holds the combined status and metrics.
+    def __init__(self,
+                 config_path: str,
+                 terminals: List[dict],
+                 directory: str,
+                 arguments: Optional[List[str]] = None,
+                 rebalance_interval: float = 3600.,
+                 imbalance: float = 1.25,
+                 status_interval: float = 10.,
+                 restart_delay: float = 5.):
+        self.config_path = config_path
+        self.directory = directory
+        self.rebalance_interval = rebalance_interval
+        self.imbalance = imbalance
+        self.status_interval = status_interval
+        self.restart_delay = restart_delay
+        self.status_path = os.path.join(directory, 'status.json')
+
+        arguments = (arguments or []) + ['--summary-interval', str(status_interval)]
+        self.workers = [Worker(index, os.path.join(directory, f'worker{index}'), terminal, arguments)
+                        for index, terminal in enumerate(terminals)]
+        self.costs: Dict[str, float] = {}
+        self.restart_at: Dict[int, float] = {}
+        self.stop_event = threading.Event()
+
+    def update_costs(self) -> Dict[str, float]:
+        # Latest measured costs; symbols of a worker that has not reported keep their last value
+        for worker in self.workers:
+            self.costs.update(get_symbol_costs(worker.read_metrics()))
+        return self.costs
+
+    def get_loads(self, shards: List[List[str]]) -> List[float]:
+        known = list(self.costs.values())
+        default = sum(known) / len(known) if known else 1.
+        return [sum(self.costs.get(symbol, default) for symbol in shard) for shard in shards]
+
+    def merge(self) -> dict:
+        # config.json with the ENGINE_FIELDS of its symbols taken from the shard files, which
+        # hold the live positions and signal times. Symbols deleted from config.json stay
+        # deleted and the other fields keep the edits made while the workers ran.
+        data = read_json(self.config_path)
+        for worker in self.workers:
+            for symbol, entry in read_json(worker.config_path).items():
+                if symbol in data:
+                    data[symbol].update((field, entry[field]) for field in ENGINE_FIELDS if field in entry)
+        write_json(self.config_path, data)
+        return data
+
+    def assign(self, data: dict):
+        shards = partition(list(data), self.costs, len(self.workers))
+        for worker, symbols in zip(self.workers, shards):
+            worker.symbols = symbols
+            write_json(worker.config_path, {symbol: data[symbol] for symbol in symbols})
+
+    def start(self):
+        self.update_costs()
+        self.assign(self.merge())
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stop_workers(self):
+        threads = [threading.Thread(target=worker.stop) for worker in self.workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def rebalance(self, force: bool = False) -> bool:
+        self.update_costs()
+        data = read_json(self.config_path)
+        assigned = {symbol for worker in self.workers for symbol in worker.symbols}
+
+        current = self.get_loads([worker.symbols for worker in self.workers])
+        proposed = self.get_loads(partition(sorted(assigned | set(data)), self.costs, len(self.workers)))
+        average = sum(current) / len(current)
+        unbalanced = average > 0 and max(current) > self.imbalance * average and max(proposed) < 0.9 * max(current)
+
+        if not (force or unbalanced or set(data) - assigned):
+            return False
+
+        print(__class__.__name__ + ':', 'rebalancing, shard loads', [round(load, 6) for load in current])
+        self.stop_workers()
+        self.restart_at.clear()
+        self.assign(self.merge())
+        for worker in self.workers:
+            worker.start()
+        return True
+
+    def check_workers(self):
+        now = time.time()
+        for worker in self.workers:
+            if worker.is_alive():
+                continue
+
+            if worker.index not in self.restart_at:
+                worker.exit_code = worker.process.returncode if worker.process is not None else None
+                # Doubles the delay for a worker that keeps crashing within a minute of its start
+                uptime = now - (worker.started_at or now)
+                worker.restarts += 1
+                failures = 0 if uptime > 60. else min(worker.restarts, 4)
+                self.restart_at[worker.index] = now + self.restart_delay * 2 ** failures
+                print(__class__.__name__ + ':', 'worker', worker.index, 'exited with', worker.exit_code)
+            elif now >= self.restart_at[worker.index]:
+                self.restart_at.pop(worker.index)
+                worker.start()
+
+    def get_status(self) -> dict:
+        counters = {}
+        histograms = {}
+        costs = self.update_costs()
+
+        for worker in self.workers:
+            summary = worker.read_metrics()
+            for key, count in summary.get('counters', {}).items():
+                counters[key] = counters.get(key, 0) + count
+            # Per-symbol histograms come from one shard; the others are told apart by worker
+            for key, histogram in summary.get('histograms', {}).items():
+                histograms[key + f'worker{worker.index}' if key.endswith('|') else key] = histogram
+
+        workers = [worker.get_status() for worker in self.workers]
+        for status, load in zip(workers, self.get_loads([worker.symbols for worker in self.workers])):
+            status['load'] = load
+
+        return {'time': time.time(), 'workers': workers, 'costs': costs, 'counters': counters, 'histograms': histograms}
+
+    def write_status(self):
+        try:
+            write_json(self.status_path, self.get_status())
+        except OSError as ex:
+            print(__class__.__name__ + ':', ex)
+
+    def run(self, poll_interval: float = 1.):
+        self.start()
+        next_status = time.time() + self.status_interval
+        next_rebalance = time.time() + self.rebalance_interval
+
+        try:
+            while not self.stop_event.wait(poll_interval):
+                self.check_workers()
+
+                if time.time() >= next_rebalance:
+                    self.rebalance()
+                    next_rebalance = time.time() + self.rebalance_interval
+
+                if time.time() >= next_status:
+                    self.write_status()
+                    next_status = time.time() + self.status_interval
+        finally:
+            self.stop_workers()
+            self.merge()
+            self.write_status()
+
+
+def get_terminals(args: argparse.Namespace) -> List[dict]:
+    # One worker per terminal; --shards alone runs that many workers on the default terminal
+    terminals = []
+    if args.terminals:
+        with open(args.terminals, 'r', encoding='utf-8') as file:
+            terminals = json.load(file)
+    terminals += [{'path': path} for path in args.terminal]
+
+    shards = args.shards or len(terminals) or 1
+    return [terminals[i % len(terminals)] if terminals else {} for i in range(shards)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Shards config.json across several daemon.py processes.')
+    parser.add_argument('--config', default=os.environ.get('TRADER_CONFIG', os.path.join(os.getcwd(), 'config.json')),
+                        help='config.json to shard (env TRADER_CONFIG, default: %(default)s)')
+    parser.add_argument('--terminals', help='json list of {"path", "login", "password", "server"}, one per worker')
+    parser.add_argument('--terminal', action='append', default=[], help='terminal64.exe of a worker, repeatable')
+    parser.add_argument('--shards', type=int, help='workers to run (default: one per terminal)')
+    parser.add_argument('--directory', default=os.path.join(os.getcwd(), 'shards'),
+                        help='working directories of the workers (default: %(default)s)')
+    parser.add_argument('--rebalance-interval', type=float, default=3600.)
+    parser.add_argument('--imbalance', type=float, default=1.25,
+                        help='busiest shard load over the average that triggers a rebalance')
+    parser.add_argument('--status-interval', type=float, default=10.)
+    parser.add_argument('--workers', type=int, help='symbols evaluated concurrently by each worker')
+    parser.add_argument('--simulated', action='store_true', help='run the workers on the simulated broker')
+    args = parser.parse_args(argv)
+
+    arguments = []
+    if args.workers:
+        arguments += ['--workers', str(args.workers)]
+    if args.simulated:
+        arguments.append('--simulated')
+
+    supervisor = Supervisor(os.path.abspath(args.config), get_terminals(args), os.path.abspath(args.directory), arguments,
+                            rebalance_interval=args.rebalance_interval, imbalance=args.imbalance,
+                            status_interval=args.status_interval)
+
+    def on_signal(signum, _):
+        print('signal', signum, 'received, stopping')
+        supervisor.stop()
+
+    for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_signal)
+
+    supervisor.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import bisect
+import threading
+
+from itertools import accumulate
+from typing import Dict, List, Optional
+
+
+# SymbolInfo fields kept per symbol; they describe the symbol in the edit window's picker
+SYMBOL_FIELDS = ['name', 'path', 'description', 'digits', 'trade_contract_size', 'volume_min', 'volume_max', 'volume_step']
+
+
+class SymbolIndex:
+    # Case-insensitive search over symbol names: prefix matches by bisection on the sorted
+    # names, then substring matches by str.find over all names joined by newlines, each hit
+    # mapped back to its symbol through the start offsets of the names
+    def __init__(self, symbols: List[dict]):
+        self.symbols = sorted(symbols, key=lambda item: item['name'].casefold())
+        self.keys = [item['name'].casefold() for item in self.symbols]
+        self.by_name = {item['name']: item for item in self.symbols}
+        self.text = '\n'.join(self.keys)
+        self.offsets = [0] + list(accumulate(len(key) + 1 for key in self.keys))
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def get(self, name: str) -> Optional[dict]:
+        return self.by_name.get(name)
+
+    def search(self, text: str, limit: int = 50) -> List[dict]:
+        text = text.strip().casefold()
+        if not text:
+            return self.symbols[:limit]
+
+        first = bisect.bisect_left(self.keys, text)
+        last = bisect.bisect_left(self.keys, text + '\uffff')
+        found = list(range(first, min(last, first + limit)))
+        seen = set(found)
+
+        position = self.text.find(text)
+        while position != -1 and len(found) < limit:
+            index = bisect.bisect_right(self.offsets, position) - 1
+            if index not in seen:
+                found.append(index)
+                seen.add(index)
+            position = self.text.find(text, self.offsets[index + 1])
+
+        return [self.symbols[index] for index in found]
+
+
+class SymbolCache:
+    # The terminal's symbols with their SYMBOL_FIELDS kept in a json file, one entry per trade
+    # server, so the edit window can fill its picker without a symbols_get() call. A copy
+    # older than max_age seconds is still served and refreshed on a background thread; only a
+    # missing copy is fetched synchronously.
+    def __init__(self, file_path: Optional[str] = None, max_age: float = 86400.):
+        self.file_path = file_path or os.path.join(os.getcwd(), 'symbols.json')
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.entries: Optional[Dict[str, dict]] = None
+        self.indexes: Dict[str, tuple] = {}
+        self.last_index: Optional[SymbolIndex] = None
+        self.refreshing = set()
+
+    def get_key(self, broker) -> str:
+        info = broker.account_info()
+        if info is None:
+            return ''
+        return getattr(info, 'server', '') or ''
+
+    def _load(self) -> Dict[str, dict]:
+        if self.entries is None:
+            try:
+                with open(self.file_path, 'r', encoding='utf-8') as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                self.entries = {}
+
+            # Files written before the metadata was kept list bare names
+            for entry in self.entries.values():
+                entry['symbols'] = [{'name': item} if isinstance(item, str) else item for item in entry['symbols']]
+        return self.entries
+
+    def _write(self):
+        temp_path = self.file_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.entries, file)
+        os.replace(temp_path, self.file_path)
+
+    def fetch(self, broker, key: Optional[str] = None) -> List[dict]:
+        key = self.get_key(broker) if key is None else key
+        symbols = broker.symbols_get()
+        if symbols is None:
+            return self.get_cached(key) or []
+
+        items = [{field: getattr(item, field, None) for field in SYMBOL_FIELDS} for item in symbols]
+        with self.lock:
+            self._load()[key] = {'time': time.time(), 'symbols': items}
+            try:
+                self._write()
+            except OSError as ex:
+                print(__class__.__name__ + ':', ex)
+
+        return items
+
+    def get_cached(self, key: str) -> Optional[List[dict]]:
+        with self.lock:
+            entry = self._load().get(key)
+        return entry['symbols'] if entry else None
+
+    def is_stale(self, key: str) -> bool:
+        with self.lock:
+            entry = self._load().get(key)
+        return entry is None or time.time() - entry['time'] > self.max_age
+
+    def refresh(self, broker, key: Optional[str] = None):
+        # Fetches on a daemon thread unless a refresh of this server is already running
+        key = self.get_key(broker) if key is None else key
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def run():
+            try:
+                self.fetch(broker, key)
+            except Exception as ex:
+                print(__class__.__name__ + ':', repr(ex))
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=run, name='SymbolCache', daemon=True).start()
+
+    def get(self, broker, key: Optional[str] = None) -> List[dict]:
+        key = self.get_key(broker) if key is None else key
+        symbols = self.get_cached(key)
+
+        if symbols is None:
+            return self.fetch(broker, key)
+
+        if self.is_stale(key):
+            self.refresh(broker, key)
+
+        return symbols
+
+    def get_index(self, broker, key: Optional[str] = None) -> SymbolIndex:
+        # The index is rebuilt only when the server's list was fetched again
+        key = self.get_key(broker) if key is None else key
+        symbols = self.get(broker, key)
+
+        with self.lock:
+            built = self.indexes.get(key)
+            if built is None or built[0] is not symbols:
+                built = self.indexes[key] = (symbols, SymbolIndex(symbols))
+            self.last_index = built[1]
+        return built[1]
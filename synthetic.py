@@ -0,0 +1,165 @@
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+from brokers.simulated import TICK_DTYPE
+
+
+RATES_DTYPE = [('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+               ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')]
+REGIMES = ['trend', 'mean_revert', 'mixed']
+
+# Returns, in multiples of the volatility, of a planted bullish divergence: a sharp drop to the
+# first low, a bounce, a slow grind to a lower second low on shrinking momentum (so the RSI
+# makes a higher low) and a breakout above the second low's bar. Bearish ones are mirrored.
+DIVERGENCE_SHAPE = np.concatenate([
+    np.full(6, -3.),
+    np.full(8, 1.2),
+    np.full(12, -0.9),
+    np.full(8, 1.5)
+])
+# Bars from the start of the shape to its second pivot
+DIVERGENCE_PIVOT = 26
+
+
+def _returns(rng: np.random.Generator, size: int, regime: str, volatility: float) -> np.ndarray:
+    noise = rng.normal(0., volatility, size)
+
+    if regime == 'trend':
+        # Drift that keeps its sign for a few hundred bars at a time
+        drift = np.repeat(rng.choice([-1., 1.], size // 200 + 1), 200)[:size] * 0.08 * volatility
+        return noise + drift
+
+    if regime == 'mean_revert':
+        # Ornstein-Uhlenbeck around the starting price
+        returns = np.empty(size)
+        level = 0.
+        for i in range(size):
+            returns[i] = -0.05 * level + noise[i]
+            level += returns[i]
+        return returns
+
+    if regime == 'mixed':
+        returns = np.empty(size)
+        for start in range(0, size, 500):
+            stop = min(start + 500, size)
+            returns[start:stop] = _returns(rng, stop - start, REGIMES[rng.integers(2)], volatility)
+        return returns
+
+    raise ValueError(f'unknown regime {regime!r}, expected one of {REGIMES}')
+
+
+def generate_rates(size: int = 2000,
+                   seed: int = 0,
+                   regime: str = 'mixed',
+                   divergences: int = 0,
+                   price: float = 1.1,
+                   volatility: float = 3e-4,
+                   period: int = 60,
+                   start: int = 1_700_000_000,
+                   spread: int = 10,
+                   return_planted: bool = False):
+    # Seeded copy_rates_* style array. Up to divergences setups are planted at evenly spaced
+    # bars, alternating bullish and bearish; with return_planted the (bar of the second pivot,
+    # divergence_type) pairs are returned too, divergence_type being 0 bullish and 1 bearish.
+    rng = np.random.default_rng(seed)
+    returns = _returns(rng, size, regime, volatility)
+
+    planted: List[Tuple[int, int]] = []
+    shape_size = len(DIVERGENCE_SHAPE)
+    if divergences:
+        spacing = size // (divergences + 1)
+        for i in range(divergences):
+            first = (i + 1) * spacing - shape_size // 2
+            if first < 100 or first + shape_size > size or spacing < shape_size + 50:
+                continue
+
+            divergence_type = i % 2
+            sign = 1. if divergence_type == 0 else -1.
+            returns[first:first + shape_size] = sign * DIVERGENCE_SHAPE * volatility \
+                + rng.normal(0., 0.1 * volatility, shape_size)
+            planted.append((first + DIVERGENCE_PIVOT, divergence_type))
+
+    close = price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[price], close[:-1]])
+    wick = np.abs(rng.normal(0., 0.3 * volatility, (2, size))) * close
+
+    rates = np.zeros(size, dtype=RATES_DTYPE)
+    rates['time'] = start // period * period + np.arange(size) * period
+    rates['open'] = open_
+    rates['close'] = close
+    rates['high'] = np.maximum(open_, close) + wick[0]
+    rates['low'] = np.minimum(open_, close) - wick[1]
+    rates['tick_volume'] = rng.integers(1, 500, size)
+    rates['spread'] = spread
+
+    # Keep the wicks of the planted pivots inside the pattern so the pivot bars stay extreme
+    for bar, divergence_type in planted:
+        if divergence_type == 0:
+            rates['low'][bar] = min(rates['low'][bar - 3:bar + 4].min(), rates['low'][bar]) - 0.1 * volatility * close[bar]
+        else:
+            rates['high'][bar] = max(rates['high'][bar - 3:bar + 4].max(), rates['high'][bar]) + 0.1 * volatility * close[bar]
+
+    if return_planted:
+        return rates, planted
+    return rates
+
+
+def generate_universe(symbols: int = 10,
+                      size: int = 2000,
+                      seed: int = 0,
+                      divergences: int = 0,
+                      **kwargs) -> Dict[str, np.ndarray]:
+    # One independent series per symbol (SYN000, SYN001, ...), regimes cycled across symbols
+    return {
+        f'SYN{i:03d}': generate_rates(size, seed + i, REGIMES[i % len(REGIMES)], divergences, **kwargs)
+        for i in range(symbols)
+    }
+
+
+def generate_ticks(rates: np.ndarray,
+                   ticks_per_bar: int = 8,
+                   seed: int = 0,
+                   point: float = 0.00001,
+                   period: Optional[int] = None) -> np.ndarray:
+    # copy_ticks_* style array walking each bar open, high/low in a random order, low/high, close,
+    # with the remaining ticks scattered between those anchors
+    rng = np.random.default_rng(seed)
+    ticks_per_bar = max(ticks_per_bar, 4)
+    size = len(rates)
+    if period is None:
+        period = int(rates['time'][1] - rates['time'][0]) if size > 1 else 60
+
+    high_first = rng.random(size) < 0.5
+    anchors = np.stack([rates['open'],
+                        np.where(high_first, rates['high'], rates['low']),
+                        np.where(high_first, rates['low'], rates['high']),
+                        rates['close']], axis=1)
+
+    # Anchor positions within the bar: first and last tick fixed, extremes somewhere in between
+    middle = np.sort(rng.integers(1, ticks_per_bar - 1, (size, 2)), axis=1)
+    middle[:, 1] = np.maximum(middle[:, 1], middle[:, 0] + 1)
+    positions = np.concatenate([np.zeros((size, 1), int), middle, np.full((size, 1), ticks_per_bar - 1)], axis=1)
+
+    steps = np.arange(ticks_per_bar)
+    prices = np.empty((size, ticks_per_bar))
+    for row in range(size):
+        prices[row] = np.interp(steps, positions[row], anchors[row])
+
+    low = rates['low'][:, None]
+    high = rates['high'][:, None]
+    prices = np.clip(prices + rng.normal(0., 0.1, prices.shape) * (high - low), low, high)
+    prices[np.arange(size)[:, None], positions] = anchors
+
+    offsets = np.sort(rng.integers(0, period * 1000, (size, ticks_per_bar)), axis=1)
+    offsets[:, 0] = 0
+
+    ticks = np.zeros(size * ticks_per_bar, dtype=TICK_DTYPE)
+    ticks['time_msc'] = (rates['time'][:, None] * 1000 + offsets).ravel()
+    ticks['time'] = ticks['time_msc'] // 1000
+    ticks['bid'] = prices.ravel()
+    ticks['ask'] = ticks['bid'] + np.repeat(rates['spread'], ticks_per_bar) * point
+    ticks['last'] = ticks['bid']
+    ticks['volume'] = 1
+    ticks['flags'] = 6
+
+    return ticks
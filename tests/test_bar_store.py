@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import synthetic
+
+from bar_store import BarStore, resample_rates
+from brokers import SimulatedBroker
+
+
+@pytest.fixture
+def broker() -> SimulatedBroker:
+    return SimulatedBroker({'SYN': synthetic.generate_rates(3000, seed=3)}, start=99)
+
+
+def assert_contiguous(store: BarStore, broker: SimulatedBroker):
+    # Every stored bar is the terminal's bar of that time, with none missing in between
+    stored = store.rates('SYN', broker.TIMEFRAME_M1)
+    rates = broker.rates['SYN']
+    first = int(np.searchsorted(rates['time'], stored['time'][0]))
+    np.testing.assert_array_equal(stored, rates[first:first + len(stored)])
+
+
+def test_columns_are_views_and_meta_is_read_on_change_only(tmp_path, broker, monkeypatch):
+    store = BarStore(str(tmp_path))
+    store.sync('SYN', broker.TIMEFRAME_M1, broker.copy_rates_from_pos, 50)
+
+    reads = []
+    read_meta = store._read_meta
+    monkeypatch.setattr(store, '_read_meta', lambda path: reads.append(path) or read_meta(path))
+
+    for _ in range(3):
+        columns = store.columns('SYN', broker.TIMEFRAME_M1, count=10)
+        store.get_last_time('SYN', broker.TIMEFRAME_M1)
+        store.get_first_time('SYN', broker.TIMEFRAME_M1)
+    assert reads == []
+    assert len(columns['time']) == 10
+    assert all(isinstance(values, np.memmap) and not values.flags.owndata for values in columns.values())
+
+    # Another process appending replaces meta.json: the next read picks it up
+    broker.advance(5)
+    BarStore(str(tmp_path)).sync('SYN', broker.TIMEFRAME_M1, broker.copy_rates_from_pos, 50)
+    assert store.get_last_time('SYN', broker.TIMEFRAME_M1) == int(broker.rates['SYN']['time'][broker.cursor['SYN'] - 1])
+    assert len(reads) == 1
+    assert_contiguous(store, broker)
+
+
+def test_columns_resample_as_rates(tmp_path, broker):
+    store = BarStore(str(tmp_path))
+    store.sync('SYN', broker.TIMEFRAME_M1, broker.copy_rates_from_pos, 100)
+
+    columns = store.columns('SYN', broker.TIMEFRAME_M1, after=int(broker.rates['SYN']['time'][20]))
+    rates = store.rates('SYN', broker.TIMEFRAME_M1, after=int(broker.rates['SYN']['time'][20]))
+    np.testing.assert_array_equal(resample_rates(columns, 900), resample_rates(rates, 900))
+
+
+def test_sync_backfills_missing_bars(tmp_path, broker):
+    store = BarStore(str(tmp_path))
+    store.sync('SYN', broker.TIMEFRAME_M1, broker.copy_rates_from_pos, 50)
+    first_time = store.get_first_time('SYN', broker.TIMEFRAME_M1)
+
+    # Far more bars than count went by since the last sync
+    broker.advance(800)
+    forming = store.sync('SYN', broker.TIMEFRAME_M1, broker.copy_rates_from_pos, 50)
+
+    assert store.get_first_time('SYN', broker.TIMEFRAME_M1) == first_time
+    assert store.get_last_time('SYN', broker.TIMEFRAME_M1) == int(forming['time'][0]) - 60
+    assert_contiguous(store, broker)
+
+
+def test_sync_starts_over_when_history_does_not_reach_back(tmp_path, broker):
+    store = BarStore(str(tmp_path))
+    store.sync('SYN', broker.TIMEFRAME_M1, broker.copy_rates_from_pos, 50)
+
+    # A terminal keeping only the last 200 bars cannot fill the hole
+    def copy_rates_from_pos(symbol, timeframe, start_pos, count):
+        return broker.copy_rates_from_pos(symbol, timeframe, start_pos, min(count, 200))
+
+    broker.advance(800)
+    forming = store.sync('SYN', broker.TIMEFRAME_M1, copy_rates_from_pos, 50)
+
+    assert len(store.columns('SYN', broker.TIMEFRAME_M1)['time']) == 199
+    assert store.get_last_time('SYN', broker.TIMEFRAME_M1) == int(forming['time'][0]) - 60
+    assert_contiguous(store, broker)
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import atexit
+import pytest
+
+from windows.models import Config
+from windows.models import config as config_module
+
+
+@pytest.fixture
+def file_path(tmp_path) -> str:
+    path = str(tmp_path / 'config.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({symbol: {'timeframe': '1m'} for symbol in ('EURUSD', 'XAUUSD')}, file)
+    return path
+
+
+@pytest.fixture
+def replaces(monkeypatch) -> list:
+    # Every config.json written, as the temp file that replaced it
+    calls = []
+    replace = os.replace
+
+    def counted(source, destination):
+        calls.append(source)
+        replace(source, destination)
+
+    monkeypatch.setattr(config_module.os, 'replace', counted)
+    return calls
+
+
+def read(file_path: str) -> dict:
+    with open(file_path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def test_changes_are_coalesced_into_one_atomic_write(file_path, replaces):
+    config = Config(file_path, delay=0.3)
+    try:
+        for i in range(20):
+            assert config.patch('EURUSD', risk_amount=i + 1.)
+        config.patch('XAUUSD', is_running=True)
+        assert replaces == []
+
+        deadline = time.monotonic() + 5
+        while not replaces and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)
+
+        assert replaces == [file_path + '.tmp']
+        assert not os.path.exists(file_path + '.tmp')
+        data = read(file_path)
+        assert data['EURUSD']['risk_amount'] == 20.
+        assert data['XAUUSD']['is_running'] is True
+    finally:
+        config.close()
+
+
+def test_version_moves_only_on_real_changes(file_path):
+    config = Config(file_path, delay=60.)
+    try:
+        version = config.get_version()
+        assert not config.set(config.get_model('EURUSD'))
+        assert not config.patch('EURUSD', timeframe='1m')
+        assert not config.remove('GBPUSD')
+        assert config.get_version() == version
+
+        assert config.patch('EURUSD', timeframe='5m')
+        assert config.get_version() == version + 1
+        assert config.get_version('EURUSD') == version + 1
+        assert config.get_version('XAUUSD') < version + 1
+    finally:
+        config.close()
+
+
+def test_reload_merges_an_external_edit(file_path):
+    config = Config(file_path, delay=60.)
+    try:
+        config.patch('EURUSD', risk_amount=5.)
+        config.flush()
+        # Our own write is not taken for an external edit
+        assert not config.reload()
+
+        data = read(file_path)
+        data['XAUUSD']['timeframe'] = '15m'
+        data['GBPUSD'] = {'timeframe': '1h'}
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        stat = os.stat(file_path)
+        os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+        version = config.get_version('EURUSD')
+        assert config.reload()
+        assert config.get_model('XAUUSD').timeframe == '15m'
+        assert config.get_model('GBPUSD').timeframe == '1h'
+        assert config.get_model('EURUSD').risk_amount == 5.
+        assert config.get_version('EURUSD') == version
+    finally:
+        config.close()
+
+
+def test_close_flushes_pending_changes_and_unregisters(file_path, replaces, monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    monkeypatch.setattr(atexit, 'unregister', registered.remove)
+
+    config = Config(file_path, delay=60.)
+    assert registered == [config.close]
+
+    config.patch('EURUSD', risk_amount=7.)
+    assert replaces == []
+
+    config.close()
+    assert read(file_path)['EURUSD']['risk_amount'] == 7.
+    assert len(replaces) == 1
+    assert registered == []
+
+    config.writer.join(1)
+    assert not config.writer.is_alive()
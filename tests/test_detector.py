@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+import pytest
+import detector
+import indicators
+import synthetic
+
+from typing import List, Optional
+from detector import DivergencePoint, DivergenceSignal
+from indicators import FeatureStream, PIVOT_COLUMNS
+
+
+def reference_side(df: pd.DataFrame, divergence_type: int, max_pivot_distance: int) -> Optional[DivergenceSignal]:
+    # One side of the original pandas detect_divergence, built on the helpers it used. The
+    # original indexed the last pivot with .iloc[-1] and raised IndexError when a side had
+    # none; such a side finds nothing here.
+    bullish = divergence_type == 0
+    rsi_name, price_name, price_column = ('rsi_pivot_low', 'pivot_low', 'low') if bullish else ('rsi_pivot_high', 'pivot_high', 'high')
+    if not df[rsi_name].any() or not df[price_name].any():
+        return None
+
+    prev_candle = df.iloc[-2]
+    current_rsi_pivot = df[df[rsi_name]].iloc[-1]
+    current_pivot = df[df[price_name]].iloc[-1]
+    distance = len(df) - df.index.get_loc(current_pivot.name) - 1
+
+    if bullish:
+        divergence_point = detector.is_bullish_divergence(df, current_rsi_pivot)
+        broken = prev_candle['close'] > current_pivot['high']
+        get_pivot_bar = detector.get_lowest_pivot_bar
+    else:
+        divergence_point = detector.is_bearish_divergence(df, current_rsi_pivot)
+        broken = prev_candle['close'] < current_pivot['low']
+        get_pivot_bar = detector.get_highest_pivot_bar
+
+    if divergence_point is None or distance > max_pivot_distance or not broken:
+        return None
+
+    current_candle = get_pivot_bar(df, current_rsi_pivot)
+    nearest_candle = get_pivot_bar(df, divergence_point)
+
+    return DivergenceSignal(
+        divergence_type=divergence_type,
+        rsi_point=DivergencePoint(
+            start=(divergence_point['time'], divergence_point['rsi']),
+            end=(current_rsi_pivot['time'], current_rsi_pivot['rsi'])
+        ),
+        price_point=DivergencePoint(
+            start=(nearest_candle['time'], nearest_candle[price_column]),
+            end=(current_candle['time'], current_candle[price_column])
+        )
+    )
+
+
+def reference_detect_divergence(df: pd.DataFrame, max_pivot_distance: int = 9) -> Optional[DivergenceSignal]:
+    df = df.tail(detector.DETECTION_WINDOW)
+    if len(df) < 2:
+        return None
+    return reference_side(df, 0, max_pivot_distance) or reference_side(df, 1, max_pivot_distance)
+
+
+def get_frames(seed: int, regime: str, size: int = 600, count: int = 300) -> List[pd.DataFrame]:
+    # The frames OrderExecutorThread evaluates, one per bar: closed bars plus the forming one
+    rates = synthetic.generate_rates(size, seed, regime, divergences=size // 60)
+    stream = FeatureStream(count=count)
+
+    frames = []
+    for stop in range(2, size + 1):
+        stream.update(rates[:stop])
+        frames.append(stream.to_frame())
+    return frames
+
+
+@pytest.fixture(scope='module')
+def frames() -> List[pd.DataFrame]:
+    return [frame for seed, regime in enumerate(synthetic.REGIMES) for frame in get_frames(seed + 11, regime)]
+
+
+def pack(frames: List[pd.DataFrame]) -> dict:
+    # detect_divergence_batch layout: rows aligned on the last bar, NaN/NaT/False on the left
+    size = max(len(frame) for frame in frames)
+    block = {
+        'time': np.full((len(frames), size), np.datetime64('NaT'), dtype='datetime64[ns]'),
+        **{name: np.full((len(frames), size), np.nan) for name in ('high', 'low', 'close', 'rsi')},
+        **{name: np.zeros((len(frames), size), dtype=bool) for name in PIVOT_COLUMNS}
+    }
+    for row, frame in enumerate(frames):
+        for name, values in block.items():
+            if len(frame):
+                values[row, size - len(frame):] = frame[name].to_numpy()
+    return block
+
+
+def batch(block: dict, max_pivot_distance=9) -> List[Optional[DivergenceSignal]]:
+    return detector.detect_divergence_batch(block['time'], block['high'], block['low'], block['close'], block['rsi'],
+                                            block['pivot_high'], block['pivot_low'],
+                                            block['rsi_pivot_high'], block['rsi_pivot_low'],
+                                            max_pivot_distance=max_pivot_distance)
+
+
+@pytest.fixture(scope='module')
+def expected(frames) -> List[Optional[DivergenceSignal]]:
+    return [reference_detect_divergence(frame) for frame in frames]
+
+
+def test_frames_contain_signals_of_both_types(expected):
+    assert {signal.divergence_type for signal in expected if signal is not None} == {0, 1}
+
+
+def test_detect_divergence_matches_pandas_reference(frames, expected):
+    assert [detector.detect_divergence(frame) for frame in frames] == expected
+
+
+def test_detect_divergence_matches_pandas_reference_at_short_distance(frames):
+    # The slow reference on a third of the frames is enough to cover the distance check
+    for frame in frames[::3]:
+        assert detector.detect_divergence(frame, 3) == reference_detect_divergence(frame, 3)
+
+
+def test_batch_matches_detect_divergence(frames, expected):
+    assert batch(pack(frames)) == expected
+
+
+def test_batch_with_distance_per_row(frames):
+    distances = np.arange(len(frames)) % 12
+    expected = [detector.detect_divergence(frame, int(distance)) for frame, distance in zip(frames, distances)]
+    assert batch(pack(frames), distances) == expected
+
+
+def test_short_history_finds_nothing():
+    # Frames without a pivot on a side, or with fewer than two bars, made the original
+    # detect_divergence raise IndexError; they now find no signal
+    rates = synthetic.generate_rates(60, seed=2)
+    stream = FeatureStream(count=500)
+    frames = []
+    for stop in range(1, 60):
+        stream.update(rates[:stop])
+        frames.append(stream.to_frame())
+
+    short = [frame for frame in frames if len(frame) < 2 or not frame[PIVOT_COLUMNS].to_numpy().any(axis=0).all()]
+    assert len(short) > 10
+
+    for frame in short:
+        assert detector.detect_divergence(frame) is None
+        assert detector.detect_divergence_setups(frame) == []
+
+    short = [frame for frame in short if len(frame)]
+    assert batch(pack(short)) == [None] * len(short)
+
+
+def walk_forward(df: pd.DataFrame, pivot_lookback: int, max_pivot_distance: int) -> list:
+    # detect_divergence on the frame ending at every bar: the bars so far, with the pivots
+    # that a frame built from them could not have confirmed yet removed
+    time = df['time'].to_numpy()
+    rows = []
+    for end in range(max(pivot_lookback, 1), len(df)):
+        frame = df.iloc[:end + 1].copy()
+        frame.iloc[end + 1 - pivot_lookback:, [frame.columns.get_loc(name) for name in PIVOT_COLUMNS]] = False
+
+        signal = detector.detect_divergence(frame, max_pivot_distance)
+        if signal is not None:
+            rows.append((end, time[end], signal.divergence_type,
+                         signal.rsi_point.start, signal.rsi_point.end,
+                         signal.price_point.start, signal.price_point.end))
+    return rows
+
+
+def scanned(signals: pd.DataFrame, df: pd.DataFrame) -> list:
+    time = df['time']
+    return [(row.bar, row.time, row.divergence_type,
+             (time.iloc[row.rsi_start_bar], row.rsi_start), (time.iloc[row.rsi_end_bar], row.rsi_end),
+             (time.iloc[row.price_start_bar], row.price_start), (time.iloc[row.price_end_bar], row.price_end))
+            for row in signals.itertuples()]
+
+
+@pytest.mark.parametrize('pivot_lookback, max_pivot_distance', [(5, 9), (3, 4), (8, 15)])
+def test_scan_divergences_matches_walk_forward(pivot_lookback, max_pivot_distance):
+    for seed, regime in enumerate(synthetic.REGIMES):
+        rates = synthetic.generate_rates(800, seed + 21, regime, divergences=14)
+        df = indicators.compute_features(rates, pivot_lookback=pivot_lookback)
+
+        expected = walk_forward(df, pivot_lookback, max_pivot_distance)
+        assert expected
+        assert scanned(detector.scan_divergences(df, pivot_lookback, max_pivot_distance), df) == expected
+
+
+def test_scan_divergences_of_short_history():
+    # Down to histories the indicators do not cover at all
+    for size in range(1, 60):
+        df = indicators.compute_features(synthetic.generate_rates(size, seed=4))
+        assert scanned(detector.scan_divergences(df), df) == walk_forward(df, 5, 9)
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import pytest
+import indicators
+import synthetic
+
+from indicators import FeatureStream, PIVOT_COLUMNS, RSI_LENGTH
+
+
+# pandas_ta.rsi/atr are Wilder averages, ewm(alpha=1 / n, min_periods=n).mean(), and the old
+# pivots were rolling(2k + 1, center=True) max/min; these references restate them in pandas
+TOLERANCE = 1e-9
+
+
+def reference_rma(values: pd.Series, length: int) -> pd.Series:
+    return values.ewm(alpha=1 / length, min_periods=length).mean()
+
+
+def reference_rsi(close: pd.Series, length: int = RSI_LENGTH) -> pd.Series:
+    change = close.diff()
+    gain = reference_rma(change.clip(lower=0), length)
+    loss = reference_rma(change.clip(upper=0).abs(), length)
+    return 100 * gain / (gain + loss)
+
+
+def reference_atr(high: pd.Series, low: pd.Series, close: pd.Series, length: int = 14) -> pd.Series:
+    previous = close.shift()
+    true_range = pd.concat([high - low, (high - previous).abs(), (previous - low).abs()], axis=1).max(axis=1, skipna=False)
+    return reference_rma(true_range, length)
+
+
+def reference_pivots(values: pd.Series, pivot_lookback: int, highest: bool) -> np.ndarray:
+    window = values.rolling(2 * pivot_lookback + 1, center=True)
+    extreme = window.max() if highest else window.min()
+    return (values == extreme).to_numpy()
+
+
+def reference_features(rates: np.ndarray, atr_length: int = 14, pivot_lookback: int = 5) -> pd.DataFrame:
+    df = pd.DataFrame(rates)
+    df['rsi'] = reference_rsi(df['close'])
+    df['atr'] = reference_atr(df['high'], df['low'], df['close'], atr_length)
+    df = df.dropna()
+
+    df['rsi_pivot_high'] = reference_pivots(df['rsi'], pivot_lookback, True)
+    df['rsi_pivot_low'] = reference_pivots(df['rsi'], pivot_lookback, False)
+    df['pivot_high'] = reference_pivots(df['high'], pivot_lookback, True)
+    df['pivot_low'] = reference_pivots(df['low'], pivot_lookback, False)
+    return df
+
+
+def assert_features(actual: pd.DataFrame, expected: pd.DataFrame):
+    assert len(actual) == len(expected)
+    for name in ('open', 'high', 'low', 'close', 'rsi', 'atr'):
+        np.testing.assert_allclose(actual[name].to_numpy(), expected[name].to_numpy(), rtol=0, atol=TOLERANCE, err_msg=name)
+    for name in PIVOT_COLUMNS:
+        np.testing.assert_array_equal(actual[name].to_numpy(dtype=bool), expected[name].to_numpy(dtype=bool), err_msg=name)
+
+
+@pytest.fixture(params=synthetic.REGIMES)
+def rates(request) -> np.ndarray:
+    return synthetic.generate_rates(800, seed=7, regime=request.param, divergences=4)
+
+
+def test_rsi_matches_wilder_reference(rates):
+    close = pd.Series(rates['close'])
+    expected = reference_rsi(close)
+    actual = indicators.compute_rsi(close)
+
+    # The first RSI_LENGTH values have no full average, in both
+    assert actual.iloc[:RSI_LENGTH].isna().all()
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize('length', [1, 7, 14, 30])
+def test_atr_matches_wilder_reference(rates, length):
+    high, low, close = (pd.Series(rates[name]) for name in ('high', 'low', 'close'))
+    expected = reference_atr(high, low, close, length)
+    actual = indicators.compute_atr(high, low, close, length)
+
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize('pivot_lookback', [1, 3, 5, 8])
+def test_pivots_match_centered_rolling_reference(rates, pivot_lookback):
+    df = indicators.compute_features(rates, pivot_lookback=pivot_lookback)
+    expected = reference_features(rates, pivot_lookback=pivot_lookback)
+
+    assert_features(df, expected)
+    # Edge bars have no full centered window
+    assert not df[PIVOT_COLUMNS].iloc[:pivot_lookback].to_numpy().any()
+    assert not df[PIVOT_COLUMNS].iloc[-pivot_lookback:].to_numpy().any()
+
+
+def test_pivot_flags_keep_ties():
+    values = np.array([1., 2., 3., 3., 2., 1., 1., 1., 2., 3.])
+    expected = reference_pivots(pd.Series(values), 2, True)
+    np.testing.assert_array_equal(indicators.get_pivot_flags(values, 2, True), expected)
+
+    expected = reference_pivots(pd.Series(values), 2, False)
+    np.testing.assert_array_equal(indicators.get_pivot_flags(values, 2, False), expected)
+
+
+def test_pivot_flags_of_short_series():
+    for size in range(0, 12):
+        values = np.arange(size, dtype=float)
+        assert not indicators.get_pivot_flags(values, 5, True).any()
+        assert len(indicators.get_pivot_flags(values, 5, True)) == size
+
+
+def expected_frame(rates: np.ndarray, stream: FeatureStream) -> pd.DataFrame:
+    # What to_frame shows: the reference over everything fed so far, forming bar included,
+    # its last count - warmup rows, with no pivots on the first pivot_lookback of them
+    df = reference_features(rates, stream.atr_length, stream.pivot_lookback).tail(stream.count - stream.warmup).copy()
+    for name in PIVOT_COLUMNS:
+        df.iloc[:stream.pivot_lookback, df.columns.get_loc(name)] = False
+    return df
+
+
+@pytest.mark.parametrize('atr_length, pivot_lookback', [(14, 5), (20, 3)])
+def test_feature_stream_matches_reference(atr_length, pivot_lookback):
+    rates = synthetic.generate_rates(900, seed=3, regime='mixed', divergences=4)
+    stream = FeatureStream(atr_length, pivot_lookback, count=300)
+
+    # Cold build, then one bar at a time, then several bars at once (the array path)
+    stream.update(rates[:400])
+    assert_features(stream.to_frame(), expected_frame(rates[:400], stream))
+
+    for stop in range(401, 460):
+        stream.update(rates[stop - 3:stop])
+        assert_features(stream.to_frame(), expected_frame(rates[:stop], stream))
+
+    for stop in range(480, 900, 40):
+        stream.update(rates[:stop])
+        assert_features(stream.to_frame(), expected_frame(rates[:stop], stream))
+
+
+def test_feature_stream_short_history():
+    # Fewer bars than the warmup give an empty frame, then the frame grows bar by bar
+    rates = synthetic.generate_rates(60, seed=1)
+    stream = FeatureStream(count=500)
+
+    for stop in range(2, 60):
+        stream.update(rates[:stop])
+        assert_features(stream.to_frame(), expected_frame(rates[:stop], stream))
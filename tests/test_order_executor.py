@@ -0,0 +1,111 @@
+import time
+import json
+import pytest
+import journal
+import detector
+import synthetic
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from brokers import SimulatedBroker, LockedBroker
+from windows.models import Config
+from windows.threads.order_executor import OrderExecutorThread
+
+
+SYMBOLS = 40
+HOURS = 520
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # The bar store, config.json and the journal all default to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(journal.journal, 'file_path', str(tmp_path / 'journal.db'))
+    return tmp_path
+
+
+def create_broker(latency: float) -> SimulatedBroker:
+    # M1 history for HOURS H1 bars per symbol, the clock one minute before the top of the hour
+    start = (int(time.time()) // 3600 - HOURS) * 3600
+    rates = {f'S{i:02d}': synthetic.generate_rates(HOURS * 60 + 1, i, synthetic.REGIMES[i % len(synthetic.REGIMES)],
+                                                   divergences=HOURS // 20, start=start)
+             for i in range(SYMBOLS)}
+    return SimulatedBroker(rates, start=HOURS * 60 - 1, latency=latency)
+
+
+@pytest.mark.parametrize('workers', [1, 8])
+def test_symbols_closing_h1_together_are_evaluated_within_max_delay(workdir, workers):
+    broker = create_broker(latency=0.005)
+    entry = {'timeframe': '1h', 'is_running': True, 'use_default_volume': True, 'unit_factor': 100000,
+             'use_sl_min_max': False, 'use_filter': True, 'timeframe_filters': ['4h', '1d']}
+    with open(workdir / 'config.json', 'w', encoding='utf-8') as file:
+        json.dump({symbol: entry for symbol in broker.rates}, file)
+
+    config = Config(str(workdir / 'config.json'), delay=0.1)
+    executor = OrderExecutorThread(config, LockedBroker(broker), workers=workers)
+    executor.server_clock.observe(broker.now)
+    pool = ThreadPoolExecutor(workers) if workers > 1 else None
+
+    try:
+        # Every symbol's H1 bar closes on the same tick, cold: no stored bars yet
+        broker.advance()
+        executor.update_schedule()
+        assert len(executor.strategy_configs) == SYMBOLS
+
+        start = time.time()
+        finished = {}
+        for symbol in list(executor.strategy_configs):
+            executor.scheduler.remove(symbol)
+            executor.submit(pool, symbol)
+
+        while executor.running:
+            wait(list(executor.running.values()), return_when=FIRST_COMPLETED)
+            assert executor.collect(pool)
+            # Without a pool, the finishes run inline and are collected in the same pass
+            assert pool is not None or not executor.running
+            # A symbol is rescheduled once its evaluation went through detection and entry
+            for symbol in executor.scheduler.symbols():
+                finished.setdefault(symbol, time.time() - start)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        config.close()
+
+    assert len(finished) == SYMBOLS
+    # Every evaluation ran to completion, none was dropped past its deadline
+    assert set(executor.evaluated_bars) == set(broker.rates)
+    assert max(finished.values()) < executor.max_delay
+
+
+def test_batch_detection_matches_detect_divergence_per_symbol(workdir):
+    # M1 symbols with different pivot distances walked bar by bar: detect finds, for every
+    # symbol, what detect_divergence finds on the frame create_data_frame used to build
+    rates = {f'S{i:02d}': synthetic.generate_rates(900, i, synthetic.REGIMES[i % len(synthetic.REGIMES)], divergences=12)
+             for i in range(12)}
+    broker = SimulatedBroker(rates, start=99)
+    with open(workdir / 'config.json', 'w', encoding='utf-8') as file:
+        json.dump({symbol: {'timeframe': '1m', 'is_running': True, 'pivot_distance': 5 + i % 3 * 10}
+                   for i, symbol in enumerate(rates)}, file)
+
+    config = Config(str(workdir / 'config.json'), delay=60.)
+    executor = OrderExecutorThread(config, broker)
+    executor.is_market_open = lambda symbol, timeframe: True
+    executor.update_schedule()
+
+    signals = 0
+    try:
+        for _ in range(400):
+            broker.advance()
+
+            evaluations = [executor.evaluate(strategy_config) for strategy_config in executor.strategy_configs.values()]
+            assert all(isinstance(item, dict) for item in evaluations)
+            executor.detect(evaluations)
+
+            for evaluation in evaluations:
+                expected = detector.detect_divergence(evaluation['stream'].to_frame(),
+                                                      max_pivot_distance=evaluation['strategy_config'].pivot_distance)
+                assert evaluation['result'] == expected
+                signals += expected is not None
+    finally:
+        config.close()
+
+    assert signals > 20
@@ -0,0 +1,132 @@
+import time
+import pytest
+import journal
+import synthetic
+
+from account_state import AccountState
+from brokers import SimulatedBroker
+from order_pipeline import OrderPipeline
+
+
+SYMBOL = 'SYN'
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal.journal, 'file_path', str(tmp_path / 'journal.db'))
+    return tmp_path
+
+
+@pytest.fixture
+def broker(workdir) -> SimulatedBroker:
+    # A buy, a sell and a buy again: the ladder's last position sets the first one's TP and
+    # the second one's SL, as RecoveryZoneThread keeps them
+    broker = SimulatedBroker({SYMBOL: synthetic.generate_rates(300, seed=2)}, start=200)
+    tickets = [broker.order_send({'action': broker.TRADE_ACTION_DEAL, 'symbol': SYMBOL, 'type': order_type,
+                                  'volume': volume}).order
+               for order_type, volume in ((broker.ORDER_TYPE_BUY, 0.01), (broker.ORDER_TYPE_SELL, 0.02),
+                                          (broker.ORDER_TYPE_BUY, 0.03))]
+    for ticket, sl, tp in ((tickets[0], 0., 1.2), (tickets[1], 1.2, 0.), (tickets[2], 0., 1.2)):
+        broker.order_send({'action': broker.TRADE_ACTION_SLTP, 'position': ticket, 'symbol': SYMBOL, 'sl': sl, 'tp': tp})
+    return broker
+
+
+@pytest.fixture
+def requests(broker, monkeypatch) -> list:
+    # Every request the pipeline sends, with its send time; retcodes queued in replies are
+    # answered instead of sending
+    sent = []
+    order_send = broker.order_send
+
+    def recorded(request: dict):
+        sent.append((time.monotonic(), dict(request)))
+        if recorded.replies:
+            return order_send({'action': -1})._replace(retcode=recorded.replies.pop(0), request=request)
+        return order_send(request)
+
+    recorded.replies = []
+    monkeypatch.setattr(broker, 'order_send', recorded)
+    return sent
+
+
+def ladder_pass(account: AccountState, pipeline: OrderPipeline):
+    # The modification branch of one RecoveryZoneThread.run pass
+    positions = account.positions(SYMBOL)
+    lastest_position = positions[-1]
+    for item in positions[:-1]:
+        if item.type == lastest_position.type:
+            pipeline.modify_position(item, tp=lastest_position.tp)
+        else:
+            pipeline.modify_position(item, sl=lastest_position.tp)
+
+
+def wait_idle(pipeline: OrderPipeline, sent: list, timeout: float = 5.):
+    # No queued request left and nothing sent for a while
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not pipeline.pending() and (not sent or time.monotonic() - sent[-1][0] > 0.2):
+            return
+        time.sleep(0.02)
+    raise TimeoutError
+
+
+def sltp_requests(sent: list) -> dict:
+    counts = {}
+    for _, request in sent:
+        if request['action'] == SimulatedBroker.TRADE_ACTION_SLTP:
+            counts[request['position']] = counts.get(request['position'], 0) + 1
+    return counts
+
+
+def test_unchanged_ladder_sends_nothing(broker, requests):
+    account = AccountState(broker)
+    pipeline = OrderPipeline(broker, account)
+
+    for _ in range(20):
+        ladder_pass(account, pipeline)
+        time.sleep(0.01)
+    wait_idle(pipeline, requests)
+
+    assert requests == []
+    assert pipeline.counters['unchanged'] == 40
+
+
+def test_changed_tp_is_sent_once_per_ticket(broker, requests):
+    account = AccountState(broker)
+    pipeline = OrderPipeline(broker, account)
+    first, second, last = account.positions(SYMBOL)
+
+    # The last position's TP moved: every pass until the mirror catches up asks for the new levels
+    broker.order_send({'action': broker.TRADE_ACTION_SLTP, 'position': last.ticket, 'symbol': SYMBOL, 'sl': 0., 'tp': 1.25})
+    requests.clear()
+    account.invalidate()
+
+    for _ in range(40):
+        ladder_pass(account, pipeline)
+        time.sleep(0.01)
+    wait_idle(pipeline, requests)
+
+    assert sltp_requests(requests) == {first.ticket: 1, second.ticket: 1}
+    positions = {item.ticket: item for item in broker.positions_get(symbol=SYMBOL)}
+    assert (positions[first.ticket].sl, positions[first.ticket].tp) == (0., 1.25)
+    assert (positions[second.ticket].sl, positions[second.ticket].tp) == (1.25, 0.)
+
+
+def test_requote_and_busy_are_retried_with_backoff(broker, requests):
+    account = AccountState(broker)
+    pipeline = OrderPipeline(broker, account, backoff=0.05)
+    first = account.positions(SYMBOL)[0]
+
+    broker.order_send.replies.extend([broker.TRADE_RETCODE_REQUOTE, broker.TRADE_RETCODE_TOO_MANY_REQUESTS])
+    assert pipeline.modify_position(first, tp=1.3)
+    wait_idle(pipeline, requests)
+
+    times = [sent_at for sent_at, _ in requests]
+    assert sltp_requests(requests) == {first.ticket: 3}
+    # 0.05 s after the first failure, 0.1 s after the second
+    assert times[1] - times[0] >= 0.05
+    assert times[2] - times[1] >= 0.1
+    assert pipeline.counters['retried'] == 2
+    assert pipeline.records[-1].retcode == broker.TRADE_RETCODE_DONE
+    assert pipeline.records[-1].attempts == 3
+    assert broker.positions_get(ticket=first.ticket)[0].tp == 1.3
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+import detector
+import indicators
+import screener
+import synthetic
+
+from bar_store import BarStore
+from brokers import SimulatedBroker
+
+
+COUNT = 300
+
+
+@pytest.fixture(scope='module')
+def broker() -> SimulatedBroker:
+    # Full histories plus a few too short to warm the indicators up or to hold a pivot
+    rates = synthetic.generate_universe(120, 400, seed=5, divergences=6)
+    for i, size in enumerate([1, 2, 10, 15, 16, 25, 40, 80]):
+        rates[f'SHORT{i}'] = synthetic.generate_rates(size, seed=50 + i)
+    return SimulatedBroker(rates, start=399)
+
+
+def expected_rows(broker: SimulatedBroker, symbols: list) -> list:
+    # What the executor would see for each symbol on its own: detect_divergence on the
+    # compute_features frame, plus the setups on the other side
+    rows = []
+    for symbol in symbols:
+        rates = broker.copy_rates_from_pos(symbol, broker.TIMEFRAME_M1, 0, COUNT)
+        df = indicators.compute_features(rates)
+        if df.empty:
+            continue
+
+        signal = detector.detect_divergence(df)
+        if signal is not None:
+            rows.append((symbol, screener.SIGNAL, signal.divergence_type, signal.rsi_point, signal.price_point))
+        for setup in detector.detect_divergence_setups(df):
+            if signal is None or setup.signal.divergence_type != signal.divergence_type:
+                rows.append((symbol, screener.SETUP, setup.signal.divergence_type, setup.signal.rsi_point, setup.signal.price_point))
+    return sorted(rows, key=lambda row: row[:3])
+
+
+def test_screen_matches_per_symbol_detection(broker, tmp_path):
+    screen = screener.Screener(broker, '1m', COUNT, bar_store=BarStore(str(tmp_path)))
+    df = screen.screen()
+    expected = expected_rows(broker, screen.get_symbols())
+
+    assert len(expected) > 5
+    assert {row[1] for row in expected} == {screener.SIGNAL, screener.SETUP}
+    assert sorted(zip(df['symbol'], df['status'], df['divergence_type'])) == [row[:3] for row in expected]
+
+    by_key = {(row.symbol, row.status, row.divergence_type): row for row in df.itertuples()}
+    for symbol, status, divergence_type, rsi_point, price_point in expected:
+        row = by_key[symbol, status, divergence_type]
+        assert row.time == rsi_point.end[0]
+        # The block's RSI can differ from the per-symbol one in the last bits
+        assert (row.rsi_start, row.rsi_end) == pytest.approx((rsi_point.start[1], rsi_point.end[1]), abs=1e-9)
+        assert (row.price_start, row.price_end) == (price_point.start[1], price_point.end[1])
+
+
+def test_screen_ranks_signals_then_nearest_trigger(broker, tmp_path):
+    df = screener.Screener(broker, '1m', COUNT, bar_store=BarStore(str(tmp_path))).screen()
+
+    status = df['status'].map({screener.SIGNAL: 0, screener.SETUP: 1}).to_numpy()
+    assert (np.diff(status) >= 0).all()
+    for value in (screener.SIGNAL, screener.SETUP):
+        assert df.loc[df['status'] == value, 'distance'].abs().is_monotonic_increasing
+
+
+def test_screen_of_short_histories(broker, tmp_path):
+    symbols = [name for name in broker.rates if name.startswith('SHORT')]
+    df = screener.Screener(broker, '1m', COUNT, bar_store=BarStore(str(tmp_path))).screen(symbols)
+
+    assert list(df.columns) == screener.SETUP_COLUMNS
+    assert sorted(zip(df['symbol'], df['status'], df['divergence_type'])) == [row[:3] for row in expected_rows(broker, symbols)]
+
+
+def test_group_filter(broker, tmp_path):
+    screen = screener.Screener(broker, '1m', COUNT, bar_store=BarStore(str(tmp_path)))
+    assert screen.get_symbols('SYN00*,!SYN001') == ['SYN000'] + [f'SYN00{i}' for i in range(2, 10)]
+    assert screen.get_symbols('SHORT*') == [f'SHORT{i}' for i in range(8)]
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'ui/EditWindow.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        MainWindow.setObjectName("MainWindow")
+        MainWindow.resize(431, 461)
+        MainWindow.setStyleSheet("* {\n"
+"    font-family: \"Segoe UI\";\n"
+"    font-size: 14px;\n"
+"}")
+        self.centralwidget = QtWidgets.QWidget(MainWindow)
+        self.centralwidget.setObjectName("centralwidget")
+        self.lineEdit = QtWidgets.QLineEdit(self.centralwidget)
+        self.lineEdit.setGeometry(QtCore.QRect(10, 10, 151, 31))
+        self.lineEdit.setObjectName("lineEdit")
+        self.label = QtWidgets.QLabel(self.centralwidget)
+        self.label.setEnabled(True)
+        self.label.setGeometry(QtCore.QRect(10, 50, 47, 21))
+        self.label.setObjectName("label")
+        self.comboBox = QtWidgets.QComboBox(self.centralwidget)
+        self.comboBox.setGeometry(QtCore.QRect(170, 10, 91, 31))
+        self.comboBox.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.comboBox.setObjectName("comboBox")
+        self.comboBox.addItem("")
+        self.comboBox.addItem("")
+        self.comboBox.addItem("")
+        self.checkBox_2 = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox_2.setGeometry(QtCore.QRect(270, 10, 70, 31))
+        self.checkBox_2.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.checkBox_2.setChecked(True)
+        self.checkBox_2.setObjectName("checkBox_2")
+        self.checkBox_3 = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox_3.setGeometry(QtCore.QRect(350, 10, 70, 31))
+        self.checkBox_3.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.checkBox_3.setChecked(True)
+        self.checkBox_3.setObjectName("checkBox_3")
+        self.pushButton = QtWidgets.QPushButton(self.centralwidget)
+        self.pushButton.setGeometry(QtCore.QRect(310, 200, 111, 31))
+        self.pushButton.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.pushButton.setObjectName("pushButton")
+        self.label_3 = QtWidgets.QLabel(self.centralwidget)
+        self.label_3.setGeometry(QtCore.QRect(10, 110, 81, 21))
+        self.label_3.setObjectName("label_3")
+        self.spinBox_3 = QtWidgets.QSpinBox(self.centralwidget)
+        self.spinBox_3.setGeometry(QtCore.QRect(10, 130, 151, 31))
+        self.spinBox_3.setMaximum(100000)
+        self.spinBox_3.setObjectName("spinBox_3")
+        self.doubleSpinBox = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.doubleSpinBox.setEnabled(False)
+        self.doubleSpinBox.setGeometry(QtCore.QRect(10, 200, 151, 31))
+        self.doubleSpinBox.setMinimum(0.01)
+        self.doubleSpinBox.setMaximum(0.1)
+        self.doubleSpinBox.setSingleStep(0.01)
+        self.doubleSpinBox.setObjectName("doubleSpinBox")
+        self.label_6 = QtWidgets.QLabel(self.centralwidget)
+        self.label_6.setGeometry(QtCore.QRect(10, 250, 91, 21))
+        self.label_6.setObjectName("label_6")
+        self.doubleSpinBox_2 = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.doubleSpinBox_2.setEnabled(True)
+        self.doubleSpinBox_2.setGeometry(QtCore.QRect(170, 200, 91, 31))
+        self.doubleSpinBox_2.setDecimals(1)
+        self.doubleSpinBox_2.setMinimum(1.0)
+        self.doubleSpinBox_2.setMaximum(10.0)
+        self.doubleSpinBox_2.setSingleStep(0.5)
+        self.doubleSpinBox_2.setObjectName("doubleSpinBox_2")
+        self.checkBox_6 = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox_6.setGeometry(QtCore.QRect(10, 170, 91, 31))
+        self.checkBox_6.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.checkBox_6.setObjectName("checkBox_6")
+        self.comboBox_3 = QtWidgets.QComboBox(self.centralwidget)
+        self.comboBox_3.setGeometry(QtCore.QRect(170, 70, 91, 31))
+        self.comboBox_3.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.comboBox_3.setObjectName("comboBox_3")
+        self.comboBox_3.addItem("")
+        self.comboBox_3.addItem("")
+        self.doubleSpinBox_3 = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.doubleSpinBox_3.setGeometry(QtCore.QRect(10, 70, 151, 31))
+        self.doubleSpinBox_3.setDecimals(2)
+        self.doubleSpinBox_3.setMinimum(0.01)
+        self.doubleSpinBox_3.setMaximum(100.0)
+        self.doubleSpinBox_3.setSingleStep(0.01)
+        self.doubleSpinBox_3.setObjectName("doubleSpinBox_3")
+        self.checkBox = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox.setGeometry(QtCore.QRect(170, 110, 70, 21))
+        self.checkBox.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.checkBox.setObjectName("checkBox")
+        self.label_4 = QtWidgets.QLabel(self.centralwidget)
+        self.label_4.setGeometry(QtCore.QRect(170, 180, 81, 21))
+        self.label_4.setObjectName("label_4")
+        self.checkBox_4 = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox_4.setEnabled(False)
+        self.checkBox_4.setGeometry(QtCore.QRect(170, 130, 51, 31))
+        self.checkBox_4.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.checkBox_4.setObjectName("checkBox_4")
+        self.checkBox_5 = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox_5.setEnabled(False)
+        self.checkBox_5.setGeometry(QtCore.QRect(230, 130, 51, 31))
+        self.checkBox_5.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.checkBox_5.setObjectName("checkBox_5")
+        self.checkBox_7 = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox_7.setEnabled(False)
+        self.checkBox_7.setGeometry(QtCore.QRect(280, 130, 51, 31))
+        self.checkBox_7.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.checkBox_7.setObjectName("checkBox_7")
+        self.checkBox_8 = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox_8.setEnabled(False)
+        self.checkBox_8.setGeometry(QtCore.QRect(330, 130, 51, 31))
+        self.checkBox_8.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.checkBox_8.setObjectName("checkBox_8")
+        self.doubleSpinBox_4 = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.doubleSpinBox_4.setEnabled(True)
+        self.doubleSpinBox_4.setGeometry(QtCore.QRect(10, 270, 151, 31))
+        self.doubleSpinBox_4.setDecimals(1)
+        self.doubleSpinBox_4.setMinimum(1.0)
+        self.doubleSpinBox_4.setMaximum(10.0)
+        self.doubleSpinBox_4.setSingleStep(0.1)
+        self.doubleSpinBox_4.setProperty("value", 5.0)
+        self.doubleSpinBox_4.setObjectName("doubleSpinBox_4")
+        self.spinBox_4 = QtWidgets.QSpinBox(self.centralwidget)
+        self.spinBox_4.setGeometry(QtCore.QRect(170, 270, 91, 31))
+        self.spinBox_4.setMinimum(9)
+        self.spinBox_4.setMaximum(999999)
+        self.spinBox_4.setObjectName("spinBox_4")
+        self.label_5 = QtWidgets.QLabel(self.centralwidget)
+        self.label_5.setGeometry(QtCore.QRect(170, 250, 91, 21))
+        self.label_5.setObjectName("label_5")
+        self.label_7 = QtWidgets.QLabel(self.centralwidget)
+        self.label_7.setGeometry(QtCore.QRect(270, 250, 101, 21))
+        self.label_7.setObjectName("label_7")
+        self.spinBox_5 = QtWidgets.QSpinBox(self.centralwidget)
+        self.spinBox_5.setGeometry(QtCore.QRect(270, 270, 151, 31))
+        self.spinBox_5.setMinimum(1)
+        self.spinBox_5.setMaximum(999999)
+        self.spinBox_5.setProperty("value", 5)
+        self.spinBox_5.setObjectName("spinBox_5")
+        self.spinBox_6 = QtWidgets.QSpinBox(self.centralwidget)
+        self.spinBox_6.setGeometry(QtCore.QRect(10, 340, 151, 31))
+        self.spinBox_6.setMinimum(1)
+        self.spinBox_6.setMaximum(999999)
+        self.spinBox_6.setProperty("value", 14)
+        self.spinBox_6.setObjectName("spinBox_6")
+        self.label_8 = QtWidgets.QLabel(self.centralwidget)
+        self.label_8.setGeometry(QtCore.QRect(10, 320, 91, 21))
+        self.label_8.setObjectName("label_8")
+        self.checkBox_9 = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox_9.setGeometry(QtCore.QRect(170, 320, 101, 21))
+        self.checkBox_9.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.checkBox_9.setObjectName("checkBox_9")
+        self.doubleSpinBox_5 = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.doubleSpinBox_5.setEnabled(False)
+        self.doubleSpinBox_5.setGeometry(QtCore.QRect(170, 340, 91, 31))
+        self.doubleSpinBox_5.setDecimals(5)
+        self.doubleSpinBox_5.setMinimum(1.0)
+        self.doubleSpinBox_5.setMaximum(9999.0)
+        self.doubleSpinBox_5.setSingleStep(1e-05)
+        self.doubleSpinBox_5.setProperty("value", 50.0)
+        self.doubleSpinBox_5.setObjectName("doubleSpinBox_5")
+        self.doubleSpinBox_6 = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.doubleSpinBox_6.setEnabled(False)
+        self.doubleSpinBox_6.setGeometry(QtCore.QRect(270, 340, 151, 31))
+        self.doubleSpinBox_6.setDecimals(5)
+        self.doubleSpinBox_6.setMinimum(1.0)
+        self.doubleSpinBox_6.setMaximum(9999.0)
+        self.doubleSpinBox_6.setSingleStep(1e-05)
+        self.doubleSpinBox_6.setProperty("value", 200.0)
+        self.doubleSpinBox_6.setObjectName("doubleSpinBox_6")
+        self.label_9 = QtWidgets.QLabel(self.centralwidget)
+        self.label_9.setGeometry(QtCore.QRect(10, 390, 151, 21))
+        self.label_9.setObjectName("label_9")
+        self.spinBox_7 = QtWidgets.QSpinBox(self.centralwidget)
+        self.spinBox_7.setGeometry(QtCore.QRect(10, 410, 151, 31))
+        self.spinBox_7.setMaximum(999)
+        self.spinBox_7.setObjectName("spinBox_7")
+        self.label_10 = QtWidgets.QLabel(self.centralwidget)
+        self.label_10.setGeometry(QtCore.QRect(170, 390, 91, 21))
+        self.label_10.setObjectName("label_10")
+        self.doubleSpinBox_7 = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.doubleSpinBox_7.setGeometry(QtCore.QRect(170, 410, 91, 31))
+        self.doubleSpinBox_7.setDecimals(2)
+        self.doubleSpinBox_7.setMaximum(9999999.0)
+        self.doubleSpinBox_7.setSingleStep(10.0)
+        self.doubleSpinBox_7.setObjectName("doubleSpinBox_7")
+        self.label_11 = QtWidgets.QLabel(self.centralwidget)
+        self.label_11.setGeometry(QtCore.QRect(270, 390, 101, 21))
+        self.label_11.setObjectName("label_11")
+        self.comboBox_4 = QtWidgets.QComboBox(self.centralwidget)
+        self.comboBox_4.setGeometry(QtCore.QRect(270, 410, 151, 31))
+        self.comboBox_4.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.comboBox_4.setObjectName("comboBox_4")
+        self.comboBox_4.addItem("")
+        self.comboBox_4.addItem("")
+        MainWindow.setCentralWidget(self.centralwidget)
+
+        self.retranslateUi(MainWindow)
+        self.comboBox.setCurrentIndex(1)
+        QtCore.QMetaObject.connectSlotsByName(MainWindow)
+
+    def retranslateUi(self, MainWindow):
+        _translate = QtCore.QCoreApplication.translate
+        MainWindow.setWindowTitle(_translate("MainWindow", "TRADER 3 - EDIT"))
+        self.lineEdit.setPlaceholderText(_translate("MainWindow", "BTCUSD"))
+        self.label.setText(_translate("MainWindow", "Rủi ro"))
+        self.comboBox.setItemText(0, _translate("MainWindow", "1m"))
+        self.comboBox.setItemText(1, _translate("MainWindow", "5m"))
+        self.comboBox.setItemText(2, _translate("MainWindow", "15m"))
+        self.checkBox_2.setText(_translate("MainWindow", "Chỉ mua"))
+        self.checkBox_3.setText(_translate("MainWindow", "Chỉ bán"))
+        self.pushButton.setText(_translate("MainWindow", "Lưu"))
+        self.label_3.setText(_translate("MainWindow", "Hệ số đơn vị"))
+        self.label_6.setText(_translate("MainWindow", "ATR Multiplier"))
+        self.checkBox_6.setText(_translate("MainWindow", "Khối lượng"))
+        self.comboBox_3.setItemText(0, _translate("MainWindow", "Cash"))
+        self.comboBox_3.setItemText(1, _translate("MainWindow", "%"))
+        self.checkBox.setText(_translate("MainWindow", "Bộ lọc"))
+        self.label_4.setText(_translate("MainWindow", "Risk/Reward"))
+        self.checkBox_4.setText(_translate("MainWindow", "15m"))
+        self.checkBox_5.setText(_translate("MainWindow", "1h"))
+        self.checkBox_7.setText(_translate("MainWindow", "4h"))
+        self.checkBox_8.setText(_translate("MainWindow", "1d"))
+        self.label_5.setText(_translate("MainWindow", "Pivot distance"))
+        self.label_7.setText(_translate("MainWindow", "Pivot lookback"))
+        self.label_8.setText(_translate("MainWindow", "ATR Length"))
+        self.checkBox_9.setText(_translate("MainWindow", "SL min/max"))
+        self.label_9.setText(_translate("MainWindow", "Số lệnh nhồi tối đa"))
+        self.spinBox_7.setToolTip(_translate("MainWindow", "0 = không giới hạn"))
+        self.spinBox_7.setSpecialValueText(_translate("MainWindow", "Không giới hạn"))
+        self.label_10.setText(_translate("MainWindow", "Lỗ tối đa"))
+        self.doubleSpinBox_7.setToolTip(_translate("MainWindow", "0 = không giới hạn"))
+        self.label_11.setText(_translate("MainWindow", "Kích hoạt"))
+        self.comboBox_4.setToolTip(_translate("MainWindow", "bar_close: vào lệnh khi nến đóng, tick: vào lệnh khi giá vượt mức kích hoạt"))
+        self.comboBox_4.setItemText(0, _translate("MainWindow", "bar_close"))
+        self.comboBox_4.setItemText(1, _translate("MainWindow", "tick"))
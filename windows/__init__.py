@@ -1,2 +1,10 @@
-from .edit_window import EditWindow
-from .main_window import MainWindow
+def __getattr__(name: str):
+    # The windows import Qt, which windows.models and windows.threads do not need
+    if name == 'EditWindow':
+        from .edit_window import EditWindow
+        return EditWindow
+    if name == 'MainWindow':
+        from .main_window import MainWindow
+        return MainWindow
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
@@ -1,31 +1,26 @@
-import os
-import MetaTrader5 as mt5
-
 from pydantic import ValidationError
 from typing import Optional
+from brokers import Broker, MT5Broker
 from windows.models import TradingStrategyConfig, Config
-from functools import lru_cache
-from PyQt5 import uic
-from PyQt5.QtWidgets import QMainWindow, QCompleter, QMessageBox
-from PyQt5.QtGui import QStandardItem, QStandardItemModel
-from PyQt5.QtCore import QReadWriteLock
-
+from ui.edit_window import Ui_MainWindow
+from PyQt5.QtWidgets import QMainWindow, QMessageBox
+from .symbol_picker import SymbolPicker
 
-@lru_cache(maxsize=8)
-def get_symbols():
-    symbols = mt5.symbols_get()
-    return [item.name for item in symbols]
 
-
-class EditWindow(QMainWindow):
-    def __init__(self, version: int, rw_lock: QReadWriteLock, strategy_config: Optional[TradingStrategyConfig] = None):
+class EditWindow(QMainWindow, Ui_MainWindow):
+    def __init__(self,
+                 version: int,
+                 config: Config,
+                 strategy_config: Optional[TradingStrategyConfig] = None,
+                 broker: Optional[Broker] = None):
         super().__init__()
-        uic.loadUi(os.path.join(os.getcwd(), 'ui', 'EditWindow.ui'), self)
+        self.setupUi(self)
 
         self.setWindowTitle(f'TRADER {version} - EDIT')
 
-        self.rw_lock = rw_lock
+        self.config = config
         self.strategy_config = strategy_config
+        self.broker = broker or MT5Broker()
         
         self.lineEdit.textChanged.connect(self.lineEdit_textChanged)
         self.checkBox.stateChanged.connect(self.checkBox_stateChanged)
@@ -33,12 +28,7 @@ class EditWindow(QMainWindow):
         self.checkBox_9.stateChanged.connect(self.checkBox_9_stateChanged)
         self.pushButton.clicked.connect(self.pushButton_clicked)
 
-        self.symbols_model  = QStandardItemModel()
-        self.lineEdit.setCompleter(QCompleter(self.symbols_model, self))
-
-        symbols = get_symbols()
-        for symbol in symbols:
-            self.symbols_model.appendRow(QStandardItem(symbol))
+        self.symbol_picker = SymbolPicker(self.lineEdit, self.broker)
 
         self.timeframe_checkbox_mapping = {
             '15m': self.checkBox_4,
@@ -71,6 +61,9 @@ class EditWindow(QMainWindow):
             self.checkBox_9.setChecked(self.strategy_config.use_sl_min_max)
             self.doubleSpinBox_5.setValue(self.strategy_config.sl_min_price)
             self.doubleSpinBox_6.setValue(self.strategy_config.sl_max_price)
+            self.spinBox_7.setValue(self.strategy_config.max_recovery_depth)
+            self.doubleSpinBox_7.setValue(self.strategy_config.max_recovery_loss)
+            self.comboBox_4.setCurrentText(self.strategy_config.trigger_mode)
 
     def checkBox_stateChanged(self):
         value = self.checkBox.isChecked()
@@ -124,14 +117,16 @@ class EditWindow(QMainWindow):
             'use_sl_min_max': self.checkBox_9.isChecked(),
             'sl_min_price': self.doubleSpinBox_5.value(),
             'sl_max_price': self.doubleSpinBox_6.value(),
+            'max_recovery_depth': self.spinBox_7.value(),
+            'max_recovery_loss': self.doubleSpinBox_7.value(),
+            'trigger_mode': self.comboBox_4.currentText(),
         }
 
         for filter in self.timeframe_checkbox_mapping:
             if self.timeframe_checkbox_mapping[filter].isChecked():
                 params['timeframe_filters'].append(filter)
 
-        config = Config(self.rw_lock)
-        with config.load_and_update() as config:
+        with self.config.load_and_update() as config:
             try:
                 strategy_config = TradingStrategyConfig(**params)
 
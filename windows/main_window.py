@@ -1,22 +1,27 @@
 import os
-import MetaTrader5 as mt5
 
 from .edit_window import EditWindow
-from typing import List
-from windows.threads import OrderExecutorThread, RecoveryZoneThread
-from windows.models import TradingStrategyConfig, Config
-from PyQt5 import uic
-from PyQt5.QtWidgets import QMainWindow, QTableWidgetItem, QPushButton
-from PyQt5.QtCore import Qt, QFileSystemWatcher, QReadWriteLock
+from .symbol_picker import symbol_cache
+from .symbol_table import SymbolRow, SymbolTableModel, ButtonDelegate, BUTTON_COLUMNS, SIGNAL_COLUMN
+from typing import Dict, List, Optional
+from account_state import AccountState
+from metrics import MetricsServer, SummaryWriter
+from brokers import Broker, MT5Broker, LockedBroker
+from windows.models import Config
+from ui.main_window import Ui_MainWindow
+from PyQt5.QtWidgets import QMainWindow
+from PyQt5.QtCore import Qt, QFileSystemWatcher, QTimer, QModelIndex
 from PyQt5.QtGui import QCloseEvent
 
 
-class MainWindow(QMainWindow):
-    def __init__(self, version: int = 5):
+class MainWindow(QMainWindow, Ui_MainWindow):
+    def __init__(self, version: int = 5, broker: Optional[Broker] = None):
         super().__init__()
-        uic.loadUi(os.path.join(os.getcwd(), 'ui', 'MainWindow.ui'), self)
+        self.setupUi(self)
 
         self.version = version
+        self.broker = LockedBroker(broker or MT5Broker())
+        self.account = AccountState(self.broker)
 
         self.setWindowTitle(f'TRADER {self.version}')
         
@@ -24,13 +29,29 @@ class MainWindow(QMainWindow):
         self.pushButton_2.clicked.connect(self.pushButton_2_clicked)
         self.checkBox.stateChanged.connect(self.checkBox_stateChanged)
         
-        self.rw_lock = QReadWriteLock()
-        self.config = Config(self.rw_lock)
+        self.config = Config()
         self.edit_window = None
 
-        file_watcher = QFileSystemWatcher(self)
-        file_watcher.fileChanged.connect(self.on_file_changed)
-        file_watcher.addPath(self.config.file_path)
+        # The table is refreshed from the config and the live state at most every 250 ms;
+        # the model diffs each refresh so only the cells that changed are repainted
+        self.table_model = SymbolTableModel(self)
+        self.button_delegate = ButtonDelegate(self)
+        self.button_delegate.clicked.connect(self.on_table_clicked)
+        self.tableView.setModel(self.table_model)
+        for column in BUTTON_COLUMNS:
+            self.tableView.setItemDelegateForColumn(column, self.button_delegate)
+        self.tableView.setColumnWidth(SIGNAL_COLUMN, 120)
+        self.tableView.verticalHeader().hide()
+        self.tableView.setMouseTracking(True)
+        self.tableView.entered.connect(self.on_table_entered)
+
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.on_file_changed)
+        self.file_watcher.addPath(self.config.file_path)
+
+        self.table_timer = QTimer(self)
+        self.table_timer.timeout.connect(self.refresh_table)
+        self.table_timer.start(250)
 
         with self.config.load_and_update() as config:
             active_symbols = self.get_active_symbols(config)
@@ -38,61 +59,103 @@ class MainWindow(QMainWindow):
                 if config[symbol]['is_running']:
                     config[symbol]['is_running'] = False
 
-        self.load_table()
+        # The threads import the analysis libraries, so they are created once the window is up
+        self.order_executor = None
+        self.recovery_thread = None
+        QTimer.singleShot(0, self.start_threads)
 
-        self.order_executor = OrderExecutorThread(self.rw_lock)
-        self.recovery_thread = RecoveryZoneThread(self.rw_lock)
+        self.refresh_table()
+
+        # Latency histograms and counters on http://127.0.0.1:<port>/metrics and in metrics.json
+        self.metrics_writer = SummaryWriter()
+        self.metrics_writer.start()
+        try:
+            self.metrics_server = MetricsServer(port=int(os.environ.get('TRADER_METRICS_PORT', 9108)))
+            self.metrics_server.start()
+        except OSError as ex:
+            self.metrics_server = None
+            print(__class__.__name__ + ':', 'metrics endpoint not started:', ex)
+
+    def start_threads(self):
+        from windows.threads import OrderExecutorThread, RecoveryZoneThread
+
+        self.order_executor = OrderExecutorThread(self.config, self.broker, self.account, workers=min(8, os.cpu_count() or 1))
+        self.order_executor.multiple_pairs = self.checkBox.isChecked()
+        self.recovery_thread = RecoveryZoneThread(self.config, self.broker, self.account)
 
         self.order_executor.start()
         self.recovery_thread.start()
 
+        if symbol_cache.is_stale(symbol_cache.get_key(self.broker)):
+            symbol_cache.refresh(self.broker)
+
     def get_active_symbols(self, config: dict) -> List[str]:
         return [symbol for symbol in config if config[symbol]['is_running']]
 
-    def get_selected_symbol(self) -> str:
-        row = self.tableWidget.currentRow()
-        return self.tableWidget.item(row, 0).text()
-
-    def load_table(self):
+    def get_table_rows(self) -> Dict[str, SymbolRow]:
         config = self.config.get()
+        positions = {}
+        for position in self.account.positions(refresh=False):
+            positions.setdefault(position.symbol, []).append(position)
+
+        executor = self.order_executor
+        last_signals = executor.last_signals if executor is not None else {}
+        armed = executor.armed if executor is not None else {}
+
+        rows = {}
+        for symbol, value in config.items():
+            if not value['is_running']:
+                state = 'Dừng'
+            elif symbol in armed:
+                state = 'Chờ kích hoạt'
+            else:
+                state = 'Đang chạy'
+
+            symbol_positions = positions.get(symbol, [])
+            profit = round(sum(position.profit for position in symbol_positions), 2)
+
+            signal = ''
+            if symbol in last_signals:
+                bar_time, divergence_type = last_signals[symbol]
+                signal = ('Tăng ' if divergence_type == 0 else 'Giảm ') + bar_time.strftime('%d/%m %H:%M')
+
+            cells = (symbol,
+                     value['timeframe'],
+                     state,
+                     str(len(symbol_positions) - 1) if symbol_positions else '',
+                     signal,
+                     f'{profit:.2f}' if symbol_positions else '',
+                     'Dừng' if value['is_running'] else 'Bắt đầu',
+                     'Chỉnh sửa',
+                     'Xóa',
+                     'Đóng tất cả lệnh')
+            rows[symbol] = SymbolRow(cells, frozenset([8]) if value['is_running'] else frozenset(), profit)
+
+        return rows
+
+    def refresh_table(self):
+        self.table_model.set_rows(self.get_table_rows())
+
+    def on_table_clicked(self, row: int, column: int):
+        symbol = self.table_model.symbol(row)
+        actions = {
+            6: self.start_button_clicked,
+            7: self.edit_button_clicked,
+            8: self.remove_button_clicked,
+            9: self.close_all_order
+        }
+        actions[column](symbol)
 
-        button_actions = [[2, 'Bắt đầu', self.start_button_clicked],
-                          [3, 'Chỉnh sửa', self.edit_button_clicked],
-                          [4, 'Xóa', self.remove_button_clicked],
-                          [5, 'Đóng tất cả lệnh', self.close_all_order]]
-        
-        while self.tableWidget.rowCount() > 0:
-            self.tableWidget.removeRow(0)
-
-        for key, value in config.items():
-            row = self.tableWidget.rowCount()
-
-            self.tableWidget.insertRow(row)
-            self.tableWidget.setItem(row, 0, QTableWidgetItem(key))
-            self.tableWidget.setItem(row, 1, QTableWidgetItem(value['timeframe']))
-
-            for index, text, action in button_actions:
-                button = QPushButton(text)
-                button.setCursor(Qt.CursorShape.PointingHandCursor)
-                button.clicked.connect(action)
-
-                if index == 2 and value['is_running']:
-                    button.setText('Dừng')
-                elif index == 4 and value['is_running']:
-                    button.setEnabled(False)
-
-                self.tableWidget.setCellWidget(row, index, button)
+    def on_table_entered(self, index: QModelIndex):
+        enabled = index.column() in BUTTON_COLUMNS and index.flags() & Qt.ItemIsEnabled
+        self.tableView.viewport().setCursor(Qt.CursorShape.PointingHandCursor if enabled else Qt.CursorShape.ArrowCursor)
 
-    def start_button_clicked(self):
-        symbol = self.get_selected_symbol()
-        button: QPushButton = self.sender()
-        
+    def start_button_clicked(self, symbol: str):
         with self.config.load_and_update() as config:
-            match button.text():
-                case 'Bắt đầu':
-                    config[symbol]['is_running'] = True
-                case 'Dừng':
-                    config[symbol]['is_running'] = False
+            if symbol not in config:
+                return
+
+            config[symbol]['is_running'] = not config[symbol]['is_running']
 
             active_symbols = self.get_active_symbols(config)
             
@@ -104,56 +167,56 @@ class MainWindow(QMainWindow):
                     if not active_symbols:
                         self.pushButton_2.setText('Bắt đầu')
 
-    def edit_button_clicked(self):
-        config = self.config.get()
-        symbol = self.get_selected_symbol()
-        strategy_config = TradingStrategyConfig(symbol=symbol, **config[symbol])
+    def edit_button_clicked(self, symbol: str):
+        strategy_config = self.config.get_model(symbol)
         
-        self.edit_window = EditWindow(self.version, self.rw_lock, strategy_config)
+        self.edit_window = EditWindow(self.version, self.config, strategy_config, self.broker)
         self.edit_window.show()
 
-    def remove_button_clicked(self):
+    def remove_button_clicked(self, symbol: str):
         with self.config.load_and_update() as config:
-            symbol = self.get_selected_symbol()
-            config.pop(symbol)
+            config.pop(symbol, None)
         
     def pushButton_clicked(self):
-        self.edit_window = EditWindow(self.version, self.rw_lock)
+        self.edit_window = EditWindow(self.version, self.config, broker=self.broker)
         self.edit_window.show()
 
-    def close_all_order(self):
-        symbol = self.get_selected_symbol()
-        positions = mt5.positions_get(symbol=symbol)
+    def close_all_order(self, symbol: str):
+        positions = self.broker.positions_get(symbol=symbol)
 
         if not positions:
             return
         
         position_type = {
-            mt5.ORDER_TYPE_BUY: mt5.ORDER_TYPE_SELL,
-            mt5.ORDER_TYPE_SELL: mt5.ORDER_TYPE_BUY
+            self.broker.ORDER_TYPE_BUY: self.broker.ORDER_TYPE_SELL,
+            self.broker.ORDER_TYPE_SELL: self.broker.ORDER_TYPE_BUY
         }
 
         for position in positions:
-            tick_info = mt5.symbol_info_tick(symbol)
+            tick_info = self.broker.symbol_info_tick(symbol)
             price_mapping = {
-                mt5.ORDER_TYPE_BUY: tick_info.bid,
-                mt5.ORDER_TYPE_SELL: tick_info.ask
+                self.broker.ORDER_TYPE_BUY: tick_info.bid,
+                self.broker.ORDER_TYPE_SELL: tick_info.ask
             }
             request = {
-                'action': mt5.TRADE_ACTION_DEAL,
+                'action': self.broker.TRADE_ACTION_DEAL,
                 'position': position.ticket,
                 'symbol': position.symbol,
                 "volume": position.volume,
                 'type': position_type[position.type],
                 'price': price_mapping[position.type],
                 'deviation': 30,
-                "type_time": mt5.ORDER_TIME_GTC
+                "type_time": self.broker.ORDER_TIME_GTC
             }
 
-            mt5.order_send(request)
+            self.broker.order_send(request)
+
+    def on_file_changed(self, path: str):
+        # The file is replaced on every save, which drops it from the watcher on some platforms
+        if path not in self.file_watcher.files():
+            self.file_watcher.addPath(path)
 
-    def on_file_changed(self, _: str):
-        self.load_table()
+        self.config.reload()
 
     def closeEvent(self, _: QCloseEvent):
         config = self.config.get()
@@ -166,6 +229,14 @@ class MainWindow(QMainWindow):
         if active_symbols:
             self.config.update(config)
 
+        for thread in (self.order_executor, self.recovery_thread):
+            if thread is not None:
+                thread.stop()
+                thread.join(5.)
+
+        self.config.flush()
+        self.metrics_writer.stop()
+
     def pushButton_2_clicked(self):
         with self.config.load_and_update() as config:
             if not config:
@@ -186,5 +257,6 @@ class MainWindow(QMainWindow):
                     self.pushButton_2.setText('Bắt đầu')
 
     def checkBox_stateChanged(self):
-        self.order_executor.multiple_pairs = self.checkBox.isChecked()
+        if self.order_executor is not None:
+            self.order_executor.multiple_pairs = self.checkBox.isChecked()
         
\ No newline at end of file
@@ -1,2 +1,2 @@
-from .strategy_config import TradingStrategyConfig, Position
+from .strategy_config import TradingStrategyConfig, Position, LadderStep
 from .config import Config
\ No newline at end of file
@@ -1,10 +1,15 @@
 import os
+import copy
 import json
+import time
+import atexit
+import threading
 
-from typing import Generator
+from typing import Dict, Generator, Optional
 from contextlib import contextmanager
 from datetime import datetime, date
-from PyQt5.QtCore import QReadWriteLock
+from metrics import registry
+from .strategy_config import TradingStrategyConfig
 
 
 def serialize_date_to_iso(o):
@@ -13,43 +18,200 @@ def serialize_date_to_iso(o):
 
 
 class Config:
-    def __init__(self, rw_lock: QReadWriteLock):
-        self.file_path = os.path.join(os.getcwd(), 'config.json')
-        self.rw_lock = rw_lock
+    # In-memory state shared by the window and the threads. Every symbol is kept both as
+    # its config.json value and as a validated TradingStrategyConfig; both are replaced
+    # only when the value really changes, and each change bumps a version. config.json is
+    # written behind: changes are batched for delay seconds, then dumped once to a temp
+    # file that replaces the old one.
+    def __init__(self, file_path: Optional[str] = None, delay: float = 1.):
+        self.file_path = file_path or os.path.join(os.getcwd(), 'config.json')
+        self.delay = delay
+
+        self.lock = threading.RLock()
+        self.condition = threading.Condition(self.lock)
+        self.write_lock = threading.Lock()
+
+        self.data: Dict[str, dict] = {}
+        self.models: Dict[str, TradingStrategyConfig] = {}
+        self.version = 0
+        self.versions: Dict[str, int] = {}
+        self.saved_version = 0
+        self.dirty_since = None
+        self.written_mtime = None
+        self.closed = False
+
+        self.writer = threading.Thread(target=self._write_loop, name='ConfigWriter', daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+        self.load()
+
+    def _read_file(self) -> dict:
+        if not os.path.exists(self.file_path):
+            return {}
+
+        with open(self.file_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def load(self):
+        data = self._read_file()
+        with self.lock:
+            self._replace(data)
+            self.saved_version = self.version
+            self.dirty_since = None
+
+        if os.path.exists(self.file_path):
+            self.written_mtime = os.stat(self.file_path).st_mtime_ns
+
+    def reload(self) -> bool:
+        # Picks up edits made to config.json outside this process; our own writes are skipped
+        if not os.path.exists(self.file_path) or os.stat(self.file_path).st_mtime_ns == self.written_mtime:
+            return False
+
+        self.load()
+        return True
+
+    def _apply(self, strategy_config: TradingStrategyConfig) -> bool:
+        value = strategy_config.model_dump(mode='json', exclude={'symbol'})
+        if self.data.get(strategy_config.symbol) == value:
+            return False
+
+        self.data[strategy_config.symbol] = value
+        self.models[strategy_config.symbol] = strategy_config
+        self._changed(strategy_config.symbol)
+
+        return True
+
+    def _remove(self, symbol: str) -> bool:
+        if symbol not in self.data:
+            return False
+
+        self.data.pop(symbol)
+        self.models.pop(symbol)
+        self._changed(symbol)
+
+        return True
+
+    def _changed(self, symbol: str):
+        self.version += 1
+        self.versions[symbol] = self.version
+
+        if self.dirty_since is None:
+            self.dirty_since = time.monotonic()
+        self.condition.notify()
+
+    def _replace(self, data: dict, base: Optional[dict] = None):
+        # Validates every changed entry first so a bad value leaves the state untouched.
+        # With base, only the entries that differ from it are applied.
+        base = self.data if base is None else base
+        changed = [
+            TradingStrategyConfig(symbol=key, **value)
+            for key, value in data.items() if base.get(key) != value
+        ]
+
+        for key in [key for key in base if key not in data]:
+            self._remove(key)
+
+        for strategy_config in changed:
+            self._apply(strategy_config)
 
     def get(self) -> dict:
-        self.rw_lock.lockForRead()
-        try:
-            config = {}
+        with self.lock:
+            return copy.deepcopy(self.data)
+
+    def get_models(self) -> Dict[str, TradingStrategyConfig]:
+        with self.lock:
+            return {key: value.model_copy(deep=True) for key, value in self.models.items()}
+
+    def get_model(self, symbol: str) -> Optional[TradingStrategyConfig]:
+        with self.lock:
+            strategy_config = self.models.get(symbol)
+            return strategy_config.model_copy(deep=True) if strategy_config is not None else None
+
+    def get_version(self, symbol: Optional[str] = None) -> int:
+        with self.lock:
+            return self.version if symbol is None else self.versions.get(symbol, 0)
+
+    def set(self, strategy_config: TradingStrategyConfig) -> bool:
+        with self.lock:
+            return self._apply(TradingStrategyConfig.model_validate(strategy_config.model_dump()))
 
-            if os.path.exists(self.file_path):
-                with open(self.file_path, encoding='utf-8') as file:
-                    config = json.load(file)
+    def patch(self, symbol: str, **fields) -> bool:
+        # Changes only the given fields, so a thread cannot undo what the window changed meanwhile
+        with self.lock:
+            if symbol not in self.models:
+                return False
 
-            return config
-        finally:
-            self.rw_lock.unlock()
+            strategy_config = self.models[symbol].model_copy(update=fields)
+            return self._apply(TradingStrategyConfig.model_validate(strategy_config.model_dump()))
+
+    def remove(self, symbol: str) -> bool:
+        with self.lock:
+            return self._remove(symbol)
 
     @contextmanager
     def load_and_update(self) -> Generator[dict, None, None]:
-        config = {}
-
-        self.rw_lock.lockForRead()
-        try:
-            if os.path.exists(self.file_path):
-                with open(self.file_path, encoding='utf-8') as file:
-                    config = json.load(file)
-            
-            yield config
-        finally:
-            self.rw_lock.unlock()
-            
-        self.update(config)
-    
+        snapshot = self.get()
+        config = copy.deepcopy(snapshot)
+
+        yield config
+
+        with self.lock:
+            self._replace(config, base=snapshot)
+
     def update(self, data: dict):
-        self.rw_lock.lockForWrite()
-        try:
-            with open(self.file_path, 'w', encoding='utf-8') as file:
-                json.dump(data, file, indent=4, default=serialize_date_to_iso)
-        finally:
-            self.rw_lock.unlock()
+        with self.lock:
+            self._replace(data)
+
+    def _write(self):
+        with self.write_lock:
+            with self.lock:
+                if self.saved_version == self.version:
+                    self.dirty_since = None
+                    return
+
+                version = self.version
+                content = json.dumps(self.data, indent=4, default=serialize_date_to_iso)
+                self.dirty_since = None
+
+            with registry.span('config_write'):
+                temp_path = self.file_path + '.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    file.write(content)
+                os.replace(temp_path, self.file_path)
+
+            self.written_mtime = os.stat(self.file_path).st_mtime_ns
+            with self.lock:
+                self.saved_version = max(self.saved_version, version)
+
+    def _write_loop(self):
+        while 1:
+            with self.condition:
+                while not self.closed and (self.dirty_since is None
+                                           or time.monotonic() < self.dirty_since + self.delay):
+                    timeout = None if self.dirty_since is None else self.dirty_since + self.delay - time.monotonic()
+                    self.condition.wait(timeout)
+
+                if self.closed:
+                    return
+
+            try:
+                self._write()
+            except OSError as ex:
+                print(__class__.__name__ + ':', ex)
+                with self.lock:
+                    if self.dirty_since is None:
+                        self.dirty_since = time.monotonic()
+
+    def flush(self):
+        self._write()
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify()
+
+        atexit.unregister(self.close)
+        self.flush()
@@ -3,10 +3,22 @@ from datetime import datetime
 from pydantic import BaseModel, field_validator, Field
 
 
+class LadderStep(BaseModel):
+    depth: int
+    type: int
+    entry: float
+    volume: float
+    take_profit: float
+    total_volume: float
+    net_volume: float
+    worst_loss: float
+
+
 class Position(BaseModel):
     price_gap: float = -1
     stop_loss: float = -1
     take_profit: float = -1
+    ladder: Optional[list[LadderStep]] = None
 
 
 class TradingStrategyConfig(BaseModel):
@@ -32,10 +44,18 @@ class TradingStrategyConfig(BaseModel):
     use_sl_min_max: bool = False
     sl_min_price: float = 50.00000
     sl_max_price: float = 200.00000
+    max_recovery_depth: int = 0
+    max_recovery_loss: float = 0.
+    trigger_mode: str = 'bar_close'
     
     @field_validator('symbol')
     def symbol_is_not_empty(cls, value: str):
         if not value:
             raise ValueError('Vui lòng chọn cặp')
         return value
-    
\ No newline at end of file
+    
+    @field_validator('trigger_mode')
+    def trigger_mode_is_known(cls, value: str):
+        if value not in ('bar_close', 'tick'):
+            raise ValueError('Chế độ kích hoạt phải là bar_close hoặc tick')
+        return value
@@ -0,0 +1,116 @@
+import threading
+
+from typing import List, Optional
+from brokers import Broker
+from symbol_cache import SymbolCache, SymbolIndex
+from PyQt5.QtCore import Qt, QObject, QAbstractListModel, QModelIndex, pyqtSignal
+from PyQt5.QtWidgets import QCompleter, QLineEdit
+
+
+symbol_cache = SymbolCache()
+
+
+def describe_symbol(item: dict) -> str:
+    lines = [item['name']]
+    if item.get('description'):
+        lines.append(item['description'])
+    if item.get('path'):
+        lines.append(f'Đường dẫn: {item["path"]}')
+    if item.get('digits') is not None:
+        lines.append(f'Số chữ số: {item["digits"]}')
+    if item.get('trade_contract_size') is not None:
+        lines.append(f'Khối lượng hợp đồng: {item["trade_contract_size"]:g}')
+    if item.get('volume_step') is not None:
+        lines.append(f'Bước khối lượng: {item["volume_step"]:g}')
+    return '\n'.join(lines)
+
+
+class SymbolListModel(QAbstractListModel):
+    # Matches of the last query; the completer inserts the name, the popup also shows the path
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items: List[dict] = []
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        item = self.items[index.row()]
+        if role == Qt.DisplayRole:
+            return f'{item["name"]}    {item["path"]}' if item.get('path') else item['name']
+        if role == Qt.EditRole:
+            return item['name']
+        if role == Qt.ToolTipRole:
+            return describe_symbol(item)
+        return None
+
+    def set_items(self, items: List[dict]):
+        self.beginResetModel()
+        self.items = items
+        self.endResetModel()
+
+
+class SymbolPicker(QObject):
+    # Completer of a QLineEdit over the terminal's symbols. The SymbolIndex is loaded on a
+    # background thread (from symbols.json when it is cached) and each edit asks it for at
+    # most limit matches, so neither opening the window nor typing depends on how many
+    # symbols the terminal has. Until the load finishes the last index built is used.
+    loaded = pyqtSignal(object)
+
+    def __init__(self, line_edit: QLineEdit, broker: Broker, limit: int = 50):
+        super().__init__(line_edit)
+        self.line_edit = line_edit
+        self.broker = broker
+        self.limit = limit
+        self.index: Optional[SymbolIndex] = symbol_cache.last_index
+
+        self.model = SymbolListModel(self)
+        self.completer = QCompleter(self.model, line_edit)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setCaseSensitivity(Qt.CaseInsensitive)
+        line_edit.setCompleter(self.completer)
+
+        line_edit.textEdited.connect(self.on_text_edited)
+        line_edit.textChanged.connect(self.on_text_changed)
+        self.loaded.connect(self.on_loaded)
+
+        threading.Thread(target=self.load, name='SymbolPicker', daemon=True).start()
+
+    def load(self):
+        try:
+            index = symbol_cache.get_index(self.broker)
+        except Exception as ex:
+            print(__class__.__name__ + ':', repr(ex))
+            return
+
+        try:
+            self.loaded.emit(index)
+        except RuntimeError:
+            # The window was closed before the symbols arrived
+            pass
+
+    def on_loaded(self, index: SymbolIndex):
+        self.index = index
+        self.on_text_changed(self.line_edit.text())
+        if self.line_edit.hasFocus() and self.line_edit.text():
+            self.on_text_edited(self.line_edit.text())
+
+    def on_text_edited(self, text: str):
+        if self.index is None:
+            return
+
+        self.model.set_items(self.index.search(text, self.limit))
+        if text and self.model.items:
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    def on_text_changed(self, text: str):
+        item = self.get_symbol(text)
+        self.line_edit.setToolTip(describe_symbol(item) if item else '')
+
+    def get_symbol(self, name: str) -> Optional[dict]:
+        return self.index.get(name) if self.index is not None else None
@@ -0,0 +1,139 @@
+from collections import namedtuple
+from typing import Dict, List
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, pyqtSignal
+from PyQt5.QtGui import QPalette
+from PyQt5.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionButton
+
+
+# cells holds one display value per column, disabled the button columns that cannot be
+# clicked and profit the floating PnL, which colours its cell
+SymbolRow = namedtuple('SymbolRow', ['cells', 'disabled', 'profit'])
+
+HEADERS = ['Symbol', 'Timeframe', 'Trạng thái', 'Tầng', 'Tín hiệu', 'Lãi/Lỗ', '', '', '', '']
+SIGNAL_COLUMN = 4
+PROFIT_COLUMN = 5
+BUTTON_COLUMNS = range(6, 10)
+
+
+class SymbolTableModel(QAbstractTableModel):
+    # One row per symbol of config.json. set_rows() diffs the new rows against the shown ones
+    # and signals only the rows inserted or removed and the cells that changed, so a refresh
+    # where nothing moved costs no repaint at all.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.symbols: List[str] = []
+        self.rows: Dict[str, SymbolRow] = {}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.symbols)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section: int, orientation, role: int = Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def flags(self, index: QModelIndex):
+        row = self.rows[self.symbols[index.row()]]
+        if index.column() in row.disabled:
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = self.rows[self.symbols[index.row()]]
+        if role == Qt.DisplayRole:
+            return row.cells[index.column()]
+        if role == Qt.ForegroundRole and index.column() == PROFIT_COLUMN and row.profit:
+            return Qt.darkGreen if row.profit > 0 else Qt.red
+        if role == Qt.TextAlignmentRole and index.column() == PROFIT_COLUMN:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def symbol(self, row: int) -> str:
+        return self.symbols[row]
+
+    def set_rows(self, rows: Dict[str, SymbolRow]):
+        # Removed symbols go first, bottom up in contiguous runs, then the remaining rows are
+        # compared cell by cell and new symbols are appended in the order given
+        removed = [row for row, symbol in enumerate(self.symbols) if symbol not in rows]
+        while removed:
+            last = removed.pop()
+            first = last
+            while removed and removed[-1] == first - 1:
+                first = removed.pop()
+
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for symbol in self.symbols[first:last + 1]:
+                self.rows.pop(symbol)
+            del self.symbols[first:last + 1]
+            self.endRemoveRows()
+
+        for row, symbol in enumerate(self.symbols):
+            old, new = self.rows[symbol], rows[symbol]
+            if old == new:
+                continue
+
+            self.rows[symbol] = new
+            columns = {column for column, (a, b) in enumerate(zip(old.cells, new.cells)) if a != b}
+            columns |= old.disabled ^ new.disabled
+            if old.profit != new.profit:
+                columns.add(PROFIT_COLUMN)
+            if columns:
+                self.dataChanged.emit(self.index(row, min(columns)), self.index(row, max(columns)))
+
+        added = [symbol for symbol in rows if symbol not in self.rows]
+        if added:
+            first = len(self.symbols)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            for symbol in added:
+                self.symbols.append(symbol)
+                self.rows[symbol] = rows[symbol]
+            self.endInsertRows()
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    # Draws the action cells as push buttons with the view's style and reports a click as
+    # (row, column); there is no button widget per cell
+    clicked = pyqtSignal(int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pressed = None
+
+    def paint(self, painter, option, index: QModelIndex):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data() or ''
+        button.palette = option.palette
+        button.state = QStyle.State_Enabled if index.flags() & Qt.ItemIsEnabled else QStyle.State_None
+        if not button.state & QStyle.State_Enabled:
+            button.palette.setCurrentColorGroup(QPalette.Disabled)
+        if self.pressed == (index.row(), index.column()):
+            button.state |= QStyle.State_Sunken
+
+        widget = option.widget
+        style = widget.style() if widget is not None else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, widget)
+
+    def editorEvent(self, event, model, option, index: QModelIndex) -> bool:
+        if not index.flags() & Qt.ItemIsEnabled:
+            return False
+
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self.pressed = (index.row(), index.column())
+        elif event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            pressed, self.pressed = self.pressed, None
+            if pressed == (index.row(), index.column()) and option.rect.contains(event.pos()):
+                self.clicked.emit(index.row(), index.column())
+        else:
+            return False
+
+        # Only this cell is repainted to show the button pressed or released
+        if option.widget is not None:
+            option.widget.viewport().update(option.rect)
+        return True
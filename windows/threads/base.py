@@ -1,43 +1,97 @@
-import MetaTrader5 as mt5
+import time
+import strategy
+import threading
 
-from windows.models import TradingStrategyConfig
+from typing import Optional
+from account_state import AccountState
+from brokers import Broker
+from metrics import registry
+from journal import journal, ORDER
+from windows.models import TradingStrategyConfig, LadderStep
 from windows.models import Config
-from PyQt5.QtCore import QThread, QReadWriteLock
 
 
-class BaseThread(QThread):
-    def __init__(self, rw_lock: QReadWriteLock):
-        self.config = Config(rw_lock)
+class BaseThread(threading.Thread):
+    # Plain threads so the engines also run without Qt (see daemon.py); stop() ends the
+    # loop of run() at its next wait
+    def __init__(self, config: Config, broker: Broker, account: Optional[AccountState] = None):
+        self.broker = broker
+        self.account = account or AccountState(broker)
+        self.config = config
         self.order_type_mapping = {
-            0: mt5.ORDER_TYPE_SELL_STOP,
-            1: mt5.ORDER_TYPE_BUY_STOP
+            0: self.broker.ORDER_TYPE_SELL_STOP,
+            1: self.broker.ORDER_TYPE_BUY_STOP
         }
         self.toggle_mapping = {
             0: 1,
             1: 0
         }
-        super().__init__()
+        self.stop_event = threading.Event()
+        super().__init__(name=type(self).__name__, daemon=True)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def is_stopped(self) -> bool:
+        return self.stop_event.is_set()
 
     def create_buy_sell_stop_order(self, symbol: str, order_type: int, volume: float, price: float, take_profit: float):
         request = {
-            "action": mt5.TRADE_ACTION_PENDING,
+            "action": self.broker.TRADE_ACTION_PENDING,
             'symbol': symbol,
             "volume": volume,
             "type": order_type,
             "price": price,
             "tp": take_profit,
             'deviation': 30,
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
+            "type_time": self.broker.ORDER_TIME_GTC,
+            "type_filling": self.broker.ORDER_FILLING_IOC,
         }
-        return mt5.order_send(request)
+        return self.order_send(request)
+
+    def order_send(self, request: dict, signal: Optional[str] = None):
+        # signal is the journal id of the signal the order belongs to
+        symbol = request.get('symbol', '')
+        start = time.perf_counter()
+        with registry.span('order_send', symbol):
+            result = self.broker.order_send(request)
+        latency = time.perf_counter() - start
+
+        retcode = result.retcode if result is not None else None
+        registry.increment('retcodes', symbol, retcode=retcode)
+        journal.record(ORDER, symbol, {
+            'request': dict(request),
+            'order': getattr(result, 'order', None),
+            'price': getattr(result, 'price', None),
+            'volume': getattr(result, 'volume', None),
+            'comment': getattr(result, 'comment', None)
+        }, signal, retcode, latency)
+
+        self.account.invalidate()
+        return result
     
-    def get_take_profit_price(self, position_type: int, strategy_config: TradingStrategyConfig, entry: float) -> float:
-        price_gap = strategy_config.position.price_gap * strategy_config.risk_reward
+    def build_ladder(self,
+                     strategy_config: TradingStrategyConfig,
+                     position_type: int,
+                     price_open: float,
+                     volume: float,
+                     price_gap: float) -> list[LadderStep]:
+        info = self.broker.symbol_info(strategy_config.symbol)
+        symbol_limits = {}
+        if info is not None:
+            symbol_limits = {
+                'volume_step': info.volume_step,
+                'volume_min': info.volume_min,
+                'volume_max': info.volume_max,
+                'contract_size': info.trade_contract_size
+            }
 
-        take_profit = {
-            0: entry + price_gap,
-            1: entry - price_gap
-        }
-        
-        return take_profit[position_type]
+        steps = strategy.build_recovery_plan(position_type, price_open, volume, price_gap,
+                                             strategy_config.risk_reward, **symbol_limits)
+        return [LadderStep(**step) for step in steps]
+
+    def get_take_profit_price(self, position_type: int, strategy_config: TradingStrategyConfig, entry: float) -> float:
+        return strategy.get_take_profit_price(position_type,
+                                              strategy_config.position.price_gap,
+                                              strategy_config.risk_reward,
+                                              entry)
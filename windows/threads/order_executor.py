@@ -1,252 +1,667 @@
-import MetaTrader5 as mt5
+import time
+import threading
+import numpy as np
 import pandas as pd
 import detector
-import pandas_ta as ta
-
-from typing import Tuple
-from datetime import datetime, timedelta
-from windows.models import TradingStrategyConfig, Position
-from PyQt5.QtCore import QReadWriteLock, QThread
+import strategy
+
+from typing import List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from indicators import FeatureStream, PIVOT_COLUMNS
+from metrics import registry
+from journal import journal, get_signal_id, SIGNAL, FILTER, REJECT, LADDER
+from bar_store import BarStore, resample_rates
+from account_state import AccountState
+from brokers import Broker
+from datetime import datetime
+from scheduler import BarScheduler, ServerClock, TIMEFRAME_SECONDS, get_next_bar_close
+from windows.models import TradingStrategyConfig, Position, Config
 from .base import BaseThread
 
 
 class OrderExecutorThread(BaseThread):
-    def __init__(self, rw_lock: QReadWriteLock):
-        super().__init__(rw_lock)
+    def __init__(self,
+                 config: Config,
+                 broker: Broker,
+                 account: Optional[AccountState] = None,
+                 workers: int = 1,
+                 max_delay: float = 15.):
+        super().__init__(config, broker, account)
 
         self.multiple_pairs = True
         self.timeframe_mapping = {
-            '1m': mt5.TIMEFRAME_M1,
-            '5m': mt5.TIMEFRAME_M5,
-            '15m': mt5.TIMEFRAME_M15,
-            '1h': mt5.TIMEFRAME_H1,
-            '4h': mt5.TIMEFRAME_H4,
-            '1d': mt5.TIMEFRAME_D1
+            '1m': self.broker.TIMEFRAME_M1,
+            '5m': self.broker.TIMEFRAME_M5,
+            '15m': self.broker.TIMEFRAME_M15,
+            '1h': self.broker.TIMEFRAME_H1,
+            '4h': self.broker.TIMEFRAME_H4,
+            '1d': self.broker.TIMEFRAME_D1
         }
+        self.feature_streams = {}
+        self.filter_candles = {}
+        self.bar_store = BarStore()
+
+        self.scheduler = BarScheduler()
+        self.server_clock = ServerClock()
+        self.config_version = None
+        self.strategy_configs = {}
+        self.evaluated_bars = {}
+        self.new_bar_retry = 0.5
+        self.market_closed_retry = 60.
+
+        # With workers > 1 symbols closing a bar together are fetched and entered on a thread
+        # pool; the broker must then be safe to share (see LockedBroker). The pool only overlaps
+        # waiting on the terminal. The CPU work is batched instead: the evaluations that finish
+        # fetching together are detected in one detect_divergence_batch pass (see detect), and
+        # a DataFrame is only built for the symbols with a signal. An evaluation that has not
+        # reached order_send max_delay seconds after it was due is dropped.
+        self.workers = workers
+        self.max_delay = max_delay
+        self.order_lock = threading.Lock()
+        self.running = {}
+
+        # Tick trigger mode: setups armed at a bar close, keyed by symbol, are checked against
+        # new ticks every tick_interval seconds until the forming bar closes. fired keeps the
+        # last signal entered on a tick so the bar-close pass does not enter it again.
+        self.armed = {}
+        self.fired = {}
+        self.tick_interval = 0.05
+
+        # Bar time and divergence_type of the last signal found per symbol, shown in the window
+        self.last_signals = {}
+
+    def get_filter_candles(self, symbol: str, timeframe: str, timeframe_filter: str, forming: np.ndarray) -> Optional[np.ndarray]:
+        # Previous and current timeframe_filter candles built from the stored timeframe bars plus
+        # the forming one. The previous candle is cached until the current one closes. None when
+        # the filter is not a multiple of the timeframe or the store does not reach back far enough.
+        period = TIMEFRAME_SECONDS[timeframe_filter]
+        base_period = TIMEFRAME_SECONDS[timeframe]
+        if period < base_period or period % base_period:
+            return None
+
+        base_timeframe = self.timeframe_mapping[timeframe]
+        current_start = int(forming['time'][-1]) // period * period
+
+        # The stored bars are read as BarStore.columns views; only the few bars of the current
+        # candle are copied, to put the forming bar behind them
+        current = self.bar_store.columns(symbol, base_timeframe, after=current_start - 1)
+        if current:
+            current = {name: np.append(values, forming[name]) for name, values in current.items()}
+        current = resample_rates(current or forming, period)
+
+        key = (symbol, timeframe, timeframe_filter)
+        cached = self.filter_candles.get(key)
+        if cached is None or cached[0] != current_start:
+            last_time = self.bar_store.columns(symbol, base_timeframe, count=1, before=current_start)
+            if not last_time or not len(last_time['time']):
+                return None
+
+            prev_start = int(last_time['time'][0]) // period * period
+            first_time = self.bar_store.get_first_time(symbol, base_timeframe)
+            if first_time > prev_start:
+                return None
+
+            previous = self.bar_store.columns(symbol, base_timeframe, after=prev_start - 1, before=current_start)
+            cached = (current_start, resample_rates(previous, period)[-1:])
+            self.filter_candles[key] = cached
+
+        return np.concatenate([cached[1], current[-1:]])
+
+    def check_buy_sell_condition(self, symbol: str, timeframe: str, timeframe_filter: str, forming: np.ndarray) -> int:
+        rates = self.get_filter_candles(symbol, timeframe, timeframe_filter, forming)
+        if rates is not None:
+            return strategy.get_filter_condition(rates[0], rates[-1])
+
+        # Not derivable from the stored bars: ask the terminal for the filter timeframe itself
+        filter_timeframe = self.timeframe_mapping[timeframe_filter]
+        filter_forming = self.bar_store.sync(symbol, filter_timeframe, self.broker.copy_rates_from_pos, 2)
+        previous = self.bar_store.columns(symbol, filter_timeframe, count=1)
+        previous = {name: values[-1] for name, values in previous.items()} if previous else filter_forming[0]
+
+        return strategy.get_filter_condition(previous, filter_forming[-1])
+
+    def get_feature_stream(self, symbol: str, timeframe: int, strategy_config: TradingStrategyConfig, count: int) -> FeatureStream:
+        stream = self.feature_streams.get((symbol, timeframe))
+
+        if stream is None \
+                or stream.atr_length != strategy_config.atr_length \
+                or stream.pivot_lookback != strategy_config.pivot_lookback \
+                or stream.count != count:
+            stream = FeatureStream(strategy_config.atr_length, strategy_config.pivot_lookback, count)
+            self.feature_streams[(symbol, timeframe)] = stream
+
+        return stream
+
+    def update_feature_stream(self,
+                              symbol: str,
+                              timeframe: int,
+                              strategy_config: TradingStrategyConfig,
+                              count: int = 500,
+                              forming: Optional[np.ndarray] = None) -> FeatureStream:
+        stream = self.get_feature_stream(symbol, timeframe, strategy_config, count)
+
+        if forming is None:
+            forming = self.bar_store.sync(symbol, timeframe, self.broker.copy_rates_from_pos, count)
+        if forming is None or len(forming) == 0:
+            return stream
+
+        closed = self.bar_store.columns(symbol, timeframe, count=count - 1, after=stream.last_time)
+        if stream.last_time is not None and closed and len(closed['time']) == count - 1:
+            stream.reset()
+
+        stream.update(forming, closed)
+
+        return stream
+
+    def create_data_frame(self,
+                          symbol: str,
+                          timeframe: int,
+                          strategy_config: TradingStrategyConfig,
+                          count: int = 500,
+                          forming: Optional[np.ndarray] = None) -> pd.DataFrame:
+        return self.update_feature_stream(symbol, timeframe, strategy_config, count, forming).to_frame()
 
-    def check_buy_sell_condition(self, symbol: int, timeframe: int) -> int:
-        rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, 2)
-
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-
-        prev_candle = df.iloc[0]
-        current_candle = df.iloc[-1]
-
-        low_level_swept = current_candle['low'] < prev_candle['low'] and current_candle['close'] > prev_candle['low']
-        high_level_swept = current_candle['high'] > prev_candle['high'] and current_candle['close'] < prev_candle['high']
-
-        is_bullish_reversal = (current_candle['close'] < prev_candle['close']) or (current_candle['close'] < prev_candle['open'])
-        is_bearish_reversal = (current_candle['close'] > prev_candle['open']) or (current_candle['close'] > prev_candle['close'])
-
-        result = 2
-
-        if low_level_swept and is_bullish_reversal:
-            result = 0
-        elif high_level_swept and is_bearish_reversal:
-            result = 1
-
-        return result
-
-    def create_data_frame(self, symbol: str, timeframe: int, strategy_config: TradingStrategyConfig, count: int = 500) -> pd.DataFrame:
-        rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
-
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-
-        df['rsi'] = ta.rsi(df['close'], 14)
-        df['atr'] = ta.atr(df['high'], df['low'], df['close'], strategy_config.atr_length)
-
-        df.dropna(inplace=True)
-
-        window_size = strategy_config.pivot_lookback
-
-        df['rsi_pivot_high'] = df['rsi'] == df['rsi'].rolling(2 * window_size + 1, center=True).max()
-        df['rsi_pivot_low'] = df['rsi'] == df['rsi'].rolling(2 * window_size + 1, center=True).min()
-        df['pivot_high'] = df['high'] == df['high'].rolling(2 * window_size + 1, center=True).max()
-        df['pivot_low'] = df['low'] == df['low'].rolling(2 * window_size + 1, center=True).min()
-        
-        return df
-    
     def get_trade_volume(self,
                          strategy_config: TradingStrategyConfig,
                          entry: float,
                          stop_loss: float,
                          risk_amount: float) -> float:
-        price_gap = abs(entry - stop_loss)
-        trade_volume = risk_amount / price_gap
-
-        if strategy_config.unit_factor != 0:
-            trade_volume = int(trade_volume)
-            trade_volume = trade_volume / strategy_config.unit_factor
-
-        minimum_volume = 0.01
-        trade_volume = round(trade_volume, 2) if trade_volume >= minimum_volume else minimum_volume
-
-        return trade_volume
+        return strategy.get_trade_volume(strategy_config.unit_factor, entry, stop_loss, risk_amount)
     
     def determine_order_parameters(self,
                                    df: pd.DataFrame,
                                    strategy_config: TradingStrategyConfig,
                                    divergence_signal: detector.DivergenceSignal) -> Tuple[float, float, float]:
         order_type_mapping = {
-            0: mt5.ORDER_TYPE_BUY,
-            1: mt5.ORDER_TYPE_SELL
+            0: self.broker.ORDER_TYPE_BUY,
+            1: self.broker.ORDER_TYPE_SELL
         }
 
-        info_tick = mt5.symbol_info_tick(strategy_config.symbol)
+        info_tick = self.broker.symbol_info_tick(strategy_config.symbol)
         entry_mapping = {
             0: info_tick.ask,
             1: info_tick.bid
         }
 
         pivot_candle = df[df['time'] == divergence_signal.price_point.end[0]].iloc[-1]
-        atr = df['atr'].iloc[-2]
-        entry = entry_mapping[divergence_signal.divergence_type]
-        gaps = []
-        
-        for atr, entry in [[atr, entry],
-                           [pivot_candle['atr'], pivot_candle['close']]]:
-            stop_loss_mapping = {
-                0: entry - atr * strategy_config.atr_multiplier,
-                1: entry + atr * strategy_config.atr_multiplier
-            }
-            stop_loss = stop_loss_mapping[divergence_signal.divergence_type]
-            
-            if not strategy_config.use_sl_min_max:
-                return (
-                    order_type_mapping[divergence_signal.divergence_type],
-                    entry,
-                    stop_loss
-                )
-            
-            gaps.append(abs(entry - stop_loss))
-
-        print('Gaps:', gaps)
-
-        valid_gaps = list(filter(lambda x: strategy_config.sl_min_price < x < strategy_config.sl_max_price, gaps))
-        if valid_gaps:
-            gap = valid_gaps[-1] if len(valid_gaps) < 2 else max(valid_gaps)
-            stop_loss_mapping = {
-                0: entry - gap,
-                1: entry + gap
-            }
-            return (
-                order_type_mapping[divergence_signal.divergence_type],
-                entry,
-                stop_loss_mapping[divergence_signal.divergence_type]
-            )
-
-        return None
+        params = strategy.determine_entry_and_stop_loss(
+            strategy_config,
+            divergence_signal.divergence_type,
+            entry_mapping[divergence_signal.divergence_type],
+            df['atr'].iloc[-2],
+            pivot_candle['atr'],
+            pivot_candle['close']
+        )
+
+        if params is None:
+            return None
+
+        entry, stop_loss = params
+
+        return (
+            order_type_mapping[divergence_signal.divergence_type],
+            entry,
+            stop_loss
+        )
 
     def get_risk_amount(self, strategy_config: TradingStrategyConfig) -> float:
         risk_amount = strategy_config.risk_amount
 
         if strategy_config.risk_type == '%':
-            account = mt5.account_info()
+            account = self.broker.account_info()
             risk_amount = (strategy_config.risk_amount / 100) * account.balance
 
         return risk_amount
     
+    def update_schedule(self):
+        version = self.config.get_version()
+        if version == self.config_version:
+            return
+
+        self.config_version = version
+        self.strategy_configs = {
+            key: value for key, value in self.config.get_models().items() if value.is_running
+        }
+
+        for symbol in self.scheduler.symbols():
+            if symbol not in self.strategy_configs:
+                self.scheduler.remove(symbol)
+
+        for symbol, strategy_config in self.strategy_configs.items():
+            if symbol not in self.scheduler and symbol not in self.running:
+                self.scheduler.schedule(symbol, max(time.time(), strategy_config.next_search_signal_time.timestamp()))
+
+    def is_market_open(self, symbol: str, timeframe: str) -> bool:
+        # The terminal API exposes no session table, so a symbol counts as closed when it is not
+        # tradable for new positions or when its last tick is older than one bar
+        info = self.broker.symbol_info(symbol)
+        if info is None or info.trade_mode in (self.broker.SYMBOL_TRADE_MODE_DISABLED,
+                                               self.broker.SYMBOL_TRADE_MODE_CLOSEONLY):
+            return False
+
+        tick = self.broker.symbol_info_tick(symbol)
+        if tick is None:
+            return False
+
+        self.server_clock.observe(tick.time)
+
+        return self.server_clock.now() - tick.time < max(TIMEFRAME_SECONDS[timeframe], 60)
+
+    def is_stale(self, symbol: str, deadline: Optional[float]) -> bool:
+        if deadline is None or time.time() <= deadline:
+            return False
+
+        print(__class__.__name__ + ':', symbol, 'evaluation dropped', round(time.time() - deadline, 3), 's past deadline')
+        return True
+
+    def place_order(self,
+                    strategy_config: TradingStrategyConfig,
+                    result: detector.DivergenceSignal,
+                    params: Optional[tuple],
+                    buy_only: bool,
+                    sell_only: bool,
+                    deadline: Optional[float] = None,
+                    signal_time: Optional[float] = None,
+                    latency_stage: str = 'bar_close_to_order') -> bool:
+        # Sends the market order of a signal and sets its take profit; returns False when the
+        # terminal refused the order. Held under order_lock so that concurrent workers see each
+        # other's positions when multiple_pairs is off. signal_time (local epoch seconds) is the
+        # close of the signal bar, or the trigger tick, and is timed under latency_stage.
+        symbol = strategy_config.symbol
+        signal_id = self.get_signal_id(symbol, result)
+
+        with self.order_lock:
+            trading_allowed = False if not self.multiple_pairs and self.account.positions_total() > 0 else True
+
+            reason = None
+            if not trading_allowed:
+                reason = 'multiple_pairs'
+            elif not ((result.divergence_type == 0 and buy_only) or (result.divergence_type == 1 and sell_only)):
+                reason = 'filter' if params else 'sl_min_max'
+            elif self.is_stale(symbol, deadline):
+                reason = 'stale'
+
+            if reason is not None:
+                registry.increment('rejects', symbol, reason=reason)
+                journal.record(REJECT, symbol, {'reason': reason}, signal_id)
+                return True
+
+            order_type, entry, stop_loss = params
+            risk_amount = self.get_risk_amount(strategy_config)
+            trade_volume = self.get_trade_volume(strategy_config, entry, stop_loss, risk_amount)
+
+            request = {
+                'symbol': strategy_config.symbol,
+                'deviation': 30,
+                'action': self.broker.TRADE_ACTION_DEAL,
+                'type': order_type,
+                'volume': trade_volume,
+                'price': entry,
+            }
+
+            if strategy_config.use_default_volume:
+                request.update({'volume': strategy_config.default_volume})
+
+            result = self.order_send(request, signal_id)
+            print(result)
+
+            if signal_time is not None:
+                registry.observe(latency_stage, symbol, time.time() - signal_time)
+
+            if not result.retcode == self.broker.TRADE_RETCODE_DONE:
+                print(__class__.__name__ + ':', 'Stop')
+                return False
+
+            strategy_config.position = Position()
+            strategy_config.position.price_gap = abs(result.price - stop_loss)
+
+            stop_loss_mapping = {
+                self.broker.ORDER_TYPE_BUY: result.price - strategy_config.position.price_gap,
+                self.broker.ORDER_TYPE_SELL: result.price + strategy_config.position.price_gap
+            }
+            strategy_config.position.stop_loss = stop_loss_mapping[order_type]
+            strategy_config.position.take_profit = self.get_take_profit_price(order_type, strategy_config, result.price)
+            strategy_config.position.ladder = self.build_ladder(strategy_config,
+                                                                order_type,
+                                                                result.price,
+                                                                result.volume or request['volume'],
+                                                                strategy_config.position.price_gap)
+            journal.record(LADDER, symbol, {
+                'action': 'planned',
+                'ticket': result.order,
+                'steps': [step.model_dump() for step in strategy_config.position.ladder]
+            }, signal_id)
+
+            request = {
+                'action': self.broker.TRADE_ACTION_SLTP,
+                'position': result.order,
+                'tp': strategy_config.position.take_profit
+            }
+            self.order_send(request, signal_id)
+
+        return True
+
+    def get_signal_key(self, signal: detector.DivergenceSignal) -> tuple:
+        return signal.divergence_type, signal.price_point.end[0]
+
+    def get_signal_id(self, symbol: str, signal: detector.DivergenceSignal) -> str:
+        return get_signal_id(symbol, signal.divergence_type, signal.price_point.end[0])
+
+    def process_signal(self,
+                       strategy_config: TradingStrategyConfig,
+                       df: pd.DataFrame,
+                       forming: np.ndarray,
+                       result: detector.DivergenceSignal,
+                       deadline: Optional[float],
+                       signal_time: Optional[float] = None,
+                       latency_stage: str = 'bar_close_to_order') -> bool:
+        # Filters a confirmed signal and places its order; False when the thread has to stop
+        registry.increment('signals', strategy_config.symbol, direction=result.divergence_type)
+        self.last_signals[strategy_config.symbol] = (result.price_point.end[0], result.divergence_type)
+        signal_id = self.get_signal_id(strategy_config.symbol, result)
+        journal.record(SIGNAL, strategy_config.symbol, {
+            'divergence_type': result.divergence_type,
+            'timeframe': strategy_config.timeframe,
+            'trigger': latency_stage,
+            'rsi_point': [result.rsi_point.start, result.rsi_point.end],
+            'price_point': [result.price_point.start, result.price_point.end]
+        }, signal_id)
+        print(strategy_config.symbol, result.divergence_type)
+        print(result.rsi_point.start, result.rsi_point.end)
+        print(result.price_point.start, result.price_point.end)
+
+        buy_only = strategy_config.buy_only
+        sell_only = strategy_config.sell_only
+
+        if strategy_config.use_filter:
+            with registry.span('filters', strategy_config.symbol):
+                for timeframe_filter in strategy_config.timeframe_filters[::-1]:
+                    condition = self.check_buy_sell_condition(
+                        symbol=strategy_config.symbol,
+                        timeframe=strategy_config.timeframe,
+                        timeframe_filter=timeframe_filter,
+                        forming=forming)
+                    print(timeframe_filter, condition)
+                    journal.record(FILTER, strategy_config.symbol, {'filter': timeframe_filter, 'condition': condition}, signal_id)
+
+                    buy_only = strategy_config.buy_only and condition == 0
+                    sell_only = strategy_config.sell_only and condition == 1
+
+                    if condition != 2:
+                        break
+
+        with registry.span('order_parameters', strategy_config.symbol):
+            params = self.determine_order_parameters(df, strategy_config, result)
+        if strategy_config.use_sl_min_max and not params:
+            buy_only = False
+            sell_only = False
+
+        return self.place_order(strategy_config, result, params, buy_only, sell_only, deadline, signal_time, latency_stage)
+
+    def arm(self, strategy_config: TradingStrategyConfig, df: pd.DataFrame, forming: np.ndarray):
+        symbol = strategy_config.symbol
+        setups = [item for item in detector.detect_divergence_setups(df, max_pivot_distance=strategy_config.pivot_distance)
+                  if self.get_signal_key(item.signal) != self.fired.get(symbol)]
+        if not setups:
+            return
+
+        bar_time = int(forming['time'][-1])
+        self.armed[symbol] = {
+            'setups': setups,
+            'df': df,
+            'forming': forming,
+            'cursor': bar_time * 1000 - 1,
+            'expires': get_next_bar_close(bar_time, strategy_config.timeframe),
+            'due': self.server_clock.to_local(get_next_bar_close(bar_time, strategy_config.timeframe))
+        }
+
+    def fire(self, strategy_config: TradingStrategyConfig, armed: dict, setup: detector.DivergenceSetup, tick_time: float) -> Optional[float]:
+        # Enters an armed setup whose trigger a tick crossed; returns the bar-close due time unchanged
+        symbol = strategy_config.symbol
+        if self.account.positions(symbol) or strategy_config.position:
+            return armed['due']
+
+        print(symbol, 'triggered at', setup.trigger)
+        if not self.process_signal(strategy_config, armed['df'], armed['forming'], setup.signal,
+                                   time.time() + self.max_delay, self.server_clock.to_local(tick_time), 'tick_to_order'):
+            return None
+        print()
+
+        self.config.patch(symbol, position=strategy_config.position)
+
+        return armed['due']
+
+    def poll_ticks(self, executor: Optional[ThreadPoolExecutor]):
+        # Reads the ticks after each armed symbol's cursor and fires the setup crossed first
+        for symbol, armed in list(self.armed.items()):
+            if symbol in self.running:
+                continue
+
+            strategy_config = self.strategy_configs.get(symbol)
+            if strategy_config is None or strategy_config.trigger_mode != 'tick':
+                self.armed.pop(symbol)
+                continue
+
+            ticks = self.broker.copy_ticks_from(symbol, armed['cursor'] // 1000, 1000, self.broker.COPY_TICKS_ALL)
+            if ticks is None or len(ticks) == 0:
+                continue
+
+            ticks = ticks[ticks['time_msc'] > armed['cursor']]
+            if not len(ticks):
+                continue
+
+            in_bar = ticks[ticks['time'] < armed['expires']]
+            crossings = []
+            for setup in armed['setups']:
+                triggered = setup.is_triggered(in_bar['bid'])
+                if triggered.any():
+                    crossings.append((int(np.argmax(triggered)), setup))
+
+            if crossings:
+                index, setup = min(crossings, key=lambda item: item[0])
+                self.armed.pop(symbol)
+                self.fired[symbol] = self.get_signal_key(setup.signal)
+                self.submit(executor, symbol, self.fire, strategy_config, armed, setup, in_bar['time_msc'][index] / 1000)
+            elif len(in_bar) < len(ticks):
+                # The bar closed without a crossing; the bar-close pass re-arms from the new bar
+                self.armed.pop(symbol)
+            else:
+                armed['cursor'] = int(ticks['time_msc'][-1])
+
+    def get_history_size(self, strategy_config: TradingStrategyConfig) -> int:
+        # Bars of the strategy timeframe to fetch into an empty store: the indicator window, or two
+        # candles of the largest filter timeframe so the filters can be derived from them
+        base_period = TIMEFRAME_SECONDS[strategy_config.timeframe]
+        sizes = [2 * TIMEFRAME_SECONDS[item] // base_period + 1 for item in strategy_config.timeframe_filters
+                 if strategy_config.use_filter and TIMEFRAME_SECONDS[item] >= base_period]
+
+        return max([500] + sizes)
+
+    def evaluate(self, strategy_config: TradingStrategyConfig, deadline: Optional[float] = None) -> Union[float, dict, None]:
+        # Fetches the bar that just closed and returns when to look again (local epoch seconds),
+        # None when the thread has to stop, or, when the bar needs a signal search, the
+        # evaluation that collect hands to detect together with the others due at that time
+        self.armed.pop(strategy_config.symbol, None)
+
+        if not self.is_market_open(strategy_config.symbol, strategy_config.timeframe):
+            return time.time() + self.market_closed_retry
+
+        timeframe = self.timeframe_mapping[strategy_config.timeframe]
+        with registry.span('rates_fetch', strategy_config.symbol):
+            forming = self.bar_store.sync(strategy_config.symbol, timeframe, self.broker.copy_rates_from_pos,
+                                          self.get_history_size(strategy_config))
+        if forming is None or len(forming) == 0:
+            return time.time() + self.market_closed_retry
+
+        # The terminal opens the next bar on its first tick, which can come a little after the close
+        last_closed_time = self.bar_store.get_last_time(strategy_config.symbol, timeframe)
+        if last_closed_time == self.evaluated_bars.get(strategy_config.symbol):
+            return time.time() + self.new_bar_retry
+
+        self.evaluated_bars[strategy_config.symbol] = last_closed_time
+
+        if self.account.positions(strategy_config.symbol) \
+                or strategy_config.position \
+                or self.is_stale(strategy_config.symbol, deadline):
+            return self.reschedule(strategy_config, forming)
+
+        with registry.span('indicators', strategy_config.symbol):
+            stream = self.update_feature_stream(strategy_config.symbol, timeframe, strategy_config, forming=forming)
+
+        return {'strategy_config': strategy_config, 'deadline': deadline, 'forming': forming, 'stream': stream}
+
+    def detect(self, evaluations: List[dict]):
+        # detect_divergence for every evaluation at once: the last DETECTION_WINDOW rows of each
+        # stream are stacked into one (symbols x bars) block for detect_divergence_batch, whose
+        # vectorized checks leave only a few symbols to its per-symbol kernel, and no DataFrame
+        # is built until a symbol has a signal or setups to arm
+        with registry.span('detect_divergence'):
+            size = detector.DETECTION_WINDOW
+            shape = (len(evaluations), size)
+            block = {name: np.full(shape, np.nan) for name in ('high', 'low', 'close', 'rsi')}
+            block.update({name: np.zeros(shape, dtype=bool) for name in PIVOT_COLUMNS})
+            times = np.full(shape, np.datetime64('NaT'), dtype='datetime64[ns]')
+
+            for row, evaluation in enumerate(evaluations):
+                rows = evaluation['stream'].get_rows(size)
+                if rows is None or not len(rows):
+                    continue
+                for name in block:
+                    block[name][row, size - len(rows):] = rows[name]
+                times[row, size - len(rows):] = rows['time'].astype('datetime64[s]')
+
+            results = detector.detect_divergence_batch(
+                times, block['high'], block['low'], block['close'], block['rsi'],
+                block['pivot_high'], block['pivot_low'], block['rsi_pivot_high'], block['rsi_pivot_low'],
+                max_pivot_distance=np.array([item['strategy_config'].pivot_distance for item in evaluations])
+            )
+
+        for evaluation, result in zip(evaluations, results):
+            if result is not None and self.fired.get(evaluation['strategy_config'].symbol) == self.get_signal_key(result):
+                # Already entered on a tick of the bar that confirmed it
+                result = None
+            evaluation['result'] = result
+
+    def finish(self, evaluation: dict) -> Optional[float]:
+        # Enters the signal detect found, or arms the setups in tick mode, and returns the next due time
+        strategy_config = evaluation['strategy_config']
+        forming = evaluation['forming']
+        result = evaluation['result']
+
+        if result is not None:
+            df = evaluation['stream'].to_frame()
+            bar_close = self.server_clock.to_local(forming['time'][-1])
+            if not self.process_signal(strategy_config, df, forming, result, evaluation['deadline'], bar_close):
+                return None
+
+            print()
+        elif strategy_config.trigger_mode == 'tick':
+            self.arm(strategy_config, evaluation['stream'].to_frame(), forming)
+
+        return self.reschedule(strategy_config, forming)
+
+    def reschedule(self, strategy_config: TradingStrategyConfig, forming: np.ndarray) -> float:
+        if not self.account.positions(strategy_config.symbol) \
+                and not self.account.orders(strategy_config.symbol) \
+                and strategy_config.position:
+            strategy_config.position = None
+
+        due = self.server_clock.to_local(get_next_bar_close(forming['time'][-1], strategy_config.timeframe))
+        strategy_config.next_search_signal_time = datetime.fromtimestamp(due)
+
+        self.config.patch(strategy_config.symbol,
+                          position=strategy_config.position,
+                          next_search_signal_time=strategy_config.next_search_signal_time)
+
+        return due
+
+    def submit(self, executor: Optional[ThreadPoolExecutor], symbol: str, function=None, *args):
+        # Runs function (evaluate by default) for symbol; its result is the next due time
+        if symbol in self.running:
+            self.scheduler.schedule(symbol, time.time() + self.new_bar_retry)
+            return
+
+        if function is None:
+            strategy_config = self.strategy_configs.get(symbol)
+            if strategy_config is None:
+                return
+            function, args = self.evaluate, (strategy_config, time.time() + self.max_delay)
+
+        if executor is None:
+            future = Future()
+            try:
+                future.set_result(function(*args))
+            except Exception as ex:
+                future.set_exception(ex)
+        else:
+            future = executor.submit(function, *args)
+
+        self.running[symbol] = future
+
+    def collect(self, executor: Optional[ThreadPoolExecutor] = None) -> bool:
+        # Reschedules the finished evaluations; False when one of them asked to stop. The ones
+        # that finished with a bar to search are detected together, then finished on executor.
+        evaluations = []
+        for symbol, future in list(self.running.items()):
+            if not future.done():
+                continue
+
+            self.running.pop(symbol)
+            try:
+                due = future.result()
+            except Exception as ex:
+                print(__class__.__name__ + ':', symbol, repr(ex))
+                due = time.time() + self.market_closed_retry
+
+            if isinstance(due, dict):
+                evaluations.append(due)
+                continue
+
+            if due is None:
+                return False
+
+            if symbol in self.strategy_configs:
+                self.scheduler.schedule(symbol, due)
+
+        if evaluations:
+            try:
+                self.detect(evaluations)
+            except Exception as ex:
+                print(__class__.__name__ + ':', repr(ex))
+                for evaluation in evaluations:
+                    self.scheduler.schedule(evaluation['strategy_config'].symbol, time.time() + self.market_closed_retry)
+                return True
+
+            for evaluation in evaluations:
+                self.submit(executor, evaluation['strategy_config'].symbol, self.finish, evaluation)
+
+            # Finishes that already ran (inline without a pool) must not hold their symbols in
+            # running until the next pass, where poll_ticks would skip them
+            return self.collect(executor)
+
+        return True
+
     def run(self):
-        while 1:
-            config = self.config.get()
-            
-            for key, value in config.items():
-                strategy_config = TradingStrategyConfig(symbol=key, **value)
-                
-                if strategy_config.is_running and datetime.now() > strategy_config.next_search_signal_time:
-                    timeframe = self.timeframe_mapping[strategy_config.timeframe]
-
-                    if not mt5.positions_get(symbol=strategy_config.symbol) and not strategy_config.position:
-                        df = self.create_data_frame(strategy_config.symbol, timeframe, strategy_config)
-                        
-                        result = detector.detect_divergence(df, max_pivot_distance=strategy_config.pivot_distance)
-                        if result is not None:
-                            print(strategy_config.symbol, result.divergence_type)
-                            print(result.rsi_point.start, result.rsi_point.end)
-                            print(result.price_point.start, result.price_point.end)
-
-                            buy_only = strategy_config.buy_only
-                            sell_only = strategy_config.sell_only
-                            
-                            if strategy_config.use_filter:
-                                for timeframe_filter in strategy_config.timeframe_filters[::-1]:
-                                    condition = self.check_buy_sell_condition(
-                                        symbol=strategy_config.symbol,
-                                        timeframe=self.timeframe_mapping[timeframe_filter])
-                                    print(timeframe_filter, condition)
-                                    
-                                    buy_only = strategy_config.buy_only and condition == 0
-                                    sell_only = strategy_config.sell_only and condition == 1
-
-                                    if condition != 2:
-                                        break
-                                
-                                    QThread.msleep(300)
-
-                            params = self.determine_order_parameters(df, strategy_config, result)
-                            if strategy_config.use_sl_min_max and not params:
-                                buy_only = False
-                                sell_only = False
-
-                            trading_allowed = False if not self.multiple_pairs and mt5.positions_total() > 0 else True
-
-                            if trading_allowed and ((result.divergence_type == 0 and buy_only) or (result.divergence_type == 1 and sell_only)):
-                                order_type, entry, stop_loss = params
-                                risk_amount = self.get_risk_amount(strategy_config)
-                                trade_volume = self.get_trade_volume(strategy_config, entry, stop_loss, risk_amount)
-
-                                request = {
-                                    'symbol': strategy_config.symbol,
-                                    'deviation': 30,
-                                    'action': mt5.TRADE_ACTION_DEAL,
-                                    'type': order_type,
-                                    'volume': trade_volume,
-                                    'price': entry,
-                                }
-
-                                if strategy_config.use_default_volume:
-                                    request.update({'volume': strategy_config.default_volume})
-                                    
-                                result = mt5.order_send(request)
-                                print(result)
-
-                                if not result.retcode == mt5.TRADE_RETCODE_DONE:
-                                    print(__class__.__name__ + ':', 'Stop')
-                                    return
-                                
-                                strategy_config.position = Position()
-                                strategy_config.position.price_gap = abs(result.price - stop_loss)
-
-                                stop_loss_mapping = {
-                                    mt5.ORDER_TYPE_BUY: result.price - strategy_config.position.price_gap,
-                                    mt5.ORDER_TYPE_SELL: result.price + strategy_config.position.price_gap
-                                }
-                                strategy_config.position.stop_loss = stop_loss_mapping[order_type]
-                                strategy_config.position.take_profit = self.get_take_profit_price(order_type, strategy_config, result.price)
-
-                                request = {
-                                    'action': mt5.TRADE_ACTION_SLTP,
-                                    'position': result.order,
-                                    'tp': strategy_config.position.take_profit
-                                }
-                                mt5.order_send(request)
-                                    
-                            print()
-
-                    if not mt5.positions_get(symbol=strategy_config.symbol) \
-                            and not mt5.orders_get(symbol=strategy_config.symbol) \
-                            and strategy_config.position:
-                        strategy_config.position = None
-
-                    strategy_config.next_search_signal_time = datetime.now() + timedelta(minutes=timeframe)
-
-                    config.update({
-                        strategy_config.symbol: strategy_config.model_dump(exclude='symbol')
-                    })
-                    self.config.update(config)
-
-                QThread.msleep(1000)
-
-            QThread.msleep(1000)
+        executor = ThreadPoolExecutor(self.workers, thread_name_prefix='OrderExecutor') if self.workers > 1 else None
+
+        try:
+            while not self.is_stopped():
+                self.update_schedule()
+
+                for symbol in self.scheduler.pop_due():
+                    self.submit(executor, symbol)
+
+                if not self.collect(executor):
+                    return
+
+                if self.armed:
+                    self.poll_ticks(executor)
+
+                timeout = self.scheduler.get_wait(limit=self.tick_interval if self.armed else 0.25)
+                if self.running:
+                    wait(list(self.running.values()), timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    self.stop_event.wait(timeout)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
@@ -1,63 +1,129 @@
-import MetaTrader5 as mt5
+import time
+import strategy
 
-from windows.models import TradingStrategyConfig
-from PyQt5.QtCore import QThread, QReadWriteLock
+from typing import Optional
+from account_state import AccountState
+from brokers import Broker
+from order_pipeline import OrderPipeline
+from journal import journal, LADDER
+from windows.models import Config, TradingStrategyConfig, LadderStep
 from .base import BaseThread
 
 
 class RecoveryZoneThread(BaseThread):
-    def __init__(self, rw_lock: QReadWriteLock):
-        super().__init__(rw_lock)
+    def __init__(self, config: Config, broker: Broker, account: Optional[AccountState] = None):
+        super().__init__(config, broker, account)
+
+        self.order_pipeline = OrderPipeline(self.broker, self.account)
+        self.ladders = {}
+        self.stopped_ladders = set()
+        # (symbol, first ticket, depth) of a step the broker rejected -> (failures, retry time)
+        self.step_retries = {}
+        self.retry_delay = 2.
+        self.max_retry_delay = 60.
+
+    def get_ladder(self, strategy_config: TradingStrategyConfig, positions: tuple) -> list[LadderStep]:
+        # The plan saved when the first position opened; positions opened before plans existed
+        # get one built from that position, kept in memory for the life of the ladder
+        if strategy_config.position.ladder:
+            return strategy_config.position.ladder
+
+        key = (strategy_config.symbol, positions[0].ticket)
+        if key not in self.ladders:
+            self.ladders[key] = self.build_ladder(strategy_config,
+                                                  positions[0].type,
+                                                  positions[0].price_open,
+                                                  positions[0].volume,
+                                                  strategy_config.position.price_gap)
+        return self.ladders[key]
+
+    def get_next_step(self, strategy_config: TradingStrategyConfig, positions: tuple) -> Optional[LadderStep]:
+        ladder = self.get_ladder(strategy_config, positions)
+        depth = len(positions)
+
+        step = ladder[depth] if depth < len(ladder) else None
+        if step is not None and strategy.is_recovery_step_allowed(step.model_dump(),
+                                                                  strategy_config.max_recovery_depth,
+                                                                  strategy_config.max_recovery_loss):
+            return step
+
+        key = (strategy_config.symbol, positions[0].ticket)
+        if key not in self.stopped_ladders:
+            self.stopped_ladders.add(key)
+            print(__class__.__name__ + ':', strategy_config.symbol, 'ladder stopped at depth', depth - 1)
+            journal.record(LADDER, strategy_config.symbol, {'action': 'stopped', 'ticket': positions[0].ticket, 'depth': depth - 1})
+
+        return None
     
+    def is_step_reachable(self, symbol: str, order_type: int, entry: float) -> bool:
+        # A stop order has to be beyond the price; once the price has moved through the step's
+        # entry the terminal rejects it, so it is only sent again after the price comes back
+        tick = self.broker.symbol_info_tick(symbol)
+        if tick is None:
+            return True
+        if order_type == self.broker.ORDER_TYPE_BUY_STOP:
+            return entry > tick.ask
+        return entry < tick.bid
+
+    def is_step_due(self, step_key: tuple) -> bool:
+        retry = self.step_retries.get(step_key)
+        return retry is None or time.time() >= retry[1]
+
+    def on_step_rejected(self, step_key: tuple):
+        # Doubles the wait before the same step is sent again, up to max_retry_delay
+        failures = self.step_retries.get(step_key, (0, 0.))[0] + 1
+        delay = min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay)
+        self.step_retries[step_key] = (failures, time.time() + delay)
+
     def run(self):
-        while 1:
-            config = self.config.get()
-            for key, value in config.items():
-                strategy_config = TradingStrategyConfig(symbol=key, **value)
+        while not self.is_stopped():
+            # Keeps the account snapshot the window reads current while no symbol is running
+            self.account.refresh()
 
+            for key, strategy_config in self.config.get_models().items():
                 if strategy_config.is_running and strategy_config.position:
-                    positions = mt5.positions_get(symbol=key)
+                    positions = self.account.positions(key)
                     if positions:
                         lastest_position = positions[-1]
                         
-                        if not mt5.orders_get(symbol=key):
-                            entry = strategy_config.position.stop_loss if lastest_position.type == positions[0].type else positions[0].price_open
-                            take_profit = self.get_take_profit_price(self.toggle_mapping[lastest_position.type], strategy_config, entry)
-                            trade_volume = lastest_position.volume * 2 if len(positions) < 2 else positions[-2].volume + lastest_position.volume
-                            trade_volume = round(trade_volume, 2)
+                        if not self.account.orders(key):
+                            step = self.get_next_step(strategy_config, positions)
+                            if step is None:
+                                continue
+
+                            order_type = self.order_type_mapping[lastest_position.type]
+                            step_key = (strategy_config.symbol, positions[0].ticket, len(positions))
+                            if not self.is_step_due(step_key) or not self.is_step_reachable(strategy_config.symbol, order_type, step.entry):
+                                continue
 
                             result = self.create_buy_sell_stop_order(
                                 symbol=strategy_config.symbol,
-                                order_type=self.order_type_mapping[lastest_position.type],
-                                volume=trade_volume,
-                                price=entry,
-                                take_profit=take_profit
+                                order_type=order_type,
+                                volume=step.volume,
+                                price=step.entry,
+                                take_profit=step.take_profit
                             )
-                            if not result.retcode == mt5.TRADE_RETCODE_DONE:
+                            if result is not None and result.retcode == self.broker.TRADE_RETCODE_DONE:
+                                self.step_retries.pop(step_key, None)
+                                journal.record(LADDER, strategy_config.symbol, {
+                                    'action': 'step',
+                                    'ticket': positions[0].ticket,
+                                    **step.model_dump()
+                                })
+                            else:
+                                self.on_step_rejected(step_key)
                                 print(result)
                                 print(__class__.__name__ + ':', 'Error')
                         else:
                             for item in positions[:-1]:
-                                request = {
-                                    'action': mt5.TRADE_ACTION_SLTP,
-                                    'position': item.ticket,
-                                }
-
                                 if (item.type == 0 and lastest_position.type == 0) or (item.type == 1 and lastest_position.type == 1):
-                                    request.update({'tp': lastest_position.tp})
+                                    self.order_pipeline.modify_position(item, tp=lastest_position.tp)
                                 else:
-                                    request.update({'sl': lastest_position.tp})
-
-                                mt5.order_send(request)
+                                    self.order_pipeline.modify_position(item, sl=lastest_position.tp)
                     else:
-                        pending_orders = mt5.orders_get(symbol=key)
+                        self.step_retries = {item: retry for item, retry in self.step_retries.items() if item[0] != key}
+                        pending_orders = self.account.orders(key)
                         for order in pending_orders:
-                            request = {
-                                'action': mt5.TRADE_ACTION_REMOVE,
-                                'order': order.ticket
-                            }
-                            mt5.order_send(request)
-
-                QThread.msleep(1000)
+                            self.order_pipeline.remove_order(order)
 
-            QThread.msleep(3000)
+            self.stop_event.wait(1.)